@@ -1,18 +1,37 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, make_response, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime, timedelta
 import json
-from s3_client import get_s3_client
+import tempfile
+import threading
+import requests
+from s3_client import get_s3_client, s3_metrics
+from dataset_cache import DatasetCache
+from query import Query, QueryError, QueryResultCache, encode_cursor, encode_position_cursor, decode_cursor
+from serialization import records, dumps, json_response, iter_ndjson, iter_json_messages, CARD_COLUMNS, API_COLUMNS
+from fragment_cache import FragmentCache
+from facets import FacetCache
+from export import ExportError, EXPORT_FORMATS, export_formats, export_key, export_positions, iter_export, parse_columns
+from message_store import create_message_store, PandasMessageStore
+from dataset import Dataset, normalize_dataframe
+from facets import compute_facets
+from partitions import MANIFEST_KEY, PartitionCache, prune
+from deltas import DELTA_INDEX_KEY, delta_frame, pending_deltas, read_index, upsert_rows
+from json_stream import read_messages, READ_CHUNK_SIZE
+from label_journal import LabelJournal, LabelWriteBuffer
+from http_cache import make_etag, is_not_modified, not_modified, finalize_response
+import snapshot
 from auth import auth_bp
 from models import db
 from config import Config
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, ParamValidationError
 import logging
 
 # Configurar logging
@@ -20,8 +39,15 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 MESSAGES_LIMIT = 48
+LABEL_BATCH_LIMIT = 1000
 S3_BUCKET = os.environ.get('S3_BUCKET', 'monitoria-data')
 S3_KEY = 'telegram_messages.json'
+PUBLIC_DATA_URL = 'https://monitoria-data.s3.eu-north-1.amazonaws.com/telegram_messages.json'
+PUBLIC_SNAPSHOT_URL = 'https://monitoria-data.s3.eu-north-1.amazonaws.com/telegram_messages.parquet'
+PUBLIC_BUCKET_URL = 'https://monitoria-data.s3.eu-north-1.amazonaws.com'
+LOCAL_DATA_PATH = 'telegram_messages.json'
+LOCAL_SNAPSHOT_PATH = snapshot.SNAPSHOT_FILENAME
+LOCAL_DELTA_INDEX_PATH = os.path.join(*DELTA_INDEX_KEY.split('/'))
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -32,7 +58,8 @@ CORS(app, resources={
     r"/*": {
         "origins": ["http://localhost:3000", "http://192.168.1.142:3000", "http://app.monitoria.org", "http://13.60.219.71", "http://13.60.219.71:80", "http://13.60.219.71:8080"],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+        "expose_headers": ["ETag", "X-Dataset-Version", "X-Next-Cursor", "X-S3-Round-Trips"],
         "supports_credentials": True
     }
 })
@@ -46,114 +73,315 @@ with app.app_context():
     db.create_all()
 
 def load_data():
-    """Carga los datos desde S3 y maneja posibles errores."""
+    """Devuelve el DataFrame del dataset en caché, revalidándolo contra su origen."""
+    return load_dataset().df
+
+def load_dataset():
+    """Devuelve la versión actual del dataset (DataFrame normalizado y columnas tipadas).
+
+    Las etiquetas del diario que todavía no se han compactado se superponen al leerlo.
+    """
+    dataset = dataset_cache.get()
+    if not dataset.empty:
+        try:
+            label_journal.apply(dataset)
+        except Exception as e:
+            logger.error(f"Error al aplicar el diario de etiquetas: {e}")
+        if Config.TEXT_INDEX_WARMUP:
+            # Las búsquedas `q` no esperan a tokenizar todo el dataset en la primera petición
+            dataset.warm_text_index()
+    if has_request_context() and not dataset.empty:
+        # Se publica en la cabecera X-Dataset-Version de la respuesta
+        g.dataset_version = dataset.version_tag
+    return dataset
+
+def fetch_data():
+    """Descarga los datos desde S3 y devuelve (df, versión del origen)."""
     try:
+        # Estructura particionada: sólo se descargan las particiones nuevas o modificadas
+        if Config.PARTITIONED_SNAPSHOT and snapshot.is_available():
+            try:
+                loaded = fetch_partitions()
+                if loaded is not None:
+                    return loaded
+            except Exception as e:
+                logger.warning(f"No se pudo cargar la estructura particionada: {e}")
+
+        # Intentar cargar el snapshot columnar desde la URL pública (más ligero que el JSON)
+        if snapshot.is_available():
+            try:
+                logger.info("Intentando cargar snapshot Parquet desde URL pública de S3")
+                response = requests.get(PUBLIC_SNAPSHOT_URL, timeout=30)
+                if response.status_code == 200:
+                    # Se guarda en disco para leerlo mapeado en memoria
+                    os.makedirs(Config.SNAPSHOT_CACHE_DIR, exist_ok=True)
+                    local_path = os.path.join(Config.SNAPSHOT_CACHE_DIR, snapshot.SNAPSHOT_FILENAME)
+                    # Temporal propio: otro proceso puede estar descargando el mismo snapshot
+                    fd, tmp_path = tempfile.mkstemp(dir=Config.SNAPSHOT_CACHE_DIR, suffix='.tmp')
+                    try:
+                        with os.fdopen(fd, 'wb') as f:
+                            f.write(response.content)
+                        os.replace(tmp_path, local_path)
+                    except BaseException:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                        raise
+                    df = snapshot.read_snapshot(local_path, columns=Config.SNAPSHOT_COLUMNS)
+                    logger.info(f"Snapshot cargado desde URL pública, filas: {len(df)}")
+                    return df, ('url', PUBLIC_SNAPSHOT_URL, response.headers.get('ETag') or response.headers.get('Last-Modified'))
+            except Exception as e:
+                logger.warning(f"No se pudo cargar el snapshot desde URL pública: {e}")
+
         # Intentar cargar desde URL pública primero (más rápido)
         try:
             logger.info("Intentando cargar desde URL pública de S3")
-            import requests
-            response = requests.get('https://monitoria-data.s3.eu-north-1.amazonaws.com/telegram_messages.json', timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                df = pd.DataFrame(data['messages'])
-                logger.info(f"Datos cargados desde URL pública, filas: {len(df)}")
-                return df
+            with requests.get(PUBLIC_DATA_URL, timeout=30, stream=True) as response:
+                if response.status_code == 200:
+                    # Se parsea por bloques a medida que llega, sin tener el JSON entero en memoria
+                    df = read_messages(response.iter_content(chunk_size=READ_CHUNK_SIZE))
+                    logger.info(f"Datos cargados desde URL pública, filas: {len(df)}")
+                    return df, ('url', PUBLIC_DATA_URL, response.headers.get('ETag') or response.headers.get('Last-Modified'))
         except Exception as e:
             logger.warning(f"No se pudo cargar desde URL pública: {e}")
         
         # Intentar cargar desde S3 con credenciales
         s3_client = get_s3_client()
         
-        # Verificar conexión con S3
-        if not s3_client.check_connection():
-            logger.warning("No se pudo conectar con S3, intentando cargar desde archivo local")
-            return load_data_local()
-        
-        # Listar archivos disponibles en S3
-        files = s3_client.list_files()
+        # Listar archivos disponibles en S3 (el listado se reutiliza entre cargas; si S3 no
+        # responde, el error lleva al archivo local igual que antes la comprobación de conexión).
+        # Sólo las claves del dataset: las particiones y los deltas no caben en un listado
+        files = s3_client.list_files_cached('telegram_messages')
         logger.info(f"Archivos disponibles en S3: {files}")
         
-        # Buscar archivo de mensajes (prioridad: JSON, luego CSV)
+        # Buscar archivo de mensajes (prioridad: Parquet, luego JSON, luego CSV)
         messages_file = None
-        for file in files:
-            if 'telegram_messages' in file.lower():
-                if file.endswith('.json'):
-                    messages_file = file
-                    break
-                elif file.endswith('.csv') and not messages_file:
-                    messages_file = file
+        priority = ['.json', '.csv']
+        if snapshot.is_available():
+            priority.insert(0, '.parquet')
+        candidates = [file for file in files if 'telegram_messages' in file.lower() and 'relevant' not in file.lower()]
+        for extension in priority:
+            messages_file = next((file for file in candidates if file.endswith(extension)), None)
+            if messages_file:
+                break
         
         if not messages_file:
             logger.warning("No se encontró archivo de mensajes en S3, intentando archivo local")
-            return load_data_local()
+            return load_data_local(), local_data_version()
         
         logger.info(f"Cargando datos desde S3: {messages_file}")
+        # La versión se consulta antes de descargar: si cambia entre medias se recargará después
+        version = ('s3', messages_file, s3_client.get_object_version(messages_file))
         
         # Cargar datos según el formato del archivo
-        if messages_file.endswith('.json'):
-            data = s3_client.load_json_from_s3(messages_file)
-            df = pd.DataFrame(data['messages'])
+        if messages_file.endswith('.parquet'):
+            df = s3_client.load_parquet_from_s3(messages_file, columns=Config.SNAPSHOT_COLUMNS, version=version[2])
+        elif messages_file.endswith('.json'):
+            df = s3_client.load_messages_from_s3(messages_file)
         elif messages_file.endswith('.csv'):
             df = s3_client.load_csv_from_s3(messages_file)
         else:
             logger.error(f"Formato de archivo no soportado: {messages_file}")
-            return load_data_local()
-        
-        # Verificar y limpiar la columna Title (usada como Channel)
-        if 'Title' in df.columns:
-            # Limpiar valores nulos o vacíos
-            df['Title'] = df['Title'].fillna('Desconocido')
-            df['Title'] = df['Title'].replace('', 'Desconocido')
-        
-        # Convertir columnas de fecha si existen
-        date_columns = ['Date', 'Date Sent', 'Creation Date', 'Edit Date']
-        for col in date_columns:
-            if col in df.columns:
-                try:
-                    # Convertir a datetime y eliminar zona horaria
-                    df[col] = pd.to_datetime(df[col]).dt.tz_localize(None)
-                except Exception as e:
-                    logger.warning(f"Error al convertir la columna '{col}': {e}")
-                    if col in df.columns:
-                        del df[col]
+            return load_data_local(), local_data_version()
         
         logger.info(f"Datos cargados desde S3 exitosamente: {len(df)} mensajes")
-        return df
+        return df, version
 
     except Exception as e:
         logger.error(f"Error al cargar datos desde S3: {e}")
         logger.info("Intentando cargar desde archivo local como fallback")
-        return load_data_local()
+        return load_data_local(), local_data_version()
+
+def partition_window_start():
+    """Inicio (ns) del primer día que se mantiene en memoria, o None si se cargan todos."""
+    if Config.PARTITION_WINDOW_DAYS <= 0:
+        return None
+    today = pd.Timestamp.now(tz='UTC').tz_localize(None).normalize()
+    return (today - pd.Timedelta(days=Config.PARTITION_WINDOW_DAYS - 1)).value
+
+def fetch_partitions():
+    """Carga las particiones de la ventana de días configurada; None si no hay manifiesto."""
+    global partition_source
+    s3_client = get_s3_client()
+    manifest, etag = s3_client.load_manifest()
+    if manifest is None:
+        return None
+    since = partition_window_start()
+    entries = prune(manifest, since=since)
+    df = partition_cache.load(s3_client, entries, columns=Config.SNAPSHOT_COLUMNS)
+    partition_source = {'etag': etag, 'manifest': manifest, 'since': since}
+    logger.info(f"Datos cargados desde {len(entries)} de {len(manifest['partitions'])} particiones, filas: {len(df)}")
+    return df, ('s3', MANIFEST_KEY, etag)
+
+def dataset_for(query):
+    """Dataset con todas las filas que puede devolver `query`.
+
+    Es el dataset en memoria salvo que se cargue sólo una ventana de días y la consulta
+    empiece antes: entonces se forma (y se guarda en caché) con las particiones del
+    manifiesto que cumplen su canal y sus fechas.
+    """
+    dataset = load_dataset()
+    source = partition_source
+    if dataset.empty or source is None or source['since'] is None:
+        return dataset
+    # Sin fecha de inicio, o empezando dentro de la ventana, basta con el dataset en memoria
+    if query.date_start is None or query.date_start >= source['since']:
+        return dataset
+    if dataset.version != ('s3', MANIFEST_KEY, source['etag']):
+        return dataset
+
+    entries = prune(source['manifest'], query)
+    keys = tuple(entry['key'] for entry in entries)
+
+    def build():
+        df = partition_cache.load(get_s3_client(), entries, columns=Config.SNAPSHOT_COLUMNS)
+        return Dataset.from_frame(df, dataset.version + (keys,))
+
+    pruned = partition_cache.get(keys + (source['etag'],), build)
+    try:
+        label_journal.apply(pruned)
+    except Exception as e:
+        logger.error(f"Error al aplicar el diario de etiquetas: {e}")
+    if has_request_context():
+        g.dataset_version = pruned.version_tag
+    return pruned
+
+def store_for(dataset):
+    """Motor de consultas del dataset: los conjuntos podados se resuelven en memoria sin caché
+    compartida, para no desplazar las entradas del dataset principal."""
+    return message_store if dataset.version == dataset_cache.version else partition_store
+
+def fetch_data_with_deltas():
+    """Descarga el dataset (`fetch_data`) y le aplica los deltas publicados después de su base.
+
+    A la versión del origen se añaden (base_seq, latest_seq) del índice de deltas. Si el
+    scraper compacta entre la lectura del base y la del índice, la siguiente consulta de
+    versión ve un base o un base_seq distintos y se recarga entero.
+    """
+    df, version = fetch_data()
+    if not Config.DELTA_SNAPSHOTS or version is None or version[1] == MANIFEST_KEY:
+        return df, version
+    try:
+        index = delta_index(version[0])
+        if index is None:
+            return df, version
+        entries = pending_deltas(index, index['base_seq'])
+        if entries is None:
+            raise ValueError(f"secuencia de deltas incompleta en el índice ({index['latest_seq']})")
+        rows = delta_rows(version[0], entries)
+        if not rows.empty:
+            df = upsert_rows(normalize_dataframe(df), normalize_dataframe(rows))
+        logger.info(f"Deltas aplicados sobre el snapshot base: {len(entries)} ({len(rows)} filas)")
+        return df, version + (index['base_seq'], index['latest_seq'])
+    except Exception as e:
+        logger.warning(f"No se pudieron aplicar los deltas publicados: {e}")
+        return df, version
+
+def update_dataset(previous, current):
+    """Versión `current` construida desde `previous` con los deltas nuevos (None = carga completa).
+
+    Sólo es posible si el snapshot base y su base_seq no han cambiado; tras una compactación
+    del scraper el dataset se vuelve a cargar entero.
+    """
+    version = previous.version
+    if version is None or len(version) != 5 or len(current) != 5 or current[:4] != version[:4]:
+        return None
+    index = delta_index(version[0])
+    if index is None or index['base_seq'] != version[3]:
+        return None
+    entries = pending_deltas(index, version[4])
+    if not entries:
+        return None
+    rows = delta_rows(version[0], entries)
+    return previous.upsert(rows, version[:4] + (index['latest_seq'],))
+
+def delta_index(source):
+    """Índice de deltas publicado junto al origen `source` ('s3', 'url', 'local'), o None si no hay."""
+    if source == 's3':
+        index, _ = get_s3_client().load_delta_index()
+        return index
+    if source == 'url':
+        response = requests.get(f"{PUBLIC_BUCKET_URL}/{DELTA_INDEX_KEY}", timeout=5)
+        return response.json() if response.status_code == 200 else None
+    if source == 'local':
+        return read_index(LOCAL_DELTA_INDEX_PATH)
+    return None
+
+def delta_rows(source, entries):
+    """Filas de los deltas `entries` del origen `source` (la última versión de cada mensaje)."""
+    def load(entry):
+        if source == 's3':
+            return get_s3_client().load_json_from_s3(entry['key'])
+        if source == 'url':
+            response = requests.get(f"{PUBLIC_BUCKET_URL}/{entry['key']}", timeout=30)
+            response.raise_for_status()
+            return response.json()
+        with open(os.path.join(*entry['key'].split('/')), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    if source == 's3':
+        documents = get_s3_client().map_concurrently(load, entries)
+    else:
+        documents = [load(entry) for entry in entries]
+    return delta_frame(documents)
+
+def probe_data_version(version):
+    """Versión actual del origen de `version`, incluida la secuencia de deltas publicada."""
+    if version is not None and Config.DELTA_SNAPSHOTS and version[1] != MANIFEST_KEY:
+        base = probe_source_version(version[:3])
+        if base is None or base != version[:3]:
+            return base
+        index = delta_index(version[0])
+        return base if index is None else base + (index['base_seq'], index['latest_seq'])
+    return probe_source_version(version)
+
+def probe_source_version(version):
+    """Consulta de forma barata la versión actual del origen del que procede `version`."""
+    source = version[0] if version else None
+    if source == 'url':
+        # Petición condicional: si el objeto no ha cambiado el origen responde 304 sin cuerpo
+        tag = version[2]
+        headers = {}
+        if tag:
+            headers['If-None-Match' if tag.startswith(('"', 'W/')) else 'If-Modified-Since'] = tag
+        response = requests.head(version[1], headers=headers, timeout=5)
+        if response.status_code == 304:
+            return version
+        if response.status_code != 200:
+            return None
+        return ('url', version[1], response.headers.get('ETag') or response.headers.get('Last-Modified'))
+    if source == 's3':
+        return ('s3', version[1], get_s3_client().get_object_version(version[1], if_none_match=version[2]))
+    if source == 'local':
+        return local_data_version()
+    return None
+
+def local_data_path():
+    """Ruta del archivo local a cargar: el snapshot Parquet si existe, si no el JSON."""
+    if snapshot.is_available() and os.path.exists(LOCAL_SNAPSHOT_PATH):
+        return LOCAL_SNAPSHOT_PATH
+    return LOCAL_DATA_PATH
+
+def local_data_version():
+    """Versión del archivo local (fecha de modificación), o None si no existe."""
+    path = local_data_path()
+    if not os.path.exists(path):
+        return None
+    return ('local', path, os.stat(path).st_mtime_ns)
 
 def load_data_local():
-    """Carga los datos del archivo JSON local como fallback."""
+    """Carga los datos del archivo local (snapshot Parquet o JSON) como fallback."""
     try:
-        json_path = 'telegram_messages.json'
-        if not os.path.exists(json_path):
-            logger.warning(f"El archivo {json_path} no existe.")
+        data_path = local_data_path()
+        if not os.path.exists(data_path):
+            logger.warning(f"El archivo {data_path} no existe.")
             return pd.DataFrame()
         
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Convertir los mensajes a DataFrame
-        df = pd.DataFrame(data['messages'])
-        
-        # Verificar y limpiar la columna Title (usada como Channel)
-        if 'Title' in df.columns:
-            df['Title'] = df['Title'].fillna('Desconocido')
-            df['Title'] = df['Title'].replace('', 'Desconocido')
-        
-        # Convertir columnas de fecha si existen
-        date_columns = ['Date', 'Date Sent', 'Creation Date', 'Edit Date']
-        for col in date_columns:
-            if col in df.columns:
-                try:
-                    df[col] = pd.to_datetime(df[col]).dt.tz_localize(None)
-                except Exception as e:
-                    logger.warning(f"Error al convertir la columna '{col}': {e}")
-                    if col in df.columns:
-                        del df[col]
+        if data_path == LOCAL_SNAPSHOT_PATH:
+            df = snapshot.read_snapshot(data_path, columns=Config.SNAPSHOT_COLUMNS)
+        else:
+            # Los mensajes se pasan a columnas por lotes mientras se lee el archivo
+            with open(data_path, 'rb') as f:
+                df = read_messages(f)
         
         logger.info(f"Datos cargados desde archivo local: {len(df)} mensajes")
         return df
@@ -165,59 +393,175 @@ def load_data_local():
         logger.error(f"Error crítico al cargar el archivo JSON: {e}")
         return pd.DataFrame()
 
+def prepare_dataset(dataset):
+    """Prepara una versión nueva antes de publicarla (hilo de refresco del dataset)."""
+    with app.app_context():
+        label_journal.apply(dataset)
+    if Config.TEXT_INDEX_WARMUP and dataset.has_text:
+        dataset.text_index()
+    # Con MESSAGE_STORE=sqlite la base de datos de la versión se construye aquí, no en una petición
+    message_store.prepare(dataset)
+
+dataset_cache = DatasetCache(fetch_data_with_deltas, probe_data_version, ttl=Config.DATASET_CACHE_TTL,
+                             prepare=prepare_dataset, update=update_dataset)
+query_cache = QueryResultCache(max_bytes=Config.QUERY_CACHE_MAX_BYTES)
+message_store = create_message_store(Config.MESSAGE_STORE, query_cache, Config.MESSAGE_STORE_PATH)
+partition_store = PandasMessageStore(QueryResultCache(max_bytes=0))
+partition_cache = PartitionCache(os.path.join(Config.SNAPSHOT_CACHE_DIR, 'partitions'), max_entries=Config.PARTITION_CACHE_SIZE)
+# Manifiesto y ventana de días de la última carga particionada (None si el origen no lo es)
+partition_source = None
+fragment_cache = FragmentCache(max_entries=Config.FRAGMENT_CACHE_SIZE, max_bytes=Config.FRAGMENT_CACHE_MAX_BYTES)
+facet_cache = FacetCache()
+label_journal = LabelJournal()
+
+def flush_labels(entries):
+    """Escribe en el diario un lote de etiquetas agrupadas (hilo de LabelWriteBuffer)."""
+    with app.app_context():
+        return label_journal.append(entries)
+
+label_writes = LabelWriteBuffer(flush_labels,
+                                debounce=Config.LABEL_FLUSH_DEBOUNCE_MS / 1000,
+                                max_latency=Config.LABEL_FLUSH_MAX_LATENCY_MS / 1000)
+
 # Base de datos de usuarios (en producción usar una base de datos real)
 users_db = {}
 
+@app.before_request
+def before_request():
+    """Empieza a contar las idas y vueltas a S3 de esta petición.
+
+    Con gunicorn no se pasa por `__main__`: los hilos de fondo se lanzan con la primera petición.
+    """
+    if not _background_started:
+        start_background_tasks()
+    s3_metrics.begin_request()
+
+@app.after_request
+def after_request(response):
+    """Añade X-Dataset-Version (y X-S3-Round-Trips) y comprime las respuestas grandes según Accept-Encoding."""
+    round_trips = s3_metrics.end_request()
+    if round_trips:
+        response.headers['X-S3-Round-Trips'] = str(round_trips)
+    return finalize_response(response)
+
 @app.route('/health')
 def health_check():
     """Endpoint para verificar el estado del servicio."""
     return jsonify({"status": "healthy"}), 200
 
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    """Devuelve los contadores de la caché del dataset."""
+    return jsonify(success=True, cache=dataset_cache.stats(), queries=message_store.stats(),
+                   fragments=fragment_cache.stats(), facets=facet_cache.stats(), labels=label_journal.stats(),
+                   label_writes=label_writes.stats(), s3=s3_metrics.stats(), partitions=partition_cache.stats())
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """Invalida la caché del dataset (p. ej. tras publicar un nuevo scrape)."""
+    dataset_cache.invalidate()
+    return jsonify(success=True)
+
 
-def save_data(df):
-    """Guarda los datos en S3."""
+def save_data(df, if_match=None):
+    """Guarda los datos en S3 (JSON y, si hay pyarrow, también el snapshot Parquet).
+
+    Las claves de `if_match` ({clave: ETag}) sólo se sobrescriben si no han cambiado en S3
+    desde que se leyeron, y se escriben primero: si otra escritura (p. ej. del scraper) se
+    ha adelantado, no se sube nada y se devuelve False.
+    """
+    if_match = if_match or {}
     try:
-        # Convertir DataFrame a JSON
-        json_data = json.dumps({'messages': df.to_dict(orient='records')})
-        
-        # Subir a S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=S3_KEY,
-            Body=json_data.encode('utf-8'),
-            ContentType='application/json'
-        )
+        s3 = get_s3_client().s3_client
+
+        def put(key, body, **extra):
+            if key in if_match:
+                extra['IfMatch'] = if_match[key]
+            s3.put_object(Bucket=S3_BUCKET, Key=key, Body=body, **extra)
+
+        def put_json():
+            # Convertir DataFrame a JSON (fechas en ISO y nulos como null)
+            json_data = dumps({'messages': records(df, columns=list(df.columns))})
+            put(S3_KEY, json_data, ContentType='application/json')
+
+        def put_snapshot():
+            os.makedirs(Config.SNAPSHOT_CACHE_DIR, exist_ok=True)
+            local_path = snapshot.write_snapshot(df, os.path.join(Config.SNAPSHOT_CACHE_DIR, 'upload.parquet'))
+            with open(local_path, 'rb') as f:
+                put(snapshot.SNAPSHOT_FILENAME, f)
+
+        uploads = [put_json]
+        # El snapshot tiene prioridad al cargar: se reescribe para que no quede desfasado
+        if snapshot.is_available():
+            uploads.append(put_snapshot)
+            if snapshot.SNAPSHOT_FILENAME in if_match:
+                uploads.reverse()
+        for upload in uploads:
+            upload()
+        # Los datos en memoria ya no coinciden con el origen
+        dataset_cache.invalidate()
         return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('PreconditionFailed', '412'):
+            logger.warning("El dataset ha cambiado en S3 desde que se cargó: no se sobrescribe")
+            dataset_cache.invalidate()
+            return False
+        print(f"Error al guardar en S3: {e}")
+        return False
+    except ParamValidationError as e:
+        # Un boto3/botocore anterior a 1.35.69 no admite IfMatch en put_object
+        logger.error(f"Parámetros de put_object no válidos (¿boto3/botocore sin escritura condicional?): {e}")
+        return False
     except Exception as e:
         print(f"Error al guardar en S3: {e}")
         return False
 
+def source_etags(version):
+    """{clave S3: ETag} del objeto del que se cargó `version` ({} si no procede de S3 o no hay ETag)."""
+    if version is None or not isinstance(version[2], str) or not version[2].startswith('"'):
+        return {}
+    if version[0] == 's3':
+        return {version[1]: version[2]}
+    if version[0] == 'url' and version[1].startswith(f"{PUBLIC_BUCKET_URL}/"):
+        return {version[1][len(PUBLIC_BUCKET_URL) + 1:]: version[2]}
+    return {}
+
 @app.route('/')
 def index():
     """Renderiza la página principal con los mensajes ordenados por puntuación."""
-    df = load_data()
+    dataset = load_dataset()
+    df = dataset.df
     if df.empty:
         return render_template('index.html', messages=[], channels=[], min_date='', max_date='')
 
+    etag = make_etag(dataset, 'index')
+    if is_not_modified(etag):
+        return not_modified(etag)
+
     # Preparar datos para la plantilla inicial
-    sorted_df = df.sort_values(by='Score', ascending=False) if 'Score' in df.columns else df
-    displayed_df = sorted_df.head(MESSAGES_LIMIT)
-    messages = displayed_df[['Embed', 'Score', 'Message ID', 'URL', 'Label']].to_dict(orient='records') if not displayed_df.empty else []
+    displayed_df = df.iloc[message_store.get(dataset, Query(), MESSAGES_LIMIT).page(0, MESSAGES_LIMIT)]
+    messages = displayed_df[[col for col in CARD_COLUMNS if col in displayed_df.columns]].to_dict(orient='records') if not displayed_df.empty else []
 
     # Obtener datos para filtros (canales, fechas)
     channels = []
-    if 'Title' in df.columns:
-        channels = sorted(df['Title'].unique().tolist())
+    if dataset.channel is not None:
+        # Las categorías de la columna de canal ya están ordenadas
+        channels = dataset.channel.categories.tolist()
         print(f"\nCanales que se pasan a la plantilla: {channels}")
     
     min_date = df['Date'].min().strftime('%Y-%m-%d') if 'Date' in df.columns and not df['Date'].empty else ''
     max_date = df['Date'].max().strftime('%Y-%m-%d') if 'Date' in df.columns and not df['Date'].empty else ''
 
-    return render_template('index.html', messages=messages, channels=channels, min_date=min_date, max_date=max_date)
+    response = make_response(render_template('index.html', messages=messages, channels=channels, min_date=min_date, max_date=max_date))
+    response.set_etag(etag)
+    return response
 
 @app.route('/load_more/<int:offset>', methods=['GET'])
 def load_more(offset=0):
-    """Carga más mensajes a partir de un offset dado."""
+    """Carga más mensajes a partir de un offset dado o de un cursor (`?cursor=`).
+
+    El cursor para la página siguiente se devuelve en la cabecera X-Next-Cursor.
+    """
     try:
         # Obtener los filtros de la URL
         filters = {
@@ -227,95 +571,52 @@ def load_more(offset=0):
             'scoreMin': request.args.get('scoreMin'),
             'scoreMax': request.args.get('scoreMax'),
             'mediaType': request.args.get('mediaType'),
+            'q': request.args.get('q'),
             'sortBy': request.args.get('sortBy', 'score')
         }
 
-        df = load_data()
-        if df.empty:
-            return ('', 204) # No Content
-
         # Aplicar los mismos filtros que en /filter_messages
-        filtered_df = df.copy()
-
-        # Filtro de Fecha (Rango)
-        if 'Date Sent' in filtered_df.columns:
-            try:
-                filtered_df['Date Sent'] = pd.to_datetime(filtered_df['Date Sent']).dt.tz_localize(None)
-                
-                if filters['dateStart']:
-                    date_start = pd.to_datetime(filters['dateStart']).normalize()
-                    filtered_df = filtered_df[filtered_df['Date Sent'].dt.normalize() >= date_start]
-                
-                if filters['dateEnd']:
-                    date_end = pd.to_datetime(filters['dateEnd']).normalize() + pd.Timedelta(days=1)
-                    filtered_df = filtered_df[filtered_df['Date Sent'].dt.normalize() < date_end]
-            except Exception as e:
-                print(f"Error en filtro de fechas: {str(e)}")
-                return ('', 204)
-
-        # Filtro de Canal
-        if filters['channel'] and 'Title' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['Title'] == filters['channel']]
-
-        # Filtro de Puntuación (Score) Mínima
-        if filters['scoreMin'] and 'Score' in filtered_df.columns:
-            try:
-                score_min = float(filters['scoreMin'])
-                filtered_df['Score'] = pd.to_numeric(filtered_df['Score'], errors='coerce')
-                filtered_df = filtered_df[filtered_df['Score'] >= score_min]
-            except:
-                pass
-
-        # Filtro de Puntuación (Score) Máxima
-        if filters['scoreMax'] and 'Score' in filtered_df.columns:
-            try:
-                score_max = float(filters['scoreMax'])
-                filtered_df['Score'] = pd.to_numeric(filtered_df['Score'], errors='coerce')
-                filtered_df = filtered_df[filtered_df['Score'] <= score_max]
-            except:
-                pass
-
-        # Filtro de Tipo de Media
-        if filters['mediaType'] and 'Media Type' in filtered_df.columns:
-            try:
-                filtered_df['Media Type'] = filtered_df['Media Type'].astype(str).str.lower()
-                filtered_df = filtered_df[filtered_df['Media Type'] == str(filters['mediaType']).lower()]
-            except:
-                pass
-
-        # Ordenar
-        if filters['sortBy'] == 'views' and 'Views' in filtered_df.columns:
-            filtered_df['Views'] = pd.to_numeric(filtered_df['Views'], errors='coerce')
-            sorted_df = filtered_df.sort_values(by='Views', ascending=False)
-        elif 'Score' in filtered_df.columns:
-            filtered_df['Score'] = pd.to_numeric(filtered_df['Score'], errors='coerce')
-            sorted_df = filtered_df.sort_values(by='Score', ascending=False)
-        else:
-            sorted_df = filtered_df
+        try:
+            query = Query.from_filters(filters)
+            dataset = dataset_for(query)
+            if dataset.empty:
+                return ('', 204) # No Content
+            cursor = request.args.get('cursor')
+            etag = make_etag(dataset, 'load_more', query.key(), offset, cursor)
+            if is_not_modified(etag):
+                return not_modified(etag)
+            store = store_for(dataset)
+            if cursor:
+                # El cursor sustituye al offset: continúa tras la última fila servida
+                result, offset = store.seek(dataset, query, cursor, 24)
+            else:
+                result = store.get(dataset, query, offset+24)
+        except QueryError as e:
+            print(str(e))
+            return ('', 204)
 
         # Asegúrate de que el índice no esté fuera de los límites
-        if offset >= len(sorted_df):
+        if offset >= result.total:
             return ('', 204) # No hay más mensajes que cargar
 
-        displayed_df = sorted_df.iloc[offset:offset+24]
+        positions = result.page(offset, offset+24)
 
-        # Si displayed_df está vacío después de iloc
-        if displayed_df.empty:
+        # Si la página está vacía
+        if len(positions) == 0:
             return ('', 204)
 
         # Preparar mensajes
-        messages = []
-        for _, row in displayed_df.iterrows():
-            msg = {}
-            msg['Embed'] = row.get('Embed', '')
-            score = row.get('Score')
-            msg['Score'] = round(score, 2) if pd.notna(score) and isinstance(score, (int, float)) else 'N/A'
-            msg['Message ID'] = row.get('Message ID', '')
-            msg['URL'] = row.get('URL', '')
-            msg['Label'] = row.get('Label', None)
-            messages.append(msg)
-
-        return render_template('message_cards_partial.html', messages=messages)
+        messages = records(dataset.df, positions, CARD_COLUMNS)
+        for msg in messages:
+            msg['Score'] = round(msg['Score'], 2) if isinstance(msg['Score'], (int, float)) else 'N/A'
+
+        # Las tarjetas ya renderizadas se reutilizan desde la caché de fragmentos
+        response = make_response(fragment_cache.render(messages))
+        response.set_etag(etag)
+        next_offset = offset + len(positions)
+        if next_offset < result.total:
+            response.headers['X-Next-Cursor'] = encode_cursor(dataset, query, result, next_offset)
+        return response
 
     except Exception as e:
         print(f"Error en load_more: {str(e)}")
@@ -331,82 +632,238 @@ def label_message():
 
         message_id = int(data['message_id'])
         label = int(data['label'])
+        username = data.get('username') or None
 
-        df = load_data()
-        if df.empty:
+        dataset = load_dataset()
+        if dataset.empty:
             return jsonify(success=False, error="No hay datos disponibles o error al cargar"), 404
 
         # Verifica si la columna 'Message ID' existe
-        if 'Message ID' not in df.columns:
+        if 'Message ID' not in dataset.df.columns:
             return jsonify(success=False, error="La columna 'Message ID' no existe en el archivo JSON"), 500
 
         # Verifica si el message_id existe en el DataFrame
-        if message_id not in df['Message ID'].values:
+        entries = label_entries(dataset, message_id, username, label)
+        if not entries:
             print(f"Advertencia: message_id {message_id} no encontrado en el DataFrame para etiquetar.")
             return jsonify(success=True, message="Message ID no encontrado, pero operación ignorada.")
 
-        # Actualiza el DataFrame
-        if 'Label' not in df.columns:
-            df['Label'] = pd.NA
-
-        df.loc[df['Message ID'] == message_id, 'Label'] = label
-
-        # Guarda en S3
-        if not save_data(df):
-            return jsonify(success=False, error="Error al guardar cambios en S3"), 500
+        # Se añade al diario junto con las de otras peticiones concurrentes
+        sequence = label_writes.submit(entries)
 
+        # Sólo cambia la tarjeta de este mensaje
+        fragment_cache.invalidate(message_id)
+        if sequence is None:
+            return jsonify(success=True, status='pending'), 202
         return jsonify(success=True)
+    except TimeoutError:
+        return label_timeout()
     except ValueError as e:
         return jsonify(success=False, error=f"Error en los datos de entrada: {str(e)}"), 400
     except Exception as e:
         print(f"Error inesperado en /label: {e}")
         return jsonify(success=False, error=f"Error inesperado en el servidor: {str(e)}"), 500
 
-@app.route('/export_relevants', methods=['GET'])
-def export_relevants():
-    """Exporta los mensajes etiquetados como relevantes a un nuevo archivo CSV."""
+@app.route('/label/batch', methods=['POST'])
+def label_messages_batch():
+    """Etiqueta varios mensajes de una vez: {"labels": [{"message_id", "username", "label"}, ...]}."""
     try:
-        df = load_data()
-        if df.empty:
+        data = request.json
+        if not data or not isinstance(data.get('labels'), list):
+            return jsonify(success=False, error="Datos incompletos"), 400
+        if len(data['labels']) > LABEL_BATCH_LIMIT:
+            return jsonify(success=False, error=f"Máximo {LABEL_BATCH_LIMIT} etiquetas por petición"), 400
+
+        dataset = load_dataset()
+        if dataset.empty:
             return jsonify(success=False, error="No hay datos disponibles o error al cargar"), 404
+        if 'Message ID' not in dataset.df.columns:
+            return jsonify(success=False, error="La columna 'Message ID' no existe en el archivo JSON"), 500
 
-        # Verifica si la columna 'Label' existe
-        if 'Label' not in df.columns:
-            return jsonify(success=False, error="No hay columna 'Label' para filtrar mensajes relevantes"), 404
+        entries, not_found = [], []
+        for item in data['labels']:
+            if not isinstance(item, dict) or 'message_id' not in item or 'label' not in item:
+                return jsonify(success=False, error="Datos incompletos"), 400
+            message_id = int(item['message_id'])
+            matched = label_entries(dataset, message_id, item.get('username') or None, int(item['label']))
+            if matched:
+                entries.extend(matched)
+            else:
+                not_found.append(message_id)
+
+        sequence = None
+        if entries:
+            sequence = label_writes.submit(entries)
+            for message_id in {entry[1] for entry in entries}:
+                fragment_cache.invalidate(message_id)
+
+        if entries and sequence is None:
+            return jsonify(success=True, status='pending', labeled=len(entries), not_found=not_found), 202
+        return jsonify(success=True, labeled=len(entries), not_found=not_found)
+    except TimeoutError:
+        return label_timeout()
+    except ValueError as e:
+        return jsonify(success=False, error=f"Error en los datos de entrada: {str(e)}"), 400
+    except Exception as e:
+        print(f"Error inesperado en /label/batch: {e}")
+        return jsonify(success=False, error=f"Error inesperado en el servidor: {str(e)}"), 500
 
-        # Filtra los mensajes etiquetados como relevantes (Label == 1)
-        # Maneja posibles NaNs o tipos incorrectos en 'Label'
+def label_timeout():
+    """Respuesta cuando la escritura de etiquetas no empezó a tiempo (se retiraron: no se aplican)."""
+    return jsonify(success=False, error="La escritura de etiquetas no se completó a tiempo; no se ha guardado"), 503
+
+def label_entries(dataset, message_id, username, label):
+    """Entradas (username, message_id, label) del diario para un clic; vacío si el mensaje no existe.
+
+    Sin username se etiquetan todos los canales con ese Message ID, como antes.
+    """
+    positions = dataset.locate(message_id, username)
+    if not positions:
+        # Con una ventana de días en memoria, los mensajes anteriores sólo llegan con su canal
+        if username and partition_source is not None and partition_source['since'] is not None:
+            return [(username, message_id, label)]
+        return []
+    if username:
+        usernames = [username]
+    elif 'Username' in dataset.df.columns:
+        usernames = dataset.df['Username'].iloc[positions].astype(str).unique().tolist()
+    else:
+        usernames = ['']
+    return [(user, message_id, label) for user in usernames]
+
+def compact_labels():
+    """Vuelca al dataset de origen las etiquetas del diario y recorta las ya volcadas."""
+    with app.app_context():
+        if not label_journal.pending():
+            return
+        if Config.SNAPSHOT_COLUMNS:
+            # Con proyección de columnas el dataset en memoria está incompleto y no se puede reescribir
+            logger.warning("SNAPSHOT_COLUMNS está definido: no se compacta el diario de etiquetas")
+            return
+        dataset = load_dataset()
+        if dataset.empty:
+            return
+        if partition_source is not None and dataset.version == ('s3', MANIFEST_KEY, partition_source['etag']):
+            # El origen es la estructura particionada: las etiquetas se siguen superponiendo desde el diario
+            logger.warning("El dataset procede de particiones: no se compacta el diario de etiquetas")
+            return
+        # El dataset en memoria puede ir por detrás del origen (refresco periódico, deltas
+        # sin aplicar): no se reescribe encima de una versión más nueva
         try:
-            # Intentar convertir a numérico (float), luego comparar con 1.0
-            relevant_df = df[pd.to_numeric(df['Label'], errors='coerce') == 1.0]
+            current = probe_data_version(dataset.version)
         except Exception as e:
-             print(f"Error al filtrar relevantes por Label: {e}")
-             return jsonify(success=False, error="Error al procesar la columna 'Label'"), 500
+            logger.warning(f"No se pudo consultar la versión del dataset: {e}")
+            current = None
+        if current != dataset.version:
+            logger.info(f"El origen ha cambiado ({dataset.version} -> {current}): se compactará sobre la versión nueva")
+            return
+        if save_data(dataset.df.copy(), if_match=source_etags(dataset.version)):
+            label_journal.truncate(dataset.label_seq)
+
+_background_lock = threading.Lock()
+_background_started = False
+
+def start_background_tasks():
+    """Lanza (una sola vez) los hilos de fondo del proceso que sirve las peticiones.
+
+    No se lanzan al importar el módulo: el proceso padre del recargador de Werkzeug y los
+    scripts que importan `app` (init_db.py) no deben cargar su propia copia del dataset ni
+    compactar el diario de etiquetas (sólo un proceso reescribe el dataset en S3).
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    dataset_cache.start_refresher(Config.DATASET_REFRESH_INTERVAL)
+    label_journal.start_compaction(compact_labels, Config.LABEL_COMPACTION_INTERVAL)
+
+def export_request(filters, default_format='csv'):
+    """(dataset, posiciones, columnas, formato) de una exportación a partir de sus parámetros.
+
+    Además de los filtros de /filter_messages acepta `format` (csv | ndjson | parquet),
+    `columns` (separadas por comas) y `label` ('relevant', 'irrelevant', 'labeled',
+    'unlabeled' o valores separados por comas). Con `sortBy` se exporta en ese orden; sin
+    él, en el orden del dataset.
+    """
+    fmt = (filters.get('format') or default_format).lower()
+    if fmt not in export_formats():
+        raise ExportError(f"Formato no soportado: {fmt}")
+    query = Query.from_filters(filters)
+    dataset = dataset_for(query)
+    columns = parse_columns(dataset.df, filters.get('columns'))
+    positions = export_positions(dataset, query, filters.get('label'), ordered=bool(filters.get('sortBy')))
+    return dataset, positions, columns, fmt
+
+def upload_export(dataset, positions, columns, fmt, s3_key):
+    """Sube la exportación a S3 por partes; devuelve los bytes subidos."""
+    content_type = EXPORT_FORMATS[fmt][0]
+    return get_s3_client().upload_stream(iter_export(dataset.df, positions, columns, fmt), s3_key, content_type=content_type)
+
+@app.route('/export', methods=['GET', 'POST'])
+def export():
+    """Exporta los mensajes filtrados en streaming, como descarga o subida multiparte a S3.
+
+    Con `destination=s3` el archivo se sube con un nombre generado bajo exports/ y se
+    responde con un resumen en JSON (con la clave); si no, se envía por partes en la respuesta.
+    """
+    try:
+        filters = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args.to_dict()
+        try:
+            if filters.get('key'):
+                # El cliente no elige la clave: podría sobrescribir el dataset, el manifiesto o los deltas
+                raise ExportError("No se admite 'key': la clave de la exportación la genera el servidor")
+            dataset, positions, columns, fmt = export_request(filters)
+        except (ExportError, QueryError) as e:
+            return jsonify(success=False, error=str(e)), 400
+        if dataset.empty:
+            return jsonify(success=False, error="No hay datos disponibles o error al cargar"), 404
+
+        mimetype, extension = EXPORT_FORMATS[fmt]
+        filename = f"telegram_messages_export.{extension}"
+        if filters.get('destination') == 's3':
+            s3_key = export_key(fmt)
+            size = upload_export(dataset, positions, columns, fmt, s3_key)
+            return jsonify(success=True, key=s3_key, rows=len(positions), bytes=size)
+
+        response = Response(stream_with_context(iter_export(dataset.df, positions, columns, fmt)), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['X-Export-Rows'] = str(len(positions))
+        return response
+
+    except Exception as e:
+        print(f"Error inesperado en /export: {e}")
+        return jsonify(success=False, error=f"Error inesperado en el servidor: {str(e)}"), 500
+
+@app.route('/export_relevants', methods=['GET'])
+def export_relevants():
+    """Exporta los mensajes etiquetados como relevantes a S3 (CSV subido por partes)."""
+    try:
+        try:
+            dataset, positions, columns, fmt = export_request({'label': 'relevant'})
+        except ExportError as e:
+            return jsonify(success=False, error=str(e)), 404
+        if dataset.empty:
+            return jsonify(success=False, error="No hay datos disponibles o error al cargar"), 404
 
-        if relevant_df.empty:
+        if len(positions) == 0:
             return jsonify(success=True, message="No hay mensajes etiquetados como relevantes para exportar."), 200 # O 404 si prefieres error
 
-        # Guarda en un nuevo CSV tanto localmente como en S3
         export_path = 'telegram_messages_relevant.csv'
         try:
-            # Guardar localmente
-            relevant_df.to_csv(export_path, index=False, encoding='utf-8')
+            upload_export(dataset, positions, columns, fmt, export_path)
+            logger.info("Mensajes relevantes exportados a S3")
+            return jsonify(success=True, message="Exportado a S3")
+        except Exception as s3_error:
+            logger.warning(f"Error al exportar a S3: {s3_error}, se exporta localmente")
+
+        # Sin S3 se escribe el archivo local por lotes, igual que en streaming
+        try:
+            with open(export_path, 'wb') as f:
+                for chunk in iter_export(dataset.df, positions, columns, fmt):
+                    f.write(chunk)
             logger.info(f"Mensajes relevantes exportados localmente a {export_path}")
-            
-            # Intentar guardar en S3
-            try:
-                s3_client = get_s3_client()
-                if s3_client.check_connection():
-                    s3_client.upload_dataframe(relevant_df, 'telegram_messages_relevant.csv', format='csv')
-                    logger.info("Mensajes relevantes exportados a S3")
-                    return jsonify(success=True, message=f"Exportado localmente y a S3")
-                else:
-                    logger.warning("No se pudo conectar con S3, solo se exportó localmente")
-                    return jsonify(success=True, message=f"Exportado localmente a {export_path}")
-            except Exception as s3_error:
-                logger.warning(f"Error al exportar a S3: {s3_error}, solo se exportó localmente")
-                return jsonify(success=True, message=f"Exportado localmente a {export_path}")
-                
+            return jsonify(success=True, message=f"Exportado localmente a {export_path}")
         except Exception as e:
             logger.error(f"Error al guardar el archivo CSV de relevantes: {e}")
             return jsonify(success=False, error=f"Error al guardar el archivo exportado: {str(e)}"), 500
@@ -423,95 +880,18 @@ def filter_messages():
         if not filters:
             return jsonify(success=False, error="No se proporcionaron filtros"), 400
 
-        df = load_data()
-        if df.empty:
-            return jsonify(success=True, messages=[], total_messages=0)
-
-        # --- Aplicar filtros ---
-        filtered_df = df.copy()
-
-        # Filtro de Fecha (Rango)
-        date_start_str = filters.get('dateStart')
-        date_end_str = filters.get('dateEnd')
-        if 'Date Sent' in filtered_df.columns:
-            try:
-                # Asegurarnos de que la columna Date Sent esté en el formato correcto
-                filtered_df['Date Sent'] = pd.to_datetime(filtered_df['Date Sent']).dt.tz_localize(None)
-                
-                if date_start_str:
-                    # Convertir la fecha de inicio a datetime sin zona horaria
-                    date_start = pd.to_datetime(date_start_str).normalize()
-                    filtered_df = filtered_df[filtered_df['Date Sent'].dt.normalize() >= date_start]
-                
-                if date_end_str:
-                    # Convertir la fecha de fin a datetime sin zona horaria y añadir un día
-                    date_end = pd.to_datetime(date_end_str).normalize() + pd.Timedelta(days=1)
-                    filtered_df = filtered_df[filtered_df['Date Sent'].dt.normalize() < date_end]
-                
-            except Exception as e:
-                print(f"Error en filtro de fechas: {str(e)}")
-                return jsonify(success=False, error=f"Error en filtro de fechas: {str(e)}"), 400
-
-        # Filtro de Canal (usando Title)
-        channel = filters.get('channel')
-        if channel and 'Title' in filtered_df.columns:
-            try:
-                filtered_df = filtered_df[filtered_df['Title'] == channel]
-                print(f"Filtrado por canal: {channel}")
-            except Exception as e:
-                print(f"Error en filtro de canal: {str(e)}")
-                return jsonify(success=False, error=f"Error en filtro de canal: {str(e)}"), 400
-
-        # Filtro de Puntuación (Score) Mínima
-        score_min_str = filters.get('scoreMin')
-        if score_min_str and 'Score' in filtered_df.columns:
-            try:
-                score_min = float(score_min_str)
-                filtered_df['Score'] = pd.to_numeric(filtered_df['Score'], errors='coerce')
-                filtered_df = filtered_df[filtered_df['Score'] >= score_min]
-                print(f"Filtrado por score mínimo: {score_min}")
-            except Exception as e:
-                print(f"Error en filtro de score mínimo: {str(e)}")
-                return jsonify(success=False, error=f"Error en filtro de score mínimo: {str(e)}"), 400
-
-        # Filtro de Puntuación (Score) Máxima
-        score_max_str = filters.get('scoreMax')
-        if score_max_str and 'Score' in filtered_df.columns:
-            try:
-                score_max = float(score_max_str)
-                filtered_df['Score'] = pd.to_numeric(filtered_df['Score'], errors='coerce')
-                filtered_df = filtered_df[filtered_df['Score'] <= score_max]
-                print(f"Filtrado por score máximo: {score_max}")
-            except Exception as e:
-                print(f"Error en filtro de score máximo: {str(e)}")
-                return jsonify(success=False, error=f"Error en filtro de score máximo: {str(e)}"), 400
-
-        # Filtro de Tipo de Media
-        media_type = filters.get('mediaType')
-        if media_type and 'Media Type' in filtered_df.columns:
-            try:
-                filtered_df['Media Type'] = filtered_df['Media Type'].astype(str).str.lower()
-                filtered_df = filtered_df[filtered_df['Media Type'] == str(media_type).lower()]
-                print(f"Filtrado por tipo de media: {media_type}")
-            except Exception as e:
-                print(f"Error en filtro de tipo de media: {str(e)}")
-                return jsonify(success=False, error=f"Error en filtro de tipo de media: {str(e)}"), 400
-
-        # Ordenar y preparar resultados
-        sort_by = filters.get('sortBy', 'score')
+        # --- Aplicar filtros (una única máscara sobre las columnas normalizadas) ---
         try:
-            if sort_by == 'views' and 'Views' in filtered_df.columns:
-                filtered_df['Views'] = pd.to_numeric(filtered_df['Views'], errors='coerce')
-                sorted_df = filtered_df.sort_values(by='Views', ascending=False)
-            elif 'Score' in filtered_df.columns:
-                filtered_df['Score'] = pd.to_numeric(filtered_df['Score'], errors='coerce')
-                sorted_df = filtered_df.sort_values(by='Score', ascending=False)
-            else:
-                sorted_df = filtered_df
-            print(f"Ordenado por: {sort_by}")
-        except Exception as e:
-            print(f"Error al ordenar los datos: {e}")
-            sorted_df = filtered_df
+            query = Query.from_filters(filters)
+        except QueryError as e:
+            print(str(e))
+            return jsonify(success=False, error=str(e)), 400
+        print(f"Filtros aplicados: {query.key()}")
+
+        dataset = dataset_for(query)
+        if dataset.empty:
+            return jsonify(success=True, messages=[], total_messages=0)
+        store = store_for(dataset)
 
         # Paginación
         try:
@@ -537,8 +917,19 @@ def filter_messages():
             start_idx = (page - 1) * per_page
             end_idx = start_idx + per_page
 
-            # Seleccionar solo los mensajes de la página actual
-            paginated_df = sorted_df.iloc[start_idx:end_idx]
+            # Seleccionar solo los mensajes de la página actual (del resultado en caché si existe);
+            # con cursor se ignora `page` y se continúa tras la última fila servida
+            # Si el cliente ya tiene esta misma página de esta versión no se ejecuta la consulta
+            cursor = filters.get('cursor')
+            etag = make_etag(dataset, 'filter_messages', query.key(), page, per_page, cursor, bool(filters.get('explain')))
+            if is_not_modified(etag):
+                return not_modified(etag)
+            if cursor:
+                result, start_idx = store.seek(dataset, query, cursor, per_page)
+                end_idx = start_idx + per_page
+            else:
+                result = store.get(dataset, query, end_idx)
+            positions = result.page(start_idx, end_idx)
             print(f"Paginación: página {page}, {per_page} mensajes por página")
         except Exception as e:
             print(f"Error en paginación: {str(e)}")
@@ -546,27 +937,58 @@ def filter_messages():
 
         # Seleccionar columnas y convertir a dict
         try:
-            required_columns = ['Embed', 'Score', 'Message ID', 'URL', 'Label']
-            messages = []
-            for _, row in paginated_df.iterrows():
-                msg = {}
-                for col in required_columns:
-                    if col in row:
-                        msg[col] = row[col] if pd.notna(row[col]) else None
-                    else:
-                        msg[col] = None
-                messages.append(msg)
+            messages = records(dataset.df, positions, CARD_COLUMNS)
             print(f"Total de mensajes filtrados: {len(messages)}")
         except Exception as e:
             print(f"Error al preparar mensajes: {str(e)}")
             return jsonify(success=False, error=f"Error al preparar mensajes: {str(e)}"), 400
 
-        return jsonify(success=True, messages=messages, total_messages=len(sorted_df))
+        next_cursor = None
+        if end_idx < result.total:
+            next_cursor = encode_cursor(dataset, query, result, end_idx)
+
+        response = {'success': True, 'messages': messages, 'total_messages': result.total, 'next_cursor': next_cursor}
+        if filters.get('explain'):
+            response['explain'] = query.explain(dataset, start_idx, end_idx)
+        response = json_response(response)
+        response.set_etag(etag)
+        return response
 
     except Exception as e:
         print(f"Error crítico en /filter_messages: {e}")
         return jsonify(success=False, error=f"Error al procesar los filtros: {str(e)}"), 500
 
+@app.route('/facets', methods=['GET', 'POST'])
+def facets():
+    """Recuentos por canal, tipo de medio y día para los filtros actuales.
+
+    Acepta los mismos filtros que /filter_messages (JSON en POST o query string en GET).
+    Cada faceta se cuenta sin aplicar su propio filtro.
+    """
+    try:
+        filters = request.get_json(silent=True) if request.method == 'POST' else request.args.to_dict()
+        try:
+            query = Query.from_filters(filters)
+        except QueryError as e:
+            return jsonify(success=False, error=str(e)), 400
+
+        dataset = dataset_for(query)
+        if dataset.empty:
+            return jsonify(success=True, facets={'total': 0, 'channels': [], 'media_types': [], 'days': []})
+
+        etag = make_etag(dataset, 'facets', query.key())
+        if is_not_modified(etag):
+            return not_modified(etag)
+
+        # Los conjuntos podados no pasan por la caché de facetas del dataset principal
+        facets = facet_cache.get(dataset, query) if store_for(dataset) is message_store else compute_facets(dataset, query)
+        response = json_response({'success': True, 'facets': facets})
+        response.set_etag(etag)
+        return response
+    except Exception as e:
+        print(f"Error en /facets: {e}")
+        return jsonify(success=False, error=f"Error al calcular las facetas: {str(e)}"), 500
+
 # Nueva ruta para renderizar el parcial HTML
 @app.route('/render_partial', methods=['POST'])
 def render_partial():
@@ -589,7 +1011,8 @@ def render_partial():
             else:
                  msg['Score'] = 'N/A' # Valor por defecto
 
-        return render_template('message_cards_partial.html', messages=messages)
+        # Las tarjetas las envía el cliente: no se guardan en la caché compartida de fragmentos
+        return fragment_cache.render(messages, cache=False)
     except Exception as e:
         print(f"Error en /render_partial: {e}")
         # Devuelve un error HTML o un estado 500
@@ -631,26 +1054,60 @@ def login():
 
 @app.route('/api/messages', methods=['GET'])
 def get_messages():
-    """Endpoint para obtener los mensajes para el frontend."""
+    """Endpoint para obtener los mensajes para el frontend.
+
+    La respuesta se genera por lotes en streaming. Parámetros opcionales: `format`
+    (json | ndjson), `columns` (separadas por comas), `limit` y `cursor` para consumir el
+    dataset por partes; el cursor siguiente va en `next_cursor` (JSON) o en la cabecera
+    X-Next-Cursor (NDJSON). Un cursor de una versión anterior del dataset se rechaza (400).
+    """
     try:
-        df = load_data()
+        dataset = load_dataset()
+        df = dataset.df
         if df.empty:
             return jsonify(success=True, messages=[])
 
         # Seleccionar las columnas necesarias
-        required_columns = ['Message ID', 'Message Text', 'Title', 'Views', 'Average Views', 'Label']
-        messages = []
-        
-        for _, row in df.iterrows():
-            msg = {}
-            for col in required_columns:
-                if col in row:
-                    msg[col] = row[col] if pd.notna(row[col]) else None
-                else:
-                    msg[col] = None
-            messages.append(msg)
+        columns = [col.strip() for col in request.args.get('columns', '').split(',') if col.strip()] or API_COLUMNS
+        unknown = [col for col in columns if col not in df.columns and col not in API_COLUMNS]
+        if unknown:
+            return jsonify(success=False, error=f"Columnas no disponibles: {', '.join(unknown)}"), 400
 
-        return jsonify(success=True, messages=messages)
+        output_format = request.args.get('format', 'json')
+        if output_format not in ('json', 'ndjson'):
+            return jsonify(success=False, error=f"Formato no soportado: {output_format}"), 400
+
+        # Rango de filas: desde el cursor (o el principio) hasta `limit` filas
+        try:
+            cursor = request.args.get('cursor')
+            start = 0
+            if cursor:
+                decoded = decode_cursor(cursor)
+                # Las posiciones sólo valen en la versión que generó el cursor: tras una recarga
+                # que reordena filas se saltarían o repetirían mensajes
+                if decoded.get('v') != dataset.version_tag:
+                    raise QueryError("El cursor es de otra versión del dataset; vuelve a empezar sin cursor")
+                start = min(max(0, decoded['i']), len(df))
+            limit = request.args.get('limit')
+            stop = min(len(df), start + max(0, int(limit))) if limit else len(df)
+        except (QueryError, ValueError) as e:
+            return jsonify(success=False, error=f"Error en los parámetros de paginación: {str(e)}"), 400
+
+        etag = make_etag(dataset, 'api/messages', output_format, tuple(columns), start, stop)
+        if is_not_modified(etag):
+            return not_modified(etag)
+
+        positions = np.arange(start, stop)
+        next_cursor = encode_position_cursor(dataset, stop) if stop < len(df) else None
+
+        if output_format == 'ndjson':
+            response = Response(stream_with_context(iter_ndjson(df, positions, columns)), mimetype='application/x-ndjson')
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+        else:
+            response = Response(stream_with_context(iter_json_messages(df, positions, columns, next_cursor)), mimetype='application/json')
+        response.set_etag(etag)
+        return response
 
     except Exception as e:
         print(f"Error en /api/messages: {e}")
@@ -658,5 +1115,8 @@ def get_messages():
 
 if __name__ == '__main__':
     print("Iniciando servidor Flask...")
+    # Con el recargador sólo el proceso hijo (WERKZEUG_RUN_MAIN) sirve peticiones
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
     # Considera usar debug=True solo para desarrollo, False para producción
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la descarga de telegram_messages.json desde un S3 local (moto en modo servidor)
+
+Compara get_object().read().decode() + json.loads (ruta anterior) con la descarga por
+rangos en paralelo a un búfer preasignado parseado sin decodificarlo. Mide el tiempo y
+el pico de memoria (tracemalloc) del proceso cliente; moto se ejecuta en otro proceso para
+no contar sus copias del objeto. Comprueba además que el contenido es idéntico.
+
+Uso: python benchmarks/bench_download.py [filas] [bytes por rango] [rangos simultáneos]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+import tracemalloc
+import boto3
+
+PORT = 5077
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['S3_ENDPOINT_URL'] = f'http://127.0.0.1:{PORT}'
+
+from synthetic import make_messages
+from config import Config
+from serialization import dumps, records
+from s3_client import get_s3_client
+
+KEY = 'telegram_messages.json'
+
+
+def measure(fn):
+    """(segundos, pico de memoria en MiB, resultado) de ejecutar `fn`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, result
+
+
+def start_moto():
+    server = subprocess.Popen([sys.executable, '-m', 'moto.server', '-p', str(PORT)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', PORT), timeout=0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("No arrancó el servidor de moto")
+
+
+def previous(client):
+    response = client.s3_client.get_object(Bucket=client.bucket_name, Key=KEY)
+    return json.loads(response['Body'].read().decode('utf-8'))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    part_size = int(sys.argv[2]) if len(sys.argv) > 2 else Config.S3_DOWNLOAD_PART_SIZE
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else Config.S3_DOWNLOAD_CONCURRENCY
+    server = start_moto()
+    try:
+        s3 = boto3.client('s3', region_name=Config.AWS_REGION, endpoint_url=Config.S3_ENDPOINT_URL)
+        s3.create_bucket(Bucket=Config.S3_BUCKET,
+                         CreateBucketConfiguration={'LocationConstraint': Config.AWS_REGION})
+        df = make_messages(rows)
+        body = dumps({'messages': records(df, columns=list(df.columns))})
+        s3.put_object(Bucket=Config.S3_BUCKET, Key=KEY, Body=body)
+        del df
+
+        client = get_s3_client()
+        print(f"{rows} filas, {len(body) / 2**20:.0f} MiB, rangos de {part_size / 2**20:.0f} MiB x {concurrency}")
+        Config.S3_DOWNLOAD_PART_SIZE, Config.S3_DOWNLOAD_CONCURRENCY = part_size, concurrency
+        rows = [
+            ('get_object().read()', lambda: client.s3_client.get_object(Bucket=client.bucket_name, Key=KEY)['Body'].read()),
+            ('rangos a búfer', lambda: client.download_ranges(KEY)),
+            ('get_object + decode + loads', lambda: previous(client)),
+            ('rangos + búfer + loads', lambda: client.load_json_from_s3(KEY)),
+        ]
+        results = []
+        for name, fn in rows:
+            elapsed, peak, result = measure(fn)
+            results.append(result)
+            print(f"{name:<30} {elapsed:>6.2f} s {peak:>6.0f} MiB")
+        old, new = results[2], results[3]
+        print(f"contenido idéntico: {old == new}")
+    finally:
+        server.kill()
+
+
+if __name__ == '__main__':
+    main()
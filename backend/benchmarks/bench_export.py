@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la exportación: DataFrame completo en un StringIO frente a la exportación por lotes
+
+Mide el tiempo y el pico de memoria (tracemalloc) de generar el archivo de todas las filas.
+
+Uso: python benchmarks/bench_export.py [filas ...]
+"""
+
+import io
+import sys
+import time
+import tracemalloc
+import numpy as np
+from synthetic import make_messages
+from export import iter_export, export_formats
+
+
+def measure(fn):
+    """(segundos, pico de memoria en MiB, bytes generados) de ejecutar `fn`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, size
+
+
+def in_memory_csv(df):
+    # Ruta anterior de /export_relevants: to_csv a un StringIO y put_object del contenido
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    return len(buffer.getvalue().encode('utf-8'))
+
+
+def streamed(df, fmt):
+    positions = np.arange(len(df))
+    return sum(len(chunk) for chunk in iter_export(df, positions, list(df.columns), fmt))
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [200_000]
+    for n in sizes:
+        df = make_messages(n)
+        print(f"\n{n} filas")
+        print(f"{'método':<20} {'tiempo':>8} {'pico':>10} {'tamaño':>10}")
+        rows = [('csv en memoria', lambda: in_memory_csv(df))]
+        rows += [(f"{fmt} por lotes", lambda fmt=fmt: streamed(df, fmt)) for fmt in export_formats()]
+        for name, fn in rows:
+            elapsed, peak, size = measure(fn)
+            print(f"{name:<20} {elapsed:>6.2f} s {peak:>6.0f} MiB {size / 2**20:>6.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la carga de telegram_messages.json: json.load + pd.DataFrame frente al parseo por lotes
+
+Compara la ruta anterior (texto completo, lista de diccionarios y DataFrame a la vez) con
+`json_stream.read_messages`, que pasa los mensajes a columnas por lotes mientras lee el
+archivo. Mide el tiempo y el pico de memoria (tracemalloc) de cada carga junto al tamaño
+del DataFrame resultante, y comprueba que ambos DataFrames son idénticos.
+
+Uso: python benchmarks/bench_json_load.py [filas] [mensajes por lote]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+import pandas as pd
+from synthetic import make_messages
+from serialization import dumps, records
+from json_stream import read_messages, BATCH_SIZE
+
+
+def measure(fn):
+    """(segundos, pico de memoria en MiB, resultado) de ejecutar `fn`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, result
+
+
+def previous(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return pd.DataFrame(data['messages'])
+
+
+def streamed(path, batch_size):
+    with open(path, 'rb') as f:
+        return read_messages(f, batch_size=batch_size)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else BATCH_SIZE
+    df = make_messages(rows)
+    fd, path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(dumps({'messages': records(df, columns=list(df.columns))}))
+    del df
+
+    try:
+        print(f"{rows} mensajes, {os.path.getsize(path) / 2**20:.0f} MiB de JSON, lotes de {batch_size}")
+        results = []
+        for name, fn in [('json.load + DataFrame', lambda: previous(path)),
+                         ('read_messages por lotes', lambda: streamed(path, batch_size))]:
+            elapsed, peak, result = measure(fn)
+            size = result.memory_usage(deep=True).sum() / 2**20
+            print(f"{name:<25} {elapsed:>6.2f} s  pico {peak:>6.0f} MiB  DataFrame {size:>5.0f} MiB  "
+                  f"({peak / size:.1f}x)")
+            results.append(result)
+            del result
+        print(f"DataFrames idénticos: {results[0].equals(results[1]) and (results[0].dtypes == results[1].dtypes).all()}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
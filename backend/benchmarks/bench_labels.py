@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark de etiquetado con 100 anotadores concurrentes contra un S3 local (moto)
+
+Compara la ruta anterior (reescribir y subir todo el dataset en cada clic), el diario de
+etiquetas con una escritura por clic y el diario con escrituras agrupadas.
+
+Uso: python benchmarks/bench_labels.py [filas] [anotadores] [clics por anotador]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import numpy as np
+import boto3
+from flask import Flask
+from moto import mock_aws
+from synthetic import make_messages
+from models import db
+from label_journal import LabelJournal, LabelWriteBuffer
+
+BUCKET = 'monitoria-bench'
+KEY = 'telegram_messages.json'
+
+
+def run_labelers(label, labelers, clicks, message_ids):
+    """Lanza `labelers` hilos que etiquetan `clicks` mensajes cada uno; devuelve (s, latencias ms)."""
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(labelers + 1)
+
+    def worker(worker_id):
+        rng = np.random.default_rng(worker_id)
+        own = []
+        barrier.wait()
+        for _ in range(clicks):
+            message_id = int(message_ids[rng.integers(len(message_ids))])
+            start = time.perf_counter()
+            label(worker_id, message_id)
+            own.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(labelers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def report(name, elapsed, latencies):
+    total = len(latencies)
+    print(f"{name:<28} {total / elapsed:>10.0f} etiquetas/s   "
+          f"p50 {np.percentile(latencies, 50):>8.1f} ms   p99 {np.percentile(latencies, 99):>8.1f} ms")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    labelers = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    clicks = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    df = make_messages(rows)
+    df['Label'] = np.nan
+    message_ids = df['Message ID'].to_numpy()
+    usernames = dict(zip(df['Message ID'], df['Username']))
+    print(f"{rows} mensajes, {labelers} anotadores x {clicks} clics")
+
+    with mock_aws(), tempfile.TemporaryDirectory() as tmp:
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket=BUCKET)
+
+        # Ruta anterior: cada clic modifica una copia del dataset y la sube entera a S3
+        save_lock = threading.Lock()
+
+        def label_full_rewrite(worker_id, message_id):
+            with save_lock:
+                copy = df.copy()
+                copy.loc[copy['Message ID'] == message_id, 'Label'] = worker_id % 2
+                body = copy.to_json(orient='records', date_format='iso')
+                s3.put_object(Bucket=BUCKET, Key=KEY, Body=json.dumps({'messages': json.loads(body)}).encode('utf-8'))
+
+        # La ruta anterior es tan lenta que se mide con menos clics
+        elapsed, latencies = run_labelers(label_full_rewrite, min(labelers, 10), 2, message_ids)
+        report('reescritura completa', elapsed, latencies)
+
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+        journal = LabelJournal()
+
+        def append(entries):
+            with app.app_context():
+                return journal.append(entries)
+
+        # Diario con una transacción por clic
+        def label_direct(worker_id, message_id):
+            append([(usernames[message_id], message_id, worker_id % 2)])
+
+        elapsed, latencies = run_labelers(label_direct, labelers, clicks, message_ids)
+        report('diario, sin agrupar', elapsed, latencies)
+
+        # Diario con escrituras agrupadas
+        for debounce, max_latency in ((0.0, 0.05), (0.01, 0.05), (0.05, 0.25)):
+            writes = LabelWriteBuffer(append, debounce=debounce, max_latency=max_latency)
+
+            def label_coalesced(worker_id, message_id):
+                writes.submit([(usernames[message_id], message_id, worker_id % 2)])
+
+            elapsed, latencies = run_labelers(label_coalesced, labelers, clicks, message_ids)
+            report(f'diario, agrupado {debounce * 1000:.0f}/{max_latency * 1000:.0f} ms', elapsed, latencies)
+            print(f"{'':<28} {writes.flushes} escrituras para {writes.flushed} etiquetas")
+
+        # Compactación: una única subida del dataset con todas las etiquetas del diario
+        with app.app_context():
+            labels, sequence = journal.labels_since(0)
+        start = time.perf_counter()
+        compacted = df.copy()
+        for (username, message_id), value in labels.items():
+            compacted.loc[compacted['Message ID'] == message_id, 'Label'] = value
+        body = compacted.to_json(orient='records', date_format='iso')
+        s3.put_object(Bucket=BUCKET, Key=KEY, Body=body.encode('utf-8'))
+        print(f"compactación de {sequence} entradas ({len(labels)} mensajes): "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Comprobación del cliente S3 compartido contra un S3 local (moto)
+
+Compara la ruta anterior de carga (un S3Client nuevo por llamada, head_bucket y listado
+antes de cada descarga, dos head_object) con el cliente compartido (listado en caché y
+versión consultada una sola vez), contando las idas y vueltas a S3 de cada carga y de la
+revalidación condicional de la versión.
+
+Uso: python benchmarks/bench_s3.py [filas] [cargas]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import boto3
+from moto import mock_aws
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('SNAPSHOT_CACHE_DIR', tempfile.mkdtemp())
+
+from synthetic import make_messages
+from config import Config
+from s3_client import S3Client, get_s3_client, s3_metrics
+import snapshot
+
+KEY = snapshot.SNAPSHOT_FILENAME
+
+
+def find_messages_file(files):
+    return next(file for file in files if 'telegram_messages' in file and file.endswith('.parquet'))
+
+
+def load_previous():
+    # Ruta anterior de fetch_data: cliente nuevo, check_connection, listado y dos head_object
+    client = S3Client()
+    assert client.check_connection()
+    key = find_messages_file(client.list_files())
+    client.get_object_version(key)
+    return client.load_parquet_from_s3(key)
+
+
+def load_shared():
+    client = get_s3_client()
+    key = find_messages_file(client.list_files_cached())
+    version = client.get_object_version(key)
+    return client.load_parquet_from_s3(key, version=version)
+
+
+def measure(name, load, loads):
+    trips, start = [], time.perf_counter()
+    for _ in range(loads):
+        s3_metrics.begin_request()
+        load()
+        trips.append(s3_metrics.end_request())
+    elapsed = (time.perf_counter() - start) / loads * 1000
+    print(f"{name:<28} {elapsed:>8.1f} ms/carga   idas y vueltas: {trips}")
+
+
+def concurrent_heads(make_client, threads=16, calls=5):
+    """Segundos para que `threads` hilos hagan `calls` head_object cada uno."""
+    def worker():
+        for _ in range(calls):
+            make_client().get_object_version(KEY)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    loads = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with mock_aws():
+        s3 = boto3.client('s3', region_name=Config.AWS_REGION)
+        s3.create_bucket(Bucket=Config.S3_BUCKET,
+                         CreateBucketConfiguration={'LocationConstraint': Config.AWS_REGION})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = snapshot.write_snapshot(make_messages(rows), os.path.join(tmp, KEY))
+            s3.upload_file(path, Config.S3_BUCKET, KEY)
+
+        print(f"{rows} filas, {loads} cargas")
+        measure('cliente nuevo por carga', load_previous, loads)
+        measure('cliente compartido', load_shared, loads)
+
+        client = get_s3_client()
+        version = client.get_object_version(KEY)
+        s3_metrics.begin_request()
+        assert client.get_object_version(KEY, if_none_match=version) == version
+        print(f"revalidación condicional     idas y vueltas: {s3_metrics.end_request()}")
+
+        print(f"head_object concurrente      cliente nuevo {concurrent_heads(S3Client):.2f} s, "
+              f"compartido {concurrent_heads(get_s3_client):.2f} s")
+        print(s3_metrics.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la búsqueda de texto (`q`): índice invertido frente a str.contains sobre Message Text
+
+Uso: python benchmarks/bench_search.py [filas ...]
+"""
+
+import sys
+import time
+import numpy as np
+from synthetic import make_messages
+from dataset import Dataset
+from query import Query
+
+QUERIES = {
+    'término frecuente': 'ucrania',
+    'término raro': 'w17',
+    'frase': '"alto el fuego"',
+    'prefijo': 'negocia*',
+    'frase + canal': {'q': '"alto el fuego"', 'channel': 'Canal 7'},
+    'varios términos': 'otan misiles acuerdo',
+}
+
+WORDS = ['el', 'la', 'de', 'que', 'en', 'y', 'los', 'del', 'ucrania', 'rusia', 'otan', 'alto', 'fuego',
+         'misiles', 'acuerdo', 'negociación', 'negociaciones', 'negociar', 'gobierno', 'presidente']
+
+
+def make_texts(n, seed=0):
+    """Textos con una distribución de palabras tipo Zipf y un vocabulario largo de términos raros."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(WORDS + [f'w{i}' for i in range(50_000)], dtype=object)
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    lengths = rng.integers(5, 60, n)
+    tokens = rng.choice(vocabulary, lengths.sum(), p=weights)
+    bounds = np.cumsum(lengths)
+    return [' '.join(chunk) for chunk in np.split(tokens, bounds[:-1])]
+
+
+def timed(fn, repeat=5):
+    """Devuelve el mejor tiempo de `repeat` ejecuciones en milisegundos."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000]
+    for n in sizes:
+        df = make_messages(n)
+        df['Message Text'] = make_texts(n)
+        appended = int(n * 0.01)
+        base = df.iloc[:n - appended].reset_index(drop=True)
+
+        dataset = Dataset.from_frame(base)
+        start = time.perf_counter()
+        dataset.text_index()
+        build_s = time.perf_counter() - start
+
+        # Nueva versión con un 1 % de mensajes añadidos: sólo se indexan las filas nuevas
+        updated = Dataset.from_frame(df)
+        updated.inherit(dataset.carry_over())
+        start = time.perf_counter()
+        updated.text_index()
+        update_s = time.perf_counter() - start
+
+        print(f"\n{n} filas: construcción {build_s:.1f} s, actualización con {appended} filas nuevas {update_s:.2f} s")
+        print(f"{'consulta':<20} {'coincidencias':>13} {'índice':>10} {'str.contains':>13}")
+        texts = updated.df['Message Text'].str.lower()
+        for name, filters in QUERIES.items():
+            query = Query.from_filters(filters if isinstance(filters, dict) else {'q': filters})
+            matched = int(np.count_nonzero(query.mask(updated)))
+            indexed = timed(lambda: query.mask(updated))
+            needle = query.text.strip('"').rstrip('*').split()[0]
+            scan = timed(lambda: texts.str.contains(needle, regex=False).to_numpy(), repeat=1)
+            print(f"{name:<20} {matched:>13} {indexed:>8.1f} ms {scan:>10.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la serialización de /api/messages: iterrows + jsonify frente a la capa vectorizada
+
+Uso: python benchmarks/bench_serialization.py [filas ...]
+"""
+
+import sys
+import json
+import time
+import pandas as pd
+from synthetic import make_messages
+import serialization
+from serialization import records, API_COLUMNS
+
+
+def timed(fn, repeat=3):
+    """Devuelve el mejor tiempo de `repeat` ejecuciones en milisegundos."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def iterrows_path(df):
+    """Implementación anterior de /api/messages (sin jsonify, que añade aún más coste)."""
+    messages = []
+    for _, row in df.iterrows():
+        msg = {}
+        for col in API_COLUMNS:
+            if col in row:
+                msg[col] = row[col] if pd.notna(row[col]) else None
+            else:
+                msg[col] = None
+        messages.append(msg)
+    return json.dumps({'success': True, 'messages': messages}).encode('utf-8')
+
+
+def stdlib_path(df):
+    orjson = serialization.orjson
+    serialization.orjson = None
+    try:
+        return serialization.dumps({'success': True, 'messages': records(df, None, API_COLUMNS)})
+    finally:
+        serialization.orjson = orjson
+
+
+def fast_path(df):
+    return serialization.dumps({'success': True, 'messages': records(df, None, API_COLUMNS)})
+
+
+def run(n):
+    df = make_messages(n)
+    print(f"\n{n:,} filas")
+    print(f"{'ruta':<34} {'tiempo':>10}")
+    print(f"{'iterrows + json':<34} {timed(lambda: iterrows_path(df), repeat=1):>8.1f}ms")
+    print(f"{'records + json':<34} {timed(lambda: stdlib_path(df)):>8.1f}ms")
+    if serialization.orjson is not None:
+        print(f"{'records + orjson':<34} {timed(lambda: fast_path(df)):>8.1f}ms")
+    else:
+        print("records + orjson                    (orjson no instalado)")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for size in sizes:
+        run(size)
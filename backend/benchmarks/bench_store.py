@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los motores de mensajes: pandas (máscaras en memoria) frente a SQLite indexado
+
+Uso: python benchmarks/bench_store.py [filas ...]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from synthetic import make_messages
+from dataset import Dataset
+from query import Query, QueryResultCache, encode_cursor
+from message_store import PandasMessageStore, SQLiteMessageStore
+
+QUERIES = {
+    'sin filtros': {},
+    'canal': {'channel': 'Canal 7'},
+    'fechas + tipo': {'dateStart': '2025-02-01', 'dateEnd': '2025-02-07', 'mediaType': 'video'},
+    'score, por views': {'scoreMin': '2', 'sortBy': 'views'},
+}
+
+
+def timed(fn, repeat=5):
+    """Devuelve el mejor tiempo de `repeat` ejecuciones en milisegundos."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def first_page(store, dataset, query):
+    store.get(dataset, query, 24).page(0, 24)
+
+
+def deep_page(store, dataset, query, token):
+    result, start = store.seek(dataset, query, token, 24)
+    result.page(start, start + 24)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 500_000]
+    for n in sizes:
+        dataset = Dataset.from_frame(make_messages(n))
+        with tempfile.TemporaryDirectory() as tmp:
+            sqlite_store = SQLiteMessageStore(os.path.join(tmp, 'messages.sqlite'), QueryResultCache(max_bytes=0))
+            build_ms = timed(lambda: sqlite_store.prepare(dataset), repeat=1)
+            # Sin caché de resultados: se mide el coste de resolver cada consulta
+            pandas_store = PandasMessageStore(QueryResultCache(max_bytes=0))
+
+            print(f"\n{n} filas (construcción de SQLite: {build_ms:.0f} ms)")
+            print(f"{'consulta':<20} {'pandas 1ª':>10} {'sqlite 1ª':>10} {'pandas cur':>11} {'sqlite cur':>11}")
+            for name, filters in QUERIES.items():
+                query = Query.from_filters(filters)
+                result = pandas_store.get(dataset, query, len(dataset))
+                depth = min(result.total - 1, 5000)
+                token = encode_cursor(dataset, query, result, depth) if depth > 0 else None
+                row = [timed(lambda: first_page(pandas_store, dataset, query)),
+                       timed(lambda: first_page(sqlite_store, dataset, query))]
+                if token:
+                    row += [timed(lambda: deep_page(pandas_store, dataset, query, token)),
+                            timed(lambda: deep_page(sqlite_store, dataset, query, token))]
+                else:
+                    row += [0.0, 0.0]
+                print(f"{name:<20} " + ' '.join(f"{value:>10.2f}" for value in row) + ' ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la primera página del feed: ordenación completa frente a selección parcial (top-k)
+
+Uso: python benchmarks/bench_topk.py [filas ...]
+"""
+
+import sys
+import time
+import numpy as np
+from synthetic import make_messages
+from dataset import Dataset, TOP_K_LIMIT
+
+
+def timed(fn, repeat=5):
+    """Devuelve el mejor tiempo de `repeat` ejecuciones en milisegundos."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(n):
+    dataset = Dataset.from_frame(make_messages(n))
+    df = dataset.df
+    channel_mask = Dataset.category_mask(dataset.channel, 'Canal 7') | Dataset.category_mask(dataset.channel, 'Canal 8')
+
+    cases = [
+        ('index (48, sin filtro)', None, 48),
+        ('página 1 (24, sin filtro)', None, 24),
+        ('página 1 (24, 2 canales)', channel_mask, 24),
+        ('página 20 (24, sin filtro)', None, TOP_K_LIMIT),
+    ]
+
+    print(f"\n{n:,} filas")
+    print(f"{'caso':<28} {'sort_values':>12} {'argsort':>10} {'top-k':>10}")
+    for name, mask, k in cases:
+        frame = df if mask is None else df[mask]
+        full_mask = np.ones(n, dtype=bool) if mask is None else mask
+
+        t_pandas = timed(lambda: frame.sort_values(by='Score', ascending=False).head(k))
+        t_argsort = timed(lambda: np.argsort(-dataset.score[full_mask], kind='stable')[:k])
+        t_topk = timed(lambda: dataset.top_positions(mask, 'score', k))
+        print(f"{name:<28} {t_pandas:>10.2f}ms {t_argsort:>8.2f}ms {t_topk:>8.2f}ms")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for size in sizes:
+        run(size)
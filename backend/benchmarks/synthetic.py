@@ -0,0 +1,40 @@
+"""
+Generación de mensajes sintéticos con la forma de telegram_messages.json para los benchmarks
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Permitir importar los módulos del backend al ejecutar los benchmarks como scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MEDIA_TYPES = ['Photo', 'Video', 'Document', 'Webpage', '']
+
+
+def make_messages(n, channels=200, seed=0):
+    """Devuelve un DataFrame de `n` mensajes repartidos entre `channels` canales."""
+    rng = np.random.default_rng(seed)
+    channel_ids = rng.integers(0, channels, n)
+    message_ids = np.arange(n) + 1
+    usernames = np.array([f'canal_{i}' for i in range(channels)], dtype=object)[channel_ids]
+    views = rng.integers(0, 200_000, n)
+    average_views = rng.integers(1_000, 50_000, n).astype(float)
+    dates = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 90 * 86400, n), unit='s')
+
+    return pd.DataFrame({
+        'Message ID': message_ids,
+        'Username': usernames,
+        'Title': np.array([f'Canal {i}' for i in range(channels)], dtype=object)[channel_ids],
+        'Message Text': [f'mensaje {i} sobre noticias del canal' for i in message_ids],
+        'Date Sent': dates,
+        'Views': views,
+        'Average Views': average_views,
+        'Score': views / average_views,
+        'Media Type': np.array(MEDIA_TYPES, dtype=object)[rng.integers(0, len(MEDIA_TYPES), n)],
+        'URL': [f'https://t.me/s/{u}/{i}' for u, i in zip(usernames, message_ids)],
+        'Embed': [f'<script async src="https://telegram.org/js/telegram-widget.js?22" data-telegram-post="{u}/{i}" data-width="100%"></script>'
+                  for u, i in zip(usernames, message_ids)],
+        'Label': np.where(rng.random(n) < 0.05, 1.0, np.nan),
+    })
@@ -29,6 +29,67 @@ class Config:
     AWS_REGION = os.environ.get('AWS_REGION', 'eu-north-1')
     S3_BUCKET = os.environ.get('S3_BUCKET', 'monitoria-data')
     
+    # Segundos durante los que se sirve el dataset en memoria sin revalidar su versión en origen
+    DATASET_CACHE_TTL = int(os.environ.get('DATASET_CACHE_TTL', 30))
+
+    # Segundos entre consultas del hilo que refresca el dataset en segundo plano (0 = revalidar
+    # en las peticiones cuando expira DATASET_CACHE_TTL)
+    DATASET_REFRESH_INTERVAL = int(os.environ.get('DATASET_REFRESH_INTERVAL', 30))
+
+    # Tamaño máximo (bytes) de la caché LRU de resultados de consultas
+    QUERY_CACHE_MAX_BYTES = int(os.environ.get('QUERY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+    # Número máximo de tarjetas de mensaje renderizadas que se guardan en la caché de fragmentos
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 10000))
+    # y tamaño máximo (bytes de HTML) de esa caché
+    FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+    # Segundos entre compactaciones del diario de etiquetas en el dataset de origen (0 = desactivada)
+    LABEL_COMPACTION_INTERVAL = int(os.environ.get('LABEL_COMPACTION_INTERVAL', 300))
+
+    # Agrupación de escrituras de etiquetas: espera sin nuevas etiquetas y latencia máxima (ms)
+    LABEL_FLUSH_DEBOUNCE_MS = int(os.environ.get('LABEL_FLUSH_DEBOUNCE_MS', 50))
+    LABEL_FLUSH_MAX_LATENCY_MS = int(os.environ.get('LABEL_FLUSH_MAX_LATENCY_MS', 250))
+
+    # Motor de consultas de mensajes: 'pandas' (por defecto) o 'sqlite' (base de datos embebida indexada)
+    MESSAGE_STORE = os.environ.get('MESSAGE_STORE', 'pandas')
+    MESSAGE_STORE_PATH = os.environ.get('MESSAGE_STORE_PATH', os.path.join('.snapshot_cache', 'messages.sqlite'))
+
+    # Construir el índice de búsqueda de texto en segundo plano al cargar cada versión del dataset
+    TEXT_INDEX_WARMUP = os.environ.get('TEXT_INDEX_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+
+    # Estructura particionada por canal y día (messages/manifest.json): cargar el dataset desde ella,
+    # días recientes que se mantienen en memoria (0 = todos) y conjuntos podados en caché
+    PARTITIONED_SNAPSHOT = os.environ.get('PARTITIONED_SNAPSHOT', 'false').lower() in ('1', 'true', 'yes')
+    PARTITION_WINDOW_DAYS = int(os.environ.get('PARTITION_WINDOW_DAYS', 0))
+    PARTITION_CACHE_SIZE = int(os.environ.get('PARTITION_CACHE_SIZE', 8))
+
+    # Aplicar los deltas que publica el scraper (deltas/index.json) sobre el dataset en memoria
+    # en lugar de recargarlo entero en cada scrape
+    DELTA_SNAPSHOTS = os.environ.get('DELTA_SNAPSHOTS', 'true').lower() in ('1', 'true', 'yes')
+
+    # Snapshot columnar (Parquet): directorio de la copia local y columnas a cargar (vacío = todas)
+    SNAPSHOT_CACHE_DIR = os.environ.get('SNAPSHOT_CACHE_DIR', '.snapshot_cache')
+    SNAPSHOT_COLUMNS = [col.strip() for col in os.environ.get('SNAPSHOT_COLUMNS', '').split(',') if col.strip()]
+
+    # Endpoint de un servicio compatible con S3 (MinIO, moto en modo servidor); vacío = AWS
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', '')
+
+    # Cliente S3 compartido: conexiones del pool, timeouts (s), intentos por operación y
+    # segundos durante los que se reutiliza el listado del bucket
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 32))
+    S3_CONNECT_TIMEOUT = int(os.environ.get('S3_CONNECT_TIMEOUT', 5))
+    S3_READ_TIMEOUT = int(os.environ.get('S3_READ_TIMEOUT', 60))
+    S3_MAX_ATTEMPTS = int(os.environ.get('S3_MAX_ATTEMPTS', 3))
+    S3_LISTING_TTL = int(os.environ.get('S3_LISTING_TTL', 300))
+
+    # Descargas por rangos en paralelo: bytes por rango y rangos simultáneos
+    S3_DOWNLOAD_PART_SIZE = int(os.environ.get('S3_DOWNLOAD_PART_SIZE', 8 * 1024 * 1024))
+    S3_DOWNLOAD_CONCURRENCY = int(os.environ.get('S3_DOWNLOAD_CONCURRENCY', 8))
+
+    # Tamaño de cada parte (bytes) en las exportaciones subidas a S3 por partes (mínimo 5 MiB)
+    S3_MULTIPART_PART_SIZE = int(os.environ.get('S3_MULTIPART_PART_SIZE', 8 * 1024 * 1024))
+
     # Credenciales de AWS S3
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
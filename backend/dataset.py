@@ -0,0 +1,331 @@
+import hashlib
+import itertools
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from text_index import TextIndex, TEXT_COLUMN
+from deltas import upsert_rows
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DATE_COLUMNS = ['Date', 'Date Sent', 'Creation Date', 'Edit Date']
+NUMERIC_COLUMNS = ['Score', 'Views']
+
+# Columna por la que ordena cada valor admitido de `sortBy`
+SORT_COLUMNS = {'score': 'Score', 'views': 'Views'}
+
+# Profundidad máxima que se sirve con selección parcial sin construir la permutación completa
+TOP_K_LIMIT = 480
+
+# Valor con el que se representan las fechas nulas (NaT) en las columnas de epoch
+NAT = np.iinfo(np.int64).min
+
+# Contador de versiones construidas en este proceso (distingue recargas del mismo origen)
+_generations = itertools.count(1)
+
+
+def normalize_dataframe(df):
+    """Limpia el DataFrame recién cargado: canal por defecto, fechas sin zona horaria y columnas numéricas."""
+    # Verificar y limpiar la columna Title (usada como Channel)
+    if 'Title' in df.columns:
+        df['Title'] = df['Title'].fillna('Desconocido')
+        df['Title'] = df['Title'].replace('', 'Desconocido')
+
+    # Convertir columnas de fecha si existen
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            try:
+                # Convertir a datetime y eliminar zona horaria
+                df[col] = pd.to_datetime(df[col]).dt.tz_localize(None)
+            except Exception as e:
+                logger.warning(f"Error al convertir la columna '{col}': {e}")
+                if col in df.columns:
+                    del df[col]
+
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    return df
+
+
+class Dataset:
+    """Versión inmutable del dataset con columnas tipadas para filtrar con máscaras.
+
+    Las columnas tipadas se calculan una sola vez por versión: `date_sent` (epoch en ns,
+    int64), `score` (float32), `views` (float64) y `channel`/`media_type` (categóricas).
+    Valen None cuando la columna de origen no existe. Las permutaciones de ordenación
+    se calculan la primera vez que se piden y se reutilizan mientras dure la versión;
+    hasta entonces las primeras páginas se resuelven con selección parcial (top-k).
+    `locate()` resuelve (Username, Message ID) a posiciones con un índice hash que se
+    construye una vez por versión; `text_mask()` usa el índice invertido de Message Text,
+    que reutiliza el de la versión anterior (`inherit`) si sólo se han añadido filas.
+    Las etiquetas del diario se superponen sobre la columna Label (`apply_labels`) y
+    `label_seq` indica hasta qué secuencia del diario están incluidas. `upsert()` construye
+    la versión siguiente a partir de un delta sin volver a cargar el dataset completo.
+    """
+
+    def __init__(self, df, version=None):
+        self.df = df
+        self.version = version
+        self.generation = next(_generations)
+        self._sort_keys = {}
+        self._sort_orders = {}
+        self._sort_lock = threading.Lock()
+        self._label_lock = threading.Lock()
+        self.label_seq = 0
+        self._row_index = None
+        self._index_lock = threading.Lock()
+        self._text_index = None
+        self._inherited_text_index = None
+        self._text_lock = threading.Lock()
+        self._text_warming = False
+        self.date_sent = self._epoch_column('Date Sent')
+        self.score = self._numeric_column('Score', np.float32)
+        self.views = self._numeric_column('Views', np.float64)
+        self.channel = self._categorical_column('Title')
+        self.media_type = self._categorical_column('Media Type', lower=True)
+
+    @classmethod
+    def from_frame(cls, df, version=None):
+        """Normaliza un DataFrame recién cargado y construye la versión del dataset."""
+        return cls(normalize_dataframe(df), version)
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def version_tag(self):
+        """Identificador corto y estable entre procesos de la versión del origen."""
+        return hashlib.sha1(repr(self.version).encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def _epoch_column(self, col):
+        if col not in self.df.columns:
+            return None
+        return self.df[col].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    def _numeric_column(self, col, dtype):
+        if col not in self.df.columns:
+            return None
+        return self.df[col].to_numpy(dtype=dtype, na_value=np.nan)
+
+    def _categorical_column(self, col, lower=False):
+        if col not in self.df.columns:
+            return None
+        values = self.df[col].astype(str)
+        if lower:
+            values = values.str.lower()
+        return pd.Categorical(values)
+
+    def sort_column(self, sort_by='score'):
+        """Columna por la que se ordena `sort_by` (Score por defecto), o None si no existe."""
+        column = SORT_COLUMNS.get(sort_by)
+        if column in self.df.columns:
+            return column
+        return 'Score' if 'Score' in self.df.columns else None
+
+    def sort_order(self, sort_by='score'):
+        """Permutación estable descendente (nulos al final) de todas las filas según `sort_by`."""
+        column = self.sort_column(sort_by)
+        if column is None:
+            return None
+
+        order = self._sort_orders.get(column)
+        if order is None:
+            keys = self.sort_key(column)
+            with self._sort_lock:
+                order = self._sort_orders.get(column)
+                if order is None:
+                    order = np.argsort(keys, kind='stable')
+                    self._sort_orders[column] = order
+        return order
+
+    def sort_key(self, column):
+        """Clave ascendente equivalente al orden descendente de `column`, con nulos al final."""
+        keys = self._sort_keys.get(column)
+        if keys is None:
+            values = self.df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            keys = np.where(np.isnan(values), np.inf, -values)
+            self._sort_keys[column] = keys
+        return keys
+
+    def top_positions(self, mask, sort_by, k):
+        """Las `k` primeras posiciones según `sort_by` mediante selección parcial (argpartition).
+
+        Devuelve exactamente el mismo orden que `ordered_positions(...)[:k]`: los empates se
+        resuelven por posición, igual que en la permutación estable.
+        """
+        column = self.sort_column(sort_by)
+        candidates = np.arange(len(self.df)) if mask is None else np.flatnonzero(mask)
+        if column is None:
+            return candidates[:k]
+
+        keys = self.sort_key(column)[candidates]
+        if k < len(candidates):
+            kth = np.partition(keys, k - 1)[k - 1]
+            better = np.flatnonzero(keys < kth)
+            ties = np.flatnonzero(keys == kth)[:k - len(better)]
+            selected = np.sort(np.concatenate([better, ties]))
+        else:
+            selected = np.arange(len(candidates))
+        selected = selected[np.argsort(keys[selected], kind='stable')]
+        return candidates[selected]
+
+    def page_positions(self, mask, sort_by, start, stop):
+        """Posiciones de la página [start, stop) de las filas que cumplen `mask`.
+
+        Las primeras páginas usan selección parcial mientras no exista la permutación
+        completa; la paginación profunda ordena una vez y reutiliza la permutación.
+        """
+        column = self.sort_column(sort_by)
+        if column is not None and column not in self._sort_orders and stop <= TOP_K_LIMIT:
+            return self.top_positions(mask, sort_by, stop)[start:]
+        return self.ordered_positions(mask, sort_by)[start:stop]
+
+    def has_sort_order(self, sort_by='score'):
+        """Indica si ya existe la permutación completa para `sort_by`."""
+        return self.sort_column(sort_by) in self._sort_orders
+
+    def ordered_positions(self, mask, sort_by='score'):
+        """Posiciones de las filas que cumplen `mask`, en el orden de `sort_by`."""
+        order = self.sort_order(sort_by)
+        if order is None:
+            return np.flatnonzero(mask)
+        return order[mask[order]]
+
+    def _build_row_index(self):
+        """Índices {(Username, Message ID): posición} y {Message ID: posición}.
+
+        Las claves repetidas (p. ej. el mismo Message ID en varios canales) guardan el resto
+        de sus posiciones en un diccionario aparte para que el caso común sea un int.
+        """
+        df = self.df
+        if 'Message ID' not in df.columns:
+            return ({}, {}), ({}, {})
+        ids = df['Message ID'].tolist()
+        users = df['Username'].astype(str).tolist() if 'Username' in df.columns else [''] * len(ids)
+        return _position_index(zip(users, ids)), _position_index(ids)
+
+    def locate(self, message_id, username=None):
+        """Posiciones de las filas con ese Message ID (y Username, si se indica)."""
+        if self._row_index is None:
+            with self._index_lock:
+                if self._row_index is None:
+                    self._row_index = self._build_row_index()
+        by_key, by_id = self._row_index
+        if username is not None and 'Username' in self.df.columns:
+            return _lookup(by_key, (str(username), message_id))
+        return _lookup(by_id, message_id)
+
+    def upsert(self, rows, version):
+        """Versión nueva con las filas de un delta aplicadas (ver `deltas.upsert_rows`).
+
+        Sólo se normalizan las filas del delta. Las posiciones existentes no cambian, así que
+        la versión nueva conserva las etiquetas ya superpuestas, amplía el índice de filas con
+        las añadidas y reutiliza el índice de texto si no ha cambiado ningún texto.
+        """
+        df, label_seq = self.df, self.label_seq
+        merged = upsert_rows(df, normalize_dataframe(rows.copy()))
+        dataset = Dataset(merged, version)
+        dataset.label_seq = label_seq
+        dataset.inherit(self.carry_over())
+        row_index = self._row_index
+        if row_index is not None and 'Message ID' in merged.columns:
+            appended = merged.iloc[len(df):]
+            ids = appended['Message ID'].tolist()
+            users = appended['Username'].astype(str).tolist() if 'Username' in appended.columns else [''] * len(ids)
+            dataset._row_index = (_position_index(zip(users, ids), row_index[0], len(df)),
+                                  _position_index(ids, row_index[1], len(df)))
+        return dataset
+
+    def carry_over(self):
+        """Estructuras que una versión posterior del dataset puede reutilizar."""
+        return {'text_index': self._text_index or self._inherited_text_index}
+
+    def inherit(self, carried):
+        """Adopta las estructuras reutilizables de la versión anterior (ver `carry_over`)."""
+        self._inherited_text_index = (carried or {}).get('text_index')
+
+    @property
+    def has_text(self):
+        return TEXT_COLUMN in self.df.columns
+
+    def text_index(self):
+        """Índice invertido de Message Text (se construye la primera vez que se pide)."""
+        if self._text_index is None:
+            with self._text_lock:
+                if self._text_index is None:
+                    self._text_index = TextIndex.build(self.df, previous=self._inherited_text_index)
+                    self._inherited_text_index = None
+        return self._text_index
+
+    def warm_text_index(self):
+        """Construye el índice de texto en segundo plano si todavía no existe."""
+        if self._text_index is not None or self._text_warming or not self.has_text:
+            return
+        self._text_warming = True
+        threading.Thread(target=self.text_index, name='text-index', daemon=True).start()
+
+    def text_mask(self, text):
+        """Máscara de las filas cuyo Message Text cumple la búsqueda `text`."""
+        return self.text_index().mask(text, len(self))
+
+    def apply_labels(self, labels, sequence):
+        """Superpone las etiquetas {(Username, Message ID): label} del diario hasta `sequence`.
+
+        La columna Label se sustituye por una copia numérica, así que los lectores
+        concurrentes ven la versión anterior o la nueva, nunca una a medias.
+        """
+        with self._label_lock:
+            if sequence <= self.label_seq:
+                return
+            df = self.df
+            if labels and 'Message ID' in df.columns:
+                if 'Label' in df.columns:
+                    values = pd.to_numeric(df['Label'], errors='coerce').to_numpy(dtype=np.float64, copy=True)
+                else:
+                    values = np.full(len(df), np.nan)
+                for (username, message_id), label in labels.items():
+                    values[self.locate(message_id, username)] = label
+                df['Label'] = values
+            self.label_seq = sequence
+
+    @staticmethod
+    def category_mask(categorical, value):
+        """Máscara de las filas cuya categoría es `value` (todo False si no existe)."""
+        try:
+            code = categorical.categories.get_loc(value)
+        except KeyError:
+            return np.zeros(len(categorical), dtype=bool)
+        return categorical.codes == code
+
+
+def _position_index(keys, previous=None, start=0):
+    """Diccionario clave -> primera posición y clave -> posiciones repetidas.
+
+    Con `previous` se amplía una copia de ese índice con claves que empiezan en `start`.
+    """
+    index, duplicates = {}, {}
+    if previous is not None:
+        index = dict(previous[0])
+        duplicates = {key: list(positions) for key, positions in previous[1].items()}
+    for position, key in enumerate(keys, start):
+        first = index.setdefault(key, position)
+        if first != position:
+            duplicates.setdefault(key, [first]).append(position)
+    return index, duplicates
+
+
+def _lookup(row_index, key):
+    index, duplicates = row_index
+    if key in duplicates:
+        return duplicates[key]
+    position = index.get(key)
+    return [] if position is None else [position]
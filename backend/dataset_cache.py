@@ -0,0 +1,250 @@
+import threading
+import time
+import logging
+import pandas as pd
+from dataset import Dataset
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DatasetCache:
+    """Caché en proceso del dataset de mensajes, revalidada por versión del origen.
+
+    `loader()` descarga el dataset y devuelve `(df, version)`; el DataFrame se normaliza
+    una sola vez al construir el `Dataset` de esa versión. `probe(version)` consulta
+    de forma barata (petición condicional, head_object, mtime) la versión actual del mismo
+    origen y devuelve `None` si no puede determinarla. Mientras no expire el TTL se sirve
+    la copia en memoria sin consultar el origen.
+
+    Con `start_refresher()` la revalidación sale de las peticiones: un hilo consulta el
+    origen cada cierto tiempo, construye la versión nueva (y la prepara con `prepare`)
+    sin bloquear a los lectores y la publica sustituyendo la referencia (read-copy-update).
+
+    Si se indica `update(previous, current)`, al cambiar la versión se intenta primero
+    construir la nueva a partir de la anterior (deltas publicados por el scraper); si
+    devuelve None se descarga el dataset completo con `loader()`.
+    """
+
+    def __init__(self, loader, probe, ttl=30, prepare=None, update=None):
+        self._loader = loader
+        self._probe = probe
+        self._prepare = prepare
+        self._update = update
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._dataset = None
+        self._version = None
+        self._checked_at = 0.0
+        # Estructuras de la última versión que puede reutilizar la siguiente (índice de texto)
+        self._carried = None
+        # Refresco en segundo plano: una sola construcción a la vez, fuera de `_lock`
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._force = False
+        self._thread = None
+        self.interval = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self.updates = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.refresh_ms = 0.0
+
+    @property
+    def version(self):
+        """Versión del origen (ETag/LastModified/mtime) de los datos en caché."""
+        return self._version
+
+    def get(self):
+        """Devuelve el Dataset en caché, recargándolo sólo si el origen ha cambiado."""
+        if self._thread is not None:
+            return self._get_current()
+
+        with self._lock:
+            current = None
+            if self._dataset is not None:
+                now = time.monotonic()
+                if now - self._checked_at < self.ttl:
+                    self.hits += 1
+                    return self._dataset
+
+                self.revalidations += 1
+                try:
+                    current = self._probe(self._version)
+                except Exception as e:
+                    logger.warning(f"Error al revalidar la versión del dataset: {e}")
+                    current = None
+
+                # Si no se puede consultar el origen se mantiene la copia actual
+                if current is None or current == self._version:
+                    self._checked_at = now
+                    self.hits += 1
+                    return self._dataset
+                logger.info(f"El dataset ha cambiado en origen: {self._version} -> {current}")
+
+            dataset = self._load(self._dataset, current)
+            # No se cachean las cargas fallidas para reintentar en la siguiente petición
+            if dataset is None:
+                if self._dataset is not None:
+                    self._carried = self._dataset.carry_over()
+                self._dataset, self._version = None, None
+                return Dataset(pd.DataFrame())
+            self._dataset = dataset
+            self._carried = None
+            self._version = dataset.version
+            self._checked_at = time.monotonic()
+            return self._dataset
+
+    def _get_current(self):
+        """Con el refresco activo se sirve siempre la versión publicada, sin consultar el origen."""
+        dataset = self._dataset
+        if dataset is None:
+            # Arranque en frío o sin ninguna carga correcta: se espera a la carga en curso o se hace aquí
+            self.refresh(only_if_missing=True)
+            dataset = self._dataset
+            if dataset is None:
+                return Dataset(pd.DataFrame())
+        self.hits += 1
+        return dataset
+
+    def _load(self, previous, current=None):
+        """Construye la versión `current` del dataset (None si la carga falla).
+
+        Se parte de `previous` con `update` cuando es posible y, si no, se descarga entera.
+        """
+        self.misses += 1
+        if self._update is not None and previous is not None and current is not None:
+            try:
+                dataset = self._update(previous, current)
+            except Exception as e:
+                logger.warning(f"No se pudo actualizar el dataset de forma incremental: {e}")
+                dataset = None
+            if dataset is not None:
+                self.updates += 1
+                logger.info(f"Dataset actualizado de forma incremental (versión {dataset.version}, filas: {len(dataset)})")
+                return dataset
+        df, version = self._loader()
+        if df.empty and version is None:
+            return None
+        dataset = Dataset.from_frame(df, version)
+        dataset.inherit(previous.carry_over() if previous is not None else self._carried)
+        logger.info(f"Dataset cargado en caché (versión {version}, filas: {len(df)})")
+        return dataset
+
+    def refresh(self, force=False, only_if_missing=False):
+        """Comprueba el origen y, si ha cambiado, construye y publica la versión nueva.
+
+        Los lectores siguen usando la versión actual mientras se descarga, normaliza y
+        prepara la nueva; la sustitución es una asignación de referencia. Devuelve True
+        si se ha publicado una versión nueva.
+        """
+        with self._refresh_lock:
+            previous, version = self._dataset, self._version
+            if previous is not None and only_if_missing:
+                return False
+            force = force or self._force
+            self._force = False
+            current = None
+            if previous is not None and not force:
+                self.revalidations += 1
+                try:
+                    current = self._probe(version)
+                except Exception as e:
+                    logger.warning(f"Error al revalidar la versión del dataset: {e}")
+                    current = None
+                self._checked_at = time.monotonic()
+                if current is None or current == version:
+                    return False
+                logger.info(f"El dataset ha cambiado en origen: {version} -> {current}")
+
+            start = time.perf_counter()
+            dataset = self._load(previous, current)
+            if dataset is None:
+                # Se sigue sirviendo la versión actual y se reintenta en el siguiente ciclo
+                self.refresh_errors += 1
+                logger.warning("No se pudo cargar la nueva versión del dataset; se mantiene la actual")
+                return False
+            if self._prepare is not None:
+                try:
+                    self._prepare(dataset)
+                except Exception as e:
+                    logger.error(f"Error al preparar la nueva versión del dataset: {e}")
+
+            with self._lock:
+                self._dataset = dataset
+                self._version = dataset.version
+                self._carried = None
+                self._checked_at = time.monotonic()
+            self.refreshes += 1
+            self.refresh_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"Nueva versión del dataset publicada en {self.refresh_ms:.0f} ms")
+            return True
+
+    def start_refresher(self, interval):
+        """Lanza el hilo que refresca el dataset cada `interval` segundos (0 = desactivado).
+
+        La primera carga se hace en cuanto arranca el hilo, antes de la primera petición.
+        """
+        if self._thread is not None or interval <= 0:
+            return
+        self.interval = interval
+
+        def run():
+            while not self._stop.is_set():
+                # Un invalidate() durante el refresco vuelve a despertar al hilo en seguida
+                self._wake.clear()
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.refresh_errors += 1
+                    logger.error(f"Error al refrescar el dataset: {e}")
+                self._wake.wait(interval)
+
+        self._thread = threading.Thread(target=run, name='dataset-refresher', daemon=True)
+        self._thread.start()
+
+    def stop_refresher(self):
+        self._stop.set()
+        self._wake.set()
+
+    def invalidate(self):
+        """Descarta la copia en memoria; la siguiente lectura recargará desde el origen.
+
+        Con el refresco activo se mantiene la versión actual hasta que el hilo publica
+        la nueva, que se recarga sin consultar la versión del origen.
+        """
+        if self._thread is not None:
+            self._force = True
+            self.invalidations += 1
+            self._wake.set()
+            return
+        with self._lock:
+            if self._dataset is not None:
+                self._carried = self._dataset.carry_over()
+            self._dataset = None
+            self._version = None
+            self._checked_at = 0.0
+            self.invalidations += 1
+
+    def stats(self):
+        """Devuelve los contadores de la caché."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'invalidations': self.invalidations,
+                'updates': self.updates,
+                'version': str(self._version) if self._version is not None else None,
+                'rows': len(self._dataset) if self._dataset is not None else 0,
+                'ttl': self.ttl,
+                'refresh_interval': self.interval,
+                'refreshes': self.refreshes,
+                'refresh_errors': self.refresh_errors,
+                'refresh_ms': round(self.refresh_ms, 1)
+            }
@@ -0,0 +1,241 @@
+import os
+import json
+import logging
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from snapshot import prepare_snapshot_frame
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Estructura: deltas/index.json + deltas/delta-<secuencia>.json (mismo formato {"messages": [...]})
+DELTA_PREFIX = 'deltas'
+DELTA_INDEX_KEY = f'{DELTA_PREFIX}/index.json'
+DELTA_FORMAT = 1
+
+# Clave de un mensaje en el dataset
+KEY_COLUMNS = ['Username', 'Message ID']
+
+# Columnas que el scraper actualiza en los mensajes ya publicados
+UPDATE_COLUMNS = ['Views', 'Average Views', 'Average Difference', 'Score']
+
+# Label es del diario de etiquetas: los deltas no la modifican en los mensajes existentes
+PRESERVED_COLUMNS = ['Label']
+
+# Compactación: se reescribe el snapshot base al llegar a este número de deltas o cuando
+# sus filas superan esta fracción de las del base
+MAX_DELTAS = 24
+MAX_DELTA_RATIO = 0.2
+
+
+def delta_key(seq):
+    """Clave del delta con secuencia `seq`."""
+    return f"{DELTA_PREFIX}/delta-{seq:08d}.json"
+
+
+def empty_index():
+    return {
+        'format': DELTA_FORMAT,
+        'base_seq': 0,
+        'latest_seq': 0,
+        'base_rows': 0,
+        'deltas': []
+    }
+
+
+def read_index(path):
+    """Índice de deltas local, o None si no existe."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_index(index, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def _key_frame(df, name):
+    """(Username, Message ID) normalizados para comparar claves entre orígenes, con la posición."""
+    usernames = df['Username'].fillna('').astype(str).to_numpy() if 'Username' in df.columns else np.full(len(df), '')
+    return pd.DataFrame({
+        'username': usernames,
+        'message_id': pd.to_numeric(df['Message ID'], errors='coerce').to_numpy(dtype=np.float64),
+        name: np.arange(len(df))
+    })
+
+
+def match_keys(left, right):
+    """Pares (posición en `left`, posición en `right`) de las filas con la misma clave."""
+    pairs = _key_frame(left, 'left').merge(_key_frame(right, 'right'), on=['username', 'message_id'])
+    return pairs['left'].to_numpy(), pairs['right'].to_numpy()
+
+
+def _same(a, b):
+    """Máscara de los valores iguales (dos nulos cuentan como iguales)."""
+    nulls = pd.isna(a) & pd.isna(b)
+    with np.errstate(invalid='ignore'):
+        equal = np.asarray(a == b, dtype=bool)
+    return equal | nulls
+
+
+def diff_rows(previous, current, columns=UPDATE_COLUMNS):
+    """Filas de `current` nuevas o con alguna de `columns` distinta respecto a `previous`.
+
+    Devuelve (filas, número de nuevas, número de actualizadas).
+    """
+    if previous.empty or 'Message ID' not in previous.columns:
+        return current, len(current), 0
+    old, new = match_keys(previous, current)
+    found = np.zeros(len(current), dtype=bool)
+    found[new] = True
+
+    changed = np.zeros(len(current), dtype=bool)
+    for col in columns:
+        if col not in previous.columns or col not in current.columns:
+            continue
+        before = pd.to_numeric(previous[col], errors='coerce').to_numpy(dtype=np.float64)[old]
+        after = pd.to_numeric(current[col], errors='coerce').to_numpy(dtype=np.float64)[new]
+        changed[new[~_same(before, after)]] = True
+
+    rows = current[~found | changed]
+    return rows, int(np.count_nonzero(~found)), int(np.count_nonzero(changed))
+
+
+def _column_values(series, values):
+    """Array de la columna `series` con tipo suficiente para asignarle `values`."""
+    current = series.to_numpy(copy=True)
+    try:
+        dtype = np.result_type(current.dtype, values.dtype)
+    except TypeError:
+        dtype = np.dtype(object)
+    return current if dtype == current.dtype else current.astype(dtype)
+
+
+def upsert_rows(df, rows):
+    """`df` con las filas de `rows` aplicadas por (Username, Message ID).
+
+    Las filas que ya existen se actualizan en su posición (salvo las columnas de
+    PRESERVED_COLUMNS) y las nuevas se añaden al final en el orden del delta, así que las
+    posiciones de `df` no cambian. `df` no se modifica.
+    """
+    if rows.empty:
+        return df
+    if df.empty:
+        return rows.reset_index(drop=True)
+    rows = rows[[col for col in rows.columns if col in df.columns]]
+    subset = [col for col in KEY_COLUMNS if col in rows.columns]
+    rows = rows.drop_duplicates(subset=subset, keep='last').reset_index(drop=True)
+
+    positions, sources = match_keys(df, rows)
+    found = np.zeros(len(rows), dtype=bool)
+    found[sources] = True
+    appended = rows[~found]
+    if len(appended):
+        # Las columnas numéricas del base no pasan a objeto por valores de otro tipo en el delta
+        appended = appended.copy()
+        for col in appended.columns:
+            if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_numeric_dtype(appended[col]):
+                appended[col] = pd.to_numeric(appended[col], errors='coerce')
+        merged = pd.concat([df, appended], ignore_index=True)
+    else:
+        merged = df.copy(deep=False)
+
+    if len(positions):
+        for col in rows.columns:
+            if col in KEY_COLUMNS or col in PRESERVED_COLUMNS:
+                continue
+            values = rows[col].to_numpy()[sources]
+            if _same(merged[col].to_numpy()[positions], values).all():
+                continue
+            # Se sustituye la columna por una copia: la versión anterior sigue intacta
+            column = _column_values(merged[col], values)
+            column[positions] = values
+            merged[col] = column
+    return merged
+
+
+def delta_frame(documents):
+    """DataFrame con las filas de los deltas `documents` (ya decodificados), en orden de secuencia."""
+    frames = [pd.DataFrame(document['messages']) for document in documents]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    rows = pd.concat(frames, ignore_index=True)
+    subset = [col for col in KEY_COLUMNS if col in rows.columns]
+    return rows.drop_duplicates(subset=subset, keep='last').reset_index(drop=True)
+
+
+def pending_deltas(index, seq):
+    """Entradas del índice posteriores a `seq`, o None si la secuencia tiene huecos."""
+    if seq < index['base_seq']:
+        return None
+    entries = [entry for entry in index['deltas'] if entry['seq'] > seq]
+    if [entry['seq'] for entry in entries] != list(range(seq + 1, index['latest_seq'] + 1)):
+        return None
+    return entries
+
+
+def should_compact(index, rows, max_deltas=MAX_DELTAS, max_ratio=MAX_DELTA_RATIO):
+    """Indica si el siguiente cambio (de `rows` filas) debe reescribir el snapshot base."""
+    if index is None or not index['base_rows']:
+        return True
+    pending = sum(entry['rows'] for entry in index['deltas']) + rows
+    return len(index['deltas']) + 1 > max_deltas or pending > max_ratio * index['base_rows']
+
+
+def write_delta(rows, root, index, new, updated):
+    """Escribe el delta siguiente de `index` bajo `root` y devuelve (índice, entrada).
+
+    El delta se escribe antes que el índice, así que un lector nunca ve una secuencia cuyo
+    archivo todavía no existe.
+    """
+    index = index or empty_index()
+    seq = index['latest_seq'] + 1
+    key = delta_key(seq)
+    path = os.path.join(root, *key.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    messages = prepare_snapshot_frame(rows.reset_index(drop=True)).to_json(
+        orient='records', date_format='iso', force_ascii=False)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        f.write(f'{{"seq": {seq}, "messages": {messages}}}')
+    os.replace(f"{path}.tmp", path)
+
+    entry = {
+        'seq': seq,
+        'key': key,
+        'rows': len(rows),
+        'new': new,
+        'updated': updated,
+        'generated_at': datetime.now(timezone.utc).isoformat()
+    }
+    index = dict(index, latest_seq=seq, deltas=index['deltas'] + [entry])
+    write_index(index, os.path.join(root, *DELTA_INDEX_KEY.split('/')))
+    logger.info(f"Delta {seq} escrito en {path}: {new} filas nuevas, {updated} actualizadas")
+    return index, entry
+
+
+def compact_index(root, index, rows):
+    """Índice tras reescribir el snapshot base con `rows` filas; devuelve (índice, entradas plegadas).
+
+    La compactación también avanza la secuencia, así que los lectores detectan el cambio
+    de base. Los archivos locales de los deltas plegados se borran.
+    """
+    index = index or empty_index()
+    seq = index['latest_seq'] + 1
+    folded = index['deltas']
+    compacted = dict(empty_index(), base_seq=seq, latest_seq=seq, base_rows=rows,
+                     generated_at=datetime.now(timezone.utc).isoformat())
+    write_index(compacted, os.path.join(root, *DELTA_INDEX_KEY.split('/')))
+    for entry in folded:
+        try:
+            os.remove(os.path.join(root, *entry['key'].split('/')))
+        except OSError:
+            pass
+    logger.info(f"Deltas compactados en el snapshot base (secuencia {seq}, {len(folded)} deltas plegados)")
+    return compacted, folded
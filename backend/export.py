@@ -0,0 +1,163 @@
+import io
+import uuid
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from serialization import iter_ndjson, STREAM_BATCH_SIZE
+from snapshot import prepare_snapshot_frame, NON_SERIALIZABLE_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él no se ofrece la exportación a Parquet
+    pa = None
+    pq = None
+
+# Formato -> (tipo MIME, extensión del archivo)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Criterios de etiqueta con nombre; también se aceptan valores numéricos separados por comas
+LABEL_CRITERIA = {
+    'relevant': lambda labels: labels == 1.0,
+    'irrelevant': lambda labels: labels == 0.0,
+    'labeled': lambda labels: ~np.isnan(labels),
+    'unlabeled': lambda labels: np.isnan(labels),
+}
+
+# Las exportaciones a S3 se suben siempre bajo este prefijo, con un nombre generado: nunca
+# pueden sobrescribir los datos que leen el servidor y el scraper
+EXPORT_PREFIX = 'exports'
+
+# Filas por grupo de filas de Parquet (cada grupo se escribe y se envía por separado)
+PARQUET_ROW_GROUP_SIZE = 50_000
+
+
+class ExportError(ValueError):
+    """Error de validación en los parámetros de una exportación."""
+
+
+def export_formats():
+    """Formatos disponibles en este entorno (Parquet sólo si pyarrow está instalado)."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or pq is not None]
+
+
+def export_key(fmt):
+    """Clave S3 nueva para una exportación en el formato `fmt` (exports/<fecha>-<id>.<ext>)."""
+    extension = EXPORT_FORMATS[fmt][1]
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return f"{EXPORT_PREFIX}/telegram_messages_export-{stamp}-{uuid.uuid4().hex[:8]}.{extension}"
+
+
+def parse_columns(df, value):
+    """Columnas pedidas (separadas por comas) o todas las serializables si no se indica ninguna."""
+    columns = [col.strip() for col in (value or '').split(',') if col.strip()]
+    if not columns:
+        return [col for col in df.columns if col not in NON_SERIALIZABLE_COLUMNS]
+    unknown = [col for col in columns if col not in df.columns]
+    if unknown:
+        raise ExportError(f"Columnas no disponibles: {', '.join(unknown)}")
+    return columns
+
+
+def label_mask(df, criteria):
+    """Máscara de las filas cuya etiqueta cumple `criteria` ('relevant', '0,1', ...)."""
+    if 'Label' not in df.columns:
+        raise ExportError("No hay columna 'Label' para filtrar por etiqueta")
+    # Label puede mezclar '' con 0/1 (CSV) o ser ya numérica (diario de etiquetas aplicado)
+    labels = pd.to_numeric(df['Label'], errors='coerce').to_numpy(dtype=np.float64)
+    mask = np.zeros(len(df), dtype=bool)
+    for criterion in str(criteria).split(','):
+        criterion = criterion.strip().lower()
+        if not criterion:
+            continue
+        if criterion in LABEL_CRITERIA:
+            mask |= LABEL_CRITERIA[criterion](labels)
+            continue
+        try:
+            mask |= labels == float(criterion)
+        except ValueError:
+            raise ExportError(f"Criterio de etiqueta no válido: {criterion}")
+    return mask
+
+
+def export_positions(dataset, query, label=None, ordered=False):
+    """Posiciones de las filas a exportar: filtros de `query` y, opcionalmente, de etiqueta.
+
+    Sin `ordered` se conserva el orden del dataset; con él, el orden de la consulta.
+    """
+    mask = query.mask(dataset)
+    if label:
+        np.logical_and(mask, label_mask(dataset.df, label), out=mask)
+    if ordered:
+        return dataset.ordered_positions(mask, query.sort_by)
+    return np.flatnonzero(mask)
+
+
+def iter_csv(df, positions, columns, batch_size=STREAM_BATCH_SIZE):
+    """Genera el CSV por lotes de filas (la cabecera va con el primero)."""
+    indexer = [df.columns.get_loc(col) for col in columns]
+    for start in range(0, max(len(positions), 1), batch_size):
+        batch = df.iloc[positions[start:start + batch_size], indexer]
+        yield batch.to_csv(index=False, header=start == 0, lineterminator='\n').encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Archivo de sólo escritura que acumula lo escrito hasta que se recoge con `drain`."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(df, positions, columns, batch_size=PARQUET_ROW_GROUP_SIZE):
+    """Genera un archivo Parquet grupo de filas a grupo de filas, sin construirlo entero en memoria."""
+    if pq is None:
+        raise ExportError("pyarrow no está instalado; no se puede exportar a Parquet")
+
+    indexer = [df.columns.get_loc(col) for col in columns]
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    for start in range(0, max(len(positions), 1), batch_size):
+        batch = prepare_snapshot_frame(df.iloc[positions[start:start + batch_size], indexer])
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+        if writer is None:
+            # Columnas sin valores en el primer lote: se guardan como texto
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                for field in table.schema]).remove_metadata()
+            writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        writer.write_table(table.cast(schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(df, positions, columns, fmt):
+    """Generador de bytes del archivo exportado en el formato `fmt`."""
+    if fmt == 'csv':
+        return iter_csv(df, positions, columns)
+    if fmt == 'ndjson':
+        return iter_ndjson(df, positions, columns)
+    if fmt == 'parquet':
+        return iter_parquet(df, positions, columns)
+    raise ExportError(f"Formato no soportado: {fmt}")
@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from dataset import NAT
+
+NS_PER_DAY = 86_400 * 10**9
+
+# Cada faceta se cuenta sin su propio filtro, para ver cuántos mensajes daría cada opción
+FACET_EXCLUDES = {
+    'channels': ('channel',),
+    'media_types': ('mediaType',),
+    'days': ('dateStart', 'dateEnd'),
+}
+
+
+def category_counts(categorical, mask):
+    """[{'value', 'count'}] de las categorías presentes en `mask`, de más a menos frecuente."""
+    codes = categorical.codes[mask]
+    counts = np.bincount(codes[codes >= 0], minlength=len(categorical.categories))
+    present = np.flatnonzero(counts)
+    # Orden por recuento descendente y, en empate, por nombre (las categorías ya están ordenadas)
+    present = present[np.argsort(-counts[present], kind='stable')]
+    categories = categorical.categories
+    return [{'value': str(categories[i]), 'count': int(counts[i])} for i in present]
+
+
+def day_counts(date_sent, mask):
+    """[{'date', 'count'}] por día de envío de las filas de `mask`, en orden cronológico."""
+    values = date_sent[mask]
+    values = values[values != NAT]
+    if len(values) == 0:
+        return []
+    days = values // NS_PER_DAY
+    first = int(days.min())
+    counts = np.bincount(days - first)
+    present = np.flatnonzero(counts)
+    dates = pd.to_datetime((present + first) * NS_PER_DAY).strftime('%Y-%m-%d')
+    return [{'date': date, 'count': int(count)} for date, count in zip(dates, counts[present])]
+
+
+def compute_facets(dataset, query):
+    """Recuentos por canal, tipo de medio y día para los filtros de `query`."""
+    masks = {}
+
+    def mask_without(names):
+        if names not in masks:
+            masks[names] = query.mask(dataset, exclude=names)
+        return masks[names]
+
+    facets = {'total': int(np.count_nonzero(mask_without(())))}
+    if dataset.channel is not None:
+        facets['channels'] = category_counts(dataset.channel, mask_without(FACET_EXCLUDES['channels']))
+    if dataset.media_type is not None:
+        facets['media_types'] = category_counts(dataset.media_type, mask_without(FACET_EXCLUDES['media_types']))
+    if dataset.date_sent is not None:
+        facets['days'] = day_counts(dataset.date_sent, mask_without(FACET_EXCLUDES['days']))
+    return facets
+
+
+class FacetCache:
+    """Caché LRU de facetas por (versión del dataset, consulta normalizada)."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, dataset, query):
+        key = (dataset.version, dataset.generation, query.key())
+        with self._lock:
+            facets = self._entries.get(key)
+            if facets is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return facets
+            self.misses += 1
+
+        facets = compute_facets(dataset, query)
+        with self._lock:
+            if self._generation is not None and dataset.generation < self._generation:
+                return facets
+            if dataset.generation != self._generation:
+                # Nueva versión del dataset: las entradas anteriores ya no sirven
+                self._entries.clear()
+                self._generation = dataset.generation
+            self._entries[key] = facets
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return facets
+
+    def stats(self):
+        """Devuelve los contadores de la caché."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
@@ -0,0 +1,130 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app
+from markupsafe import Markup
+
+# Plantilla de una tarjeta y plantilla del listado (para el mensaje de "sin resultados")
+CARD_TEMPLATE = 'message_card.html'
+LIST_TEMPLATE = 'message_cards_partial.html'
+
+
+class FragmentCache:
+    """Caché LRU de tarjetas de mensaje ya renderizadas, acotada en entradas y en bytes.
+
+    Cada tarjeta se guarda con la clave (Message ID, Username, Label, Score, versión de la
+    plantilla, huella de Embed/URL) y las páginas se montan concatenando fragmentos. Un
+    cambio de etiqueta produce otra clave, de modo que sólo se vuelve a renderizar la
+    tarjeta afectada; `invalidate()` descarta además las copias antiguas de ese mensaje.
+    Sólo se guardan tarjetas construidas en el servidor a partir del dataset.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._by_message = {}
+        self._lock = threading.Lock()
+        self._template_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def template_version(self):
+        """Huella del código fuente de la plantilla de tarjeta (se calcula una vez por proceso)."""
+        if self._template_version is None:
+            env = current_app.jinja_env
+            source, _, _ = env.loader.get_source(env, CARD_TEMPLATE)
+            self._template_version = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+        return self._template_version
+
+    def _key(self, message):
+        # Embed y URL entran como huella: pueden cambiar sin que cambie el resto de la clave
+        content = f"{message.get('Embed')}\x00{message.get('URL')}"
+        return (
+            message.get('Message ID'),
+            message.get('Username'),
+            message.get('Label'),
+            message.get('Score'),
+            self.template_version(),
+            hashlib.sha1(content.encode('utf-8')).hexdigest()
+        )
+
+    def render(self, messages, cache=True):
+        """HTML del listado de tarjetas, reutilizando los fragmentos ya renderizados.
+
+        Con `cache=False` (tarjetas enviadas por el cliente) se renderizan todas sin leer
+        ni guardar nada en la caché.
+        """
+        if not messages:
+            return current_app.jinja_env.get_template(LIST_TEMPLATE).render(messages=[])
+
+        template = current_app.jinja_env.get_template(CARD_TEMPLATE)
+        if not cache:
+            return Markup('\n'.join(template.render(message=message) for message in messages))
+        parts = []
+        for message in messages:
+            key = self._key(message)
+            with self._lock:
+                entry = self._entries.get(key)
+                html = entry[0] if entry is not None else None
+                if html is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if html is None:
+                html = template.render(message=message)
+                self._put(key, html)
+            parts.append(html)
+        return Markup('\n'.join(parts))
+
+    def _put(self, key, html):
+        size = len(html.encode('utf-8'))
+        with self._lock:
+            if key in self._entries or size > self.max_bytes:
+                return
+            self._entries[key] = (html, size)
+            self._bytes += size
+            self._by_message.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._forget(evicted)
+                self.evictions += 1
+
+    def _forget(self, key):
+        keys = self._by_message.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_message[key[0]]
+
+    def invalidate(self, message_id):
+        """Descarta las tarjetas renderizadas de un mensaje (p. ej. tras etiquetarlo)."""
+        with self._lock:
+            for key in self._by_message.pop(message_id, ()):
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_message.clear()
+            self._bytes = 0
+            self._template_version = None
+
+    def stats(self):
+        """Devuelve los contadores de la caché."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,109 @@
+import hashlib
+import zlib
+from flask import request, g, Response
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él sólo se negocia gzip
+    brotli = None
+
+# Tipos de contenido que se comprimen y tamaño mínimo (bytes) de las respuestas no streaming
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/html', 'text/csv'}
+MIN_COMPRESS_SIZE = 1024
+ENCODINGS = ('br', 'gzip')
+
+
+def make_etag(dataset, *parts):
+    """ETag fuerte derivado de la versión del dataset, de las etiquetas aplicadas y de la consulta."""
+    digest = hashlib.sha1(repr((dataset.label_seq,) + parts).encode('utf-8')).hexdigest()[:12]
+    return f"{dataset.version_tag}-{digest}"
+
+
+def is_not_modified(etag):
+    """Indica si el If-None-Match de la petición ya contiene `etag` (en cualquier codificación)."""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    return any(if_none_match.contains(candidate)
+               for candidate in [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS])
+
+
+def not_modified(etag):
+    """Respuesta 304 sin cuerpo, con el ETag de la representación que tiene el cliente."""
+    response = Response(status=304)
+    variants = [f"{etag}-{encoding}" for encoding in ENCODINGS]
+    response.set_etag(next((variant for variant in variants if request.if_none_match.contains(variant)), etag))
+    return response
+
+
+def negotiate_encoding():
+    """Codificación preferida entre las que acepta el cliente (br si hay brotli, si no gzip)."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_bytes(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Comprime un cuerpo en streaming trozo a trozo, sin reunirlo en memoria."""
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            data = compressor.process(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response):
+    """Comprime la respuesta con la codificación negociada si es de un tipo comprimible."""
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    encoding = negotiate_encoding()
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # Cada codificación es una representación distinta del mismo recurso
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def finalize_response(response):
+    """Añade la cabecera X-Dataset-Version y comprime la respuesta (hook after_request)."""
+    dataset_version = g.get('dataset_version')
+    if dataset_version:
+        response.headers['X-Dataset-Version'] = dataset_version
+    return compress_response(response)
@@ -0,0 +1,203 @@
+import re
+import json
+import codecs
+import numpy as np
+import pandas as pd
+
+# Caracteres de texto que se decodifican por lectura
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Mensajes que se acumulan como diccionarios antes de pasarlos a las columnas
+BATCH_SIZE = 10_000
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+def byte_chunks(source, chunk_size=READ_CHUNK_SIZE):
+    """Bloques de bytes de un archivo binario abierto, o de un iterable de bloques (iter_content)."""
+    if hasattr(source, 'read'):
+        return iter(lambda: source.read(chunk_size), b'')
+    return source
+
+
+class _Reader:
+    """Texto JSON que se decodifica por bloques; sólo se conserva lo que queda por leer."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Añade el bloque siguiente al texto pendiente; False al final de la entrada."""
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            text = self._utf8.decode(b'', final=True)
+        else:
+            text = self._utf8.decode(chunk)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Siguiente carácter que no es espacio en blanco ('' al final de la entrada)."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Se esperaba uno de {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Siguiente valor JSON completo (un mensaje, una clave, ...)."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Valor cortado al final del bloque: se lee el siguiente y se vuelve a intentar
+                if not self.fill():
+                    raise
+                continue
+            # Un número al final del bloque puede continuar en el siguiente
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Genera los elementos del array cuyo '[' se acaba de leer, hasta su ']'."""
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        decode = _decoder.raw_decode
+        skip = WHITESPACE.match
+        buffer, pos = self.buffer, self.pos
+        while True:
+            start = pos
+            try:
+                value, end = decode(buffer, pos)
+                pos = skip(buffer, end).end()
+                separator = buffer[pos]
+            except (json.JSONDecodeError, IndexError):
+                # Elemento (o su separador) cortado al final del bloque: se lee el siguiente
+                self.pos = start
+                if not self.fill():
+                    raise json.JSONDecodeError("Array sin terminar", buffer, start)
+                buffer = self.buffer
+                pos = skip(buffer, self.pos).end()
+                continue
+            yield value
+            if separator == ']':
+                self.pos = pos + 1
+                return
+            if separator != ',':
+                raise json.JSONDecodeError("Se esperaba ',' o ']'", buffer, pos)
+            pos = skip(buffer, pos + 1).end()
+
+
+def iter_array(chunks, key='messages'):
+    """Genera uno a uno los elementos del array `key` del objeto JSON que llega en `chunks` (bytes).
+
+    Sólo se decodifica a objetos Python un elemento cada vez; el resto de claves del objeto
+    se leen y se descartan. Lanza KeyError si el objeto no tiene `key`.
+    """
+    reader = _Reader(byte_chunks(chunks))
+    reader.expect('{')
+    found = False
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            name = reader.value()
+            reader.expect(':')
+            if name == key:
+                found = True
+                reader.expect('[')
+                yield from reader.items()
+            else:
+                reader.value()
+            if reader.expect(',}') == '}':
+                break
+    if not found:
+        raise KeyError(key)
+
+
+class ColumnBuffers:
+    """Columnas de un DataFrame que se llena mensaje a mensaje.
+
+    Los mensajes se agrupan en lotes de `batch_size`; cada lote se convierte con
+    `pd.DataFrame(lista de diccionarios)`, se guardan sus columnas y se descartan los
+    diccionarios. Las columnas que no aparecen en un lote valen NaN en sus filas.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.rows = 0
+        self._batch = []
+        self._chunks = {}
+
+    def append(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        frame = pd.DataFrame(batch)
+        del batch
+        for key in frame.columns:
+            chunks = self._chunks.get(key)
+            if chunks is None:
+                # Columna nueva: las filas anteriores no la tenían
+                chunks = self._chunks[key] = [np.full(self.rows, np.nan)] if self.rows else []
+            chunks.append(frame[key].to_numpy())
+        for key, chunks in self._chunks.items():
+            if key not in frame.columns:
+                chunks.append(np.full(len(frame), np.nan))
+        self.rows += len(frame)
+
+    def frame(self):
+        """DataFrame con todas las filas; las columnas se unen (y sus lotes se liberan) una a una."""
+        self.flush()
+        columns = {}
+        for key in list(self._chunks):
+            columns[key] = _combine(self._chunks.pop(key))
+        return pd.DataFrame(columns, copy=False)
+
+
+def _combine(chunks):
+    """Une los lotes de una columna con el tipo que habría inferido pandas para la columna entera."""
+    if len(chunks) == 1:
+        return chunks[0]
+    kinds = {chunk.dtype.kind for chunk in chunks}
+    if len({chunk.dtype for chunk in chunks}) == 1 or kinds <= {'i', 'f'}:
+        return np.concatenate(chunks)
+    # Tipos distintos entre lotes (p. ej. un lote sólo con nulos): se infiere sobre los valores
+    values = np.concatenate([chunk.astype(object) for chunk in chunks])
+    return pd.Series(values.tolist()).to_numpy()
+
+
+def read_messages(source, key='messages', batch_size=BATCH_SIZE):
+    """DataFrame del array `key` de un JSON (archivo binario o bloques de bytes) leído por lotes.
+
+    Equivale a `pd.DataFrame(json.load(f)[key])` sin tener a la vez el texto completo, todos
+    los diccionarios y el DataFrame: el pico de memoria queda cerca del DataFrame final.
+    """
+    buffers = ColumnBuffers(batch_size)
+    for record in iter_array(source, key):
+        buffers.append(record)
+    return buffers.frame()
@@ -0,0 +1,227 @@
+import threading
+import time
+import logging
+from sqlalchemy import func
+from models import db, LabelEvent
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LabelJournal:
+    """Diario de etiquetas de solo escritura al final, guardado en la base de datos de la app.
+
+    Cada etiqueta es una entrada (Username, Message ID, label) con una secuencia creciente.
+    Las etiquetas se superponen al dataset en memoria al leerlo (`apply`) y una tarea en
+    segundo plano las vuelca periódicamente al dataset de origen (`start_compaction`).
+    """
+
+    def __init__(self):
+        self.appended = 0
+        self.compactions = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def append(self, entries):
+        """Añade [(username, message_id, label), ...] al diario y devuelve la última secuencia."""
+        events = [LabelEvent(username=str(username), message_id=int(message_id), label=int(label))
+                  for username, message_id, label in entries]
+        if not events:
+            return self.sequence()
+        db.session.add_all(events)
+        db.session.commit()
+        self.appended += len(events)
+        return events[-1].id
+
+    def sequence(self):
+        """Última secuencia escrita en el diario (0 si está vacío)."""
+        return db.session.query(func.max(LabelEvent.id)).scalar() or 0
+
+    def pending(self):
+        """Número de entradas todavía sin compactar."""
+        return db.session.query(func.count(LabelEvent.id)).scalar()
+
+    def labels_since(self, sequence):
+        """Última etiqueta por (username, message_id) de las entradas posteriores a `sequence`.
+
+        Devuelve (etiquetas, última secuencia leída).
+        """
+        rows = (db.session.query(LabelEvent.id, LabelEvent.username, LabelEvent.message_id, LabelEvent.label)
+                .filter(LabelEvent.id > sequence)
+                .order_by(LabelEvent.id)
+                .all())
+        labels = {}
+        for event_id, username, message_id, label in rows:
+            labels[(username, message_id)] = label
+            sequence = event_id
+        return labels, sequence
+
+    def apply(self, dataset):
+        """Superpone al dataset las etiquetas del diario que todavía no tiene."""
+        current = self.sequence()
+        if current <= dataset.label_seq:
+            return dataset
+        labels, sequence = self.labels_since(dataset.label_seq)
+        dataset.apply_labels(labels, sequence)
+        return dataset
+
+    def truncate(self, sequence):
+        """Borra las entradas hasta `sequence`, ya volcadas al dataset de origen."""
+        deleted = LabelEvent.query.filter(LabelEvent.id <= sequence).delete(synchronize_session=False)
+        db.session.commit()
+        self.compactions += 1
+        logger.info(f"Diario de etiquetas compactado hasta la secuencia {sequence} ({deleted} entradas)")
+        return deleted
+
+    def start_compaction(self, compact, interval):
+        """Lanza un hilo que llama a `compact()` cada `interval` segundos."""
+        if self._thread is not None or interval <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    compact()
+                except Exception as e:
+                    logger.error(f"Error al compactar el diario de etiquetas: {e}")
+
+        self._thread = threading.Thread(target=run, name='label-compaction', daemon=True)
+        self._thread.start()
+
+    def stop_compaction(self):
+        self._stop.set()
+
+    def stats(self):
+        """Devuelve los contadores del diario."""
+        return {
+            'sequence': self.sequence(),
+            'pending': self.pending(),
+            'appended': self.appended,
+            'compactions': self.compactions
+        }
+
+
+class _Ticket:
+    """Resultado pendiente de una escritura agrupada."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.sequence = None
+        self.error = None
+
+    def resolve(self, sequence=None, error=None):
+        self.sequence = sequence
+        self.error = error
+        self._event.set()
+
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise TimeoutError("La escritura de etiquetas no se completó a tiempo")
+        if self.error is not None:
+            raise self.error
+        return self.sequence
+
+
+class LabelWriteBuffer:
+    """Agrupa las etiquetas de peticiones concurrentes en una sola escritura del diario.
+
+    Las etiquetas se vuelcan cuando pasan `debounce` segundos sin recibir nuevas o, como
+    muy tarde, `max_latency` segundos después de la primera pendiente. Cada petición
+    espera a que su lote esté escrito, así que la respuesta sigue confirmando la escritura.
+    Si la espera vence, las etiquetas que aún no se estaban escribiendo se retiran (no se
+    aplicarán); las que ya se están escribiendo quedan pendientes de confirmar.
+    """
+
+    def __init__(self, flush, debounce=0.05, max_latency=0.25):
+        self._flush = flush
+        self.debounce = debounce
+        self.max_latency = max_latency
+        self._cond = threading.Condition()
+        # [(ticket, entradas)] de las peticiones que esperan a la siguiente escritura
+        self._pending = []
+        self._first_at = 0.0
+        self._last_at = 0.0
+        self._thread = None
+        self.flushes = 0
+        self.flushed = 0
+        self.withdrawn = 0
+
+    def submit(self, entries, timeout=None):
+        """Encola [(username, message_id, label), ...] y devuelve la secuencia del diario al escribirlas.
+
+        Si la espera vence antes de que empiece su escritura, las etiquetas se retiran y se
+        lanza TimeoutError; si ya se están escribiendo, se devuelve None (pendientes).
+        """
+        ticket = _Ticket()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='label-writer', daemon=True)
+                self._thread.start()
+            now = time.monotonic()
+            if not self._pending:
+                self._first_at = now
+            self._last_at = now
+            self._pending.append((ticket, entries))
+            self._cond.notify()
+        try:
+            return ticket.wait(timeout if timeout is not None else self.max_latency + 30)
+        except TimeoutError:
+            with self._cond:
+                queued = [batch for batch in self._pending if batch[0] is ticket]
+                if queued:
+                    # Todavía no se estaban escribiendo: se retiran para no aplicarlas más tarde
+                    self._pending.remove(queued[0])
+                    self.withdrawn += len(entries)
+                    raise
+        if ticket.done():
+            return ticket.wait(0)
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Se espera a que deje de llegar trabajo, sin superar la latencia máxima
+                while True:
+                    now = time.monotonic()
+                    deadline = min(self._last_at + self.debounce, self._first_at + self.max_latency)
+                    if now >= deadline:
+                        break
+                    self._cond.wait(deadline - now)
+                batches, self._pending = self._pending, []
+            if not batches:
+                # Todas las peticiones del lote se retiraron durante la espera
+                continue
+            tickets = [ticket for ticket, _ in batches]
+            entries = [entry for _, batch in batches for entry in batch]
+
+            try:
+                sequence = self._flush(entries)
+            except Exception as e:
+                logger.error(f"Error al escribir {len(entries)} etiquetas en el diario: {e}")
+                for ticket in tickets:
+                    ticket.resolve(error=e)
+                continue
+
+            self.flushes += 1
+            self.flushed += len(entries)
+            for ticket in tickets:
+                ticket.resolve(sequence)
+
+    def stats(self):
+        """Devuelve los contadores de escrituras agrupadas."""
+        with self._cond:
+            pending = sum(len(batch) for _, batch in self._pending)
+        return {
+            'flushes': self.flushes,
+            'flushed': self.flushed,
+            'withdrawn': self.withdrawn,
+            'pending': pending,
+            'debounce_ms': round(self.debounce * 1000),
+            'max_latency_ms': round(self.max_latency * 1000)
+        }
@@ -0,0 +1,340 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+import numpy as np
+from dataset import NAT
+from query import QueryError, decode_cursor
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columna SQL con la clave de orden de cada columna de ordenación del dataset
+SQL_SORT_KEYS = {'Score': 'score_key', 'Views': 'views_key'}
+
+# Posición mayor que cualquier fila: en un ancla, "después de todos los empates"
+AFTER_TIES = 2 ** 62
+
+
+class MessageStore:
+    """Interfaz de los motores que resuelven las consultas de mensajes.
+
+    Un motor devuelve resultados con el total de filas y las posiciones (en el DataFrame
+    del dataset) de las páginas pedidas, de modo que la proyección de columnas, los
+    cursores y los ETags son comunes a todos los motores.
+    """
+
+    name = None
+
+    def get(self, dataset, query, depth):
+        """Resultado de `query` que cubre al menos las `depth` primeras filas."""
+        raise NotImplementedError
+
+    def seek(self, dataset, query, token, page_size):
+        """(resultado, índice de inicio) para continuar la paginación desde un cursor."""
+        raise NotImplementedError
+
+    def prepare(self, dataset):
+        """Prepara el motor para una versión nueva antes de publicarla (hilo de refresco)."""
+
+    def stats(self):
+        return {'engine': self.name}
+
+
+class PandasMessageStore(MessageStore):
+    """Motor por defecto: máscaras de numpy sobre el dataset en memoria y caché de resultados."""
+
+    name = 'pandas'
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, dataset, query, depth):
+        return self.cache.get(dataset, query, depth)
+
+    def seek(self, dataset, query, token, page_size):
+        return self.cache.seek(dataset, query, token, page_size)
+
+    def stats(self):
+        return dict(self.cache.stats(), engine=self.name)
+
+
+class _SQLiteSnapshot:
+    """Conexión a la base de datos construida para una versión del dataset."""
+
+    def __init__(self, connection, generation, columns):
+        self.connection = connection
+        self.generation = generation
+        self.columns = columns
+        self.lock = threading.Lock()
+
+    def fetch(self, sql, params):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+
+class SQLQueryResult:
+    """Resultado de una consulta SQL: el total se conoce y las páginas se piden al motor.
+
+    Si tiene un ancla (índice, clave, posición), la página que empieza en ese índice se
+    pide por keyset (`(clave, pos) > ancla`) en lugar de con OFFSET.
+    """
+
+    complete = True
+
+    def __init__(self, snapshot, where, params, key, total, anchor=None):
+        self._snapshot = snapshot
+        self._where = where
+        self._params = params
+        self._key = key
+        self.total = total
+        self.anchor = anchor
+
+    def covers(self, depth):
+        return True
+
+    def page(self, start, stop):
+        limit = max(0, stop - start)
+        order = f"{self._key}, pos" if self._key else "pos"
+        if self.anchor is not None and start == self.anchor[0] and self._key:
+            _, key, pos = self.anchor
+            sql = (f"SELECT pos FROM messages WHERE {self._where} AND ({self._key}, pos) > (?, ?) "
+                   f"ORDER BY {order} LIMIT ?")
+            rows = self._snapshot.fetch(sql, self._params + [key, pos, limit])
+        else:
+            sql = f"SELECT pos FROM messages WHERE {self._where} ORDER BY {order} LIMIT ? OFFSET ?"
+            rows = self._snapshot.fetch(sql, self._params + [limit, start])
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def position(self, index):
+        return int(self.page(index, index + 1)[0])
+
+
+class SQLiteMessageStore(MessageStore):
+    """Motor SQL embebido: cada versión del dataset se vuelca a una tabla SQLite indexada.
+
+    Los filtros de /filter_messages se traducen a un WHERE sobre columnas indexadas
+    (fecha de envío, canal, tipo de medio, score) y el orden a un índice sobre la clave
+    de orden (score o views), con páginas por LIMIT/OFFSET o por keyset desde un cursor.
+
+    La base de datos de cada versión se construye fuera de las peticiones (en `prepare`,
+    desde el hilo de refresco, o en un hilo propio); mientras no está lista las consultas
+    se resuelven en memoria con la caché de resultados.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, cache):
+        self.path = path
+        self._snapshot = None
+        self._building = None
+        self._state_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.builds = 0
+        self.build_errors = 0
+        self.build_ms = 0.0
+        self.queries = 0
+        self.fallbacks = 0
+        # Para versiones cuya base de datos aún se construye o ya está sustituida
+        self._fallback = PandasMessageStore(cache)
+
+    def _ensure(self, dataset):
+        """Base de datos de esta versión del dataset, o None si todavía no está construida."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.generation == dataset.generation:
+            return snapshot
+        with self._state_lock:
+            newer = max(self._building or 0, snapshot.generation if snapshot is not None else 0)
+            if newer >= dataset.generation:
+                return None
+            self._building = dataset.generation
+        threading.Thread(target=self.prepare, args=(dataset,), name='message-store-build', daemon=True).start()
+        return None
+
+    def prepare(self, dataset):
+        """Construye la base de datos de `dataset` si no hay ya una igual o más nueva."""
+        with self._state_lock:
+            self._building = max(self._building or 0, dataset.generation)
+        with self._build_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.generation >= dataset.generation:
+                return
+            try:
+                self._snapshot = self._build(dataset)
+            except Exception as e:
+                self.build_errors += 1
+                logger.error(f"Error al construir la base de datos SQLite de mensajes: {e}")
+            finally:
+                with self._state_lock:
+                    if self._building is not None and self._building <= dataset.generation:
+                        self._building = None
+
+    def _build(self, dataset):
+        start = time.perf_counter()
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # Temporal propio: otros procesos pueden estar construyendo su base de datos a la vez
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.path)}.", suffix='.tmp')
+        os.close(fd)
+        try:
+            columns = self._write(dataset, tmp_path)
+            # La conexión se abre antes de mover el archivo: sigue en este archivo aunque
+            # otro proceso sustituya después el de `path`
+            connection = sqlite3.connect(tmp_path, check_same_thread=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Las consultas en curso mantienen abierta la conexión (y el archivo) de la versión anterior
+        snapshot = _SQLiteSnapshot(connection, dataset.generation, columns)
+        self.builds += 1
+        self.build_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Base de datos SQLite de mensajes construida: {len(dataset)} filas en {self.build_ms:.0f} ms")
+        return snapshot
+
+    def _write(self, dataset, path):
+        """Vuelca el dataset a una base de datos nueva en `path`; devuelve las columnas disponibles."""
+        n = len(dataset)
+        columns = {
+            'date_sent': dataset.date_sent is not None,
+            'channel': dataset.channel is not None,
+            'media_type': dataset.media_type is not None,
+            'score': dataset.score is not None
+        }
+        date_sent = _nullable(dataset.date_sent, dataset.date_sent == NAT if dataset.date_sent is not None else None, n)
+        score = _nullable(dataset.score, np.isnan(dataset.score) if dataset.score is not None else None, n)
+        channel = np.asarray(dataset.channel, dtype=object) if dataset.channel is not None else [None] * n
+        media_type = np.asarray(dataset.media_type, dtype=object) if dataset.media_type is not None else [None] * n
+        keys = {name: (dataset.sort_key(column).tolist() if column in dataset.df.columns else [None] * n)
+                for column, name in SQL_SORT_KEYS.items()}
+
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(
+            "CREATE TABLE messages (pos INTEGER PRIMARY KEY, date_sent INTEGER, channel TEXT, "
+            "media_type TEXT, score REAL, score_key REAL, views_key REAL)")
+        connection.executemany(
+            "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)",
+            zip(range(n), date_sent, channel, media_type, score, keys['score_key'], keys['views_key']))
+        connection.executescript("""
+            CREATE INDEX ix_messages_date_sent ON messages (date_sent);
+            CREATE INDEX ix_messages_channel ON messages (channel, date_sent);
+            CREATE INDEX ix_messages_media_type ON messages (media_type, date_sent);
+            CREATE INDEX ix_messages_score ON messages (score);
+            CREATE INDEX ix_messages_score_key ON messages (score_key);
+            CREATE INDEX ix_messages_views_key ON messages (views_key);
+            ANALYZE;
+        """)
+        connection.commit()
+        connection.close()
+        return columns
+
+    def _where(self, snapshot, query):
+        """Traduce los filtros de la consulta a un WHERE parametrizado."""
+        clauses, params = ['1'], []
+        columns = snapshot.columns
+        if columns['date_sent']:
+            if query.date_start is not None:
+                clauses.append('date_sent >= ?')
+                params.append(int(query.date_start))
+            if query.date_end is not None:
+                clauses.append('date_sent < ?')
+                params.append(int(query.date_end))
+        if query.channel and columns['channel']:
+            clauses.append('channel = ?')
+            params.append(query.channel)
+        # Se compara con la precisión de la columna (float32), igual que el motor pandas
+        if query.score_min is not None and columns['score']:
+            clauses.append('score >= ?')
+            params.append(float(np.float32(query.score_min)))
+        if query.score_max is not None and columns['score']:
+            clauses.append('score <= ?')
+            params.append(float(np.float32(query.score_max)))
+        if query.media_type and columns['media_type']:
+            clauses.append('media_type = ?')
+            params.append(query.media_type)
+        return ' AND '.join(clauses), params
+
+    def _query(self, dataset, query, anchor=None):
+        snapshot = self._ensure(dataset)
+        if snapshot is None:
+            return None
+        where, params = self._where(snapshot, query)
+        key = SQL_SORT_KEYS.get(dataset.sort_column(query.sort_by))
+        total = snapshot.fetch(f"SELECT COUNT(*) FROM messages WHERE {where}", params)[0][0]
+        self.queries += 1
+        return SQLQueryResult(snapshot, where, params, key, total, anchor)
+
+    def get(self, dataset, query, depth):
+        # La búsqueda de texto usa el índice invertido en memoria
+        result = self._query(dataset, query) if not query.text else None
+        if result is None:
+            # Base de datos aún en construcción (o versión ya sustituida): se resuelve en memoria
+            self.fallbacks += 1
+            return self._fallback.get(dataset, query, depth)
+        return result
+
+    def seek(self, dataset, query, token, page_size):
+        cursor = decode_cursor(token)
+        if cursor.get('q') != query.digest():
+            raise QueryError("El cursor no corresponde a estos filtros")
+
+        result = self._query(dataset, query) if not query.text else None
+        if result is None:
+            self.fallbacks += 1
+            return self._fallback.seek(dataset, query, token, page_size)
+        if result._key is None or cursor.get('k') is None:
+            return result, min(int(cursor['i']), result.total)
+
+        # Ancla del keyset: la última fila servida, o tras todos sus empates si ya no existe
+        key = cursor['k']
+        positions = dataset.locate(cursor.get('id'), cursor.get('u')) if cursor.get('id') is not None else []
+        pos = positions[0] if positions else AFTER_TIES
+        if positions and dataset.sort_key(dataset.sort_column(query.sort_by))[pos] != key:
+            pos = AFTER_TIES
+
+        if cursor.get('v') == dataset.version_tag:
+            start = min(int(cursor['i']), result.total)
+        else:
+            sql = f"SELECT COUNT(*) FROM messages WHERE {result._where} AND ({result._key}, pos) <= (?, ?)"
+            start = result._snapshot.fetch(sql, result._params + [key, pos])[0][0]
+        result.anchor = (start, key, pos)
+        return result, start
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'engine': self.name,
+            'path': self.path,
+            'generation': snapshot.generation if snapshot is not None else None,
+            'builds': self.builds,
+            'build_errors': self.build_errors,
+            'building': self._building,
+            'build_ms': round(self.build_ms, 1),
+            'queries': self.queries,
+            'fallbacks': self.fallbacks
+        }
+
+
+def _nullable(values, nulls, n):
+    """Lista de valores Python con None en las posiciones nulas."""
+    if values is None:
+        return [None] * n
+    converted = values.astype(object)
+    converted[nulls] = None
+    return converted.tolist()
+
+
+def create_message_store(engine, cache, path):
+    """Motor de consultas configurado en MESSAGE_STORE ('pandas' por defecto, o 'sqlite')."""
+    if engine == 'sqlite':
+        return SQLiteMessageStore(path, cache)
+    if engine not in (None, '', 'pandas'):
+        logger.warning(f"Motor de mensajes desconocido '{engine}', se usa pandas")
+    return PandasMessageStore(cache)
@@ -43,4 +43,22 @@ class User(db.Model):
             'email_verified': self.email_verified,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'last_login': self.last_login.isoformat() if self.last_login else None
-        } 
\ No newline at end of file
+        } 
+
+class LabelEvent(db.Model):
+    """Entrada del diario de etiquetas: cada clic añade una fila, nunca se modifica.
+
+    El id autoincremental es la secuencia del diario; la compactación borra las entradas
+    que ya se han volcado al dataset de origen.
+    """
+    __tablename__ = 'label_event'
+    __table_args__ = (
+        db.Index('ix_label_event_key', 'username', 'message_id'),
+        {'sqlite_autoincrement': True}
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(255), nullable=False)
+    message_id = db.Column(db.BigInteger, nullable=False)
+    label = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,226 @@
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import quote
+import pandas as pd
+import snapshot
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Estructura: messages/channel=<username>/date=<YYYY-MM-DD>/part.parquet + messages/manifest.json
+PARTITION_PREFIX = 'messages'
+MANIFEST_KEY = f'{PARTITION_PREFIX}/manifest.json'
+PARTITION_FILENAME = 'part.parquet'
+MANIFEST_FORMAT = 1
+
+# Partición de los mensajes sin fecha de envío (ningún filtro de fechas los incluye)
+UNKNOWN_DATE = 'unknown'
+NS_PER_DAY = 86_400 * 10**9
+
+
+def partition_key(username, date):
+    """Clave de la partición de un canal y un día."""
+    return f"{PARTITION_PREFIX}/channel={quote(str(username), safe='')}/date={date}/{PARTITION_FILENAME}"
+
+
+def partition_days(df):
+    """Día de envío (YYYY-MM-DD) de cada fila, con el mismo criterio de zona horaria que el dataset."""
+    if 'Date Sent' not in df.columns:
+        return pd.Series(UNKNOWN_DATE, index=df.index)
+    dates = pd.to_datetime(df['Date Sent'], errors='coerce', utc=True).dt.tz_localize(None)
+    return dates.dt.strftime('%Y-%m-%d').fillna(UNKNOWN_DATE)
+
+
+def channel_titles(df):
+    """Nombres de canal (Title) de las filas, normalizados como en el dataset."""
+    if 'Title' not in df.columns:
+        return pd.Series('Desconocido', index=df.index)
+    return df['Title'].fillna('Desconocido').replace('', 'Desconocido').astype(str)
+
+
+def write_partitions(df, root, previous=None):
+    """Escribe el DataFrame como particiones por canal y día bajo `root` y devuelve el manifiesto.
+
+    Sólo se reescriben las particiones cuyo contenido (huella de sus filas) ha cambiado
+    respecto al manifiesto `previous`; las demás conservan su entrada.
+    """
+    previous_entries = {entry['key']: entry for entry in (previous or {}).get('partitions', [])}
+    usernames = df['Username'].fillna('').astype(str) if 'Username' in df.columns else pd.Series('', index=df.index)
+    days = partition_days(df)
+    titles = channel_titles(df)
+
+    entries, written = [], 0
+    for (username, day), group in df.groupby([usernames, days], sort=True):
+        key = partition_key(username, day)
+        frame = snapshot.prepare_snapshot_frame(group.reset_index(drop=True))
+        digest = format(int(pd.util.hash_pandas_object(frame, index=False).sum()) & (2**64 - 1), '016x')
+        entry = {
+            'key': key,
+            'channel': username,
+            'titles': sorted(titles.loc[group.index].unique().tolist()),
+            'date': day,
+            'rows': len(group),
+            'hash': digest
+        }
+        path = os.path.join(root, *key.split('/'))
+        if previous_entries.get(key, {}).get('hash') != digest or not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            snapshot.write_snapshot(frame, path)
+            written += 1
+        entries.append(entry)
+
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'rows': int(sum(entry['rows'] for entry in entries)),
+        'partitions': entries
+    }
+    write_manifest(manifest, os.path.join(root, *MANIFEST_KEY.split('/')))
+    logger.info(f"Particiones escritas en {root}: {written} de {len(entries)} (resto sin cambios)")
+    return manifest
+
+
+def write_manifest(manifest, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_manifest(path):
+    """Manifiesto local, o None si no existe."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def changed_partitions(manifest, previous):
+    """Entradas de `manifest` que no están igual (misma clave y huella) en `previous`."""
+    known = {(entry['key'], entry['hash']) for entry in (previous or {}).get('partitions', [])}
+    return [entry for entry in manifest['partitions'] if (entry['key'], entry['hash']) not in known]
+
+
+def _day_start(date):
+    return pd.Timestamp(date).value
+
+
+def prune(manifest, query=None, since=None):
+    """Entradas del manifiesto que pueden contener filas de `query` (canal y fechas).
+
+    Con `since` (inicio de día en ns) se descartan además las particiones anteriores.
+    """
+    date_start = query.date_start if query is not None else None
+    date_end = query.date_end if query is not None else None
+    channel = query.channel if query is not None else None
+    if since is not None:
+        date_start = since if date_start is None else max(date_start, since)
+
+    entries = []
+    for entry in manifest['partitions']:
+        if channel and channel not in entry['titles']:
+            continue
+        if entry['date'] == UNKNOWN_DATE:
+            # Los filtros de fechas excluyen los mensajes sin fecha
+            if (query is not None and (query.date_start is not None or query.date_end is not None)):
+                continue
+            entries.append(entry)
+            continue
+        start = _day_start(entry['date'])
+        if date_start is not None and start + NS_PER_DAY <= date_start:
+            continue
+        if date_end is not None and start >= date_end:
+            continue
+        entries.append(entry)
+    return entries
+
+
+class PartitionCache:
+    """Copia local de las particiones descargadas y datasets de conjuntos de particiones.
+
+    Cada partición se guarda en `directory` junto a la huella con la que se descargó, así que
+    al cambiar el manifiesto sólo se descargan las particiones nuevas o modificadas. Los
+    conjuntos de particiones podados por consulta se guardan en un LRU de `max_entries`.
+    """
+
+    def __init__(self, directory, max_entries=8):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.reused = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, entry):
+        return os.path.join(self.directory, *entry['key'].split('/'))
+
+    def ensure(self, client, entries):
+        """Descarga las particiones que falten o hayan cambiado; devuelve sus rutas locales."""
+        missing = []
+        for entry in entries:
+            path = self._path(entry)
+            try:
+                with open(f"{path}.hash", 'r') as f:
+                    cached = f.read()
+            except OSError:
+                cached = None
+            if cached == entry['hash'] and os.path.exists(path):
+                self.reused += 1
+            else:
+                missing.append(entry)
+
+        def download(entry):
+            path = self._path(entry)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            client.download_to(entry['key'], path)
+            with open(f"{path}.hash", 'w') as f:
+                f.write(entry['hash'])
+
+        if missing:
+            client.map_concurrently(download, missing)
+            self.downloads += len(missing)
+            logger.info(f"Particiones descargadas: {len(missing)} de {len(entries)}")
+        return [self._path(entry) for entry in entries]
+
+    def load(self, client, entries, columns=None):
+        """DataFrame con las filas de `entries` (en el orden del manifiesto)."""
+        paths = self.ensure(client, entries)
+        frames = [snapshot.read_snapshot(path, columns=columns) for path in paths]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def get(self, key, build):
+        """Valor en caché para `key` (el Dataset de un conjunto podado), construyéndolo con `build()`."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        """Devuelve los contadores de la caché de particiones."""
+        with self._lock:
+            return {
+                'downloads': self.downloads,
+                'reused': self.reused,
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
@@ -0,0 +1,369 @@
+import base64
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from dataset import Dataset, NAT, TOP_K_LIMIT
+from text_index import parse_query
+
+
+class QueryError(ValueError):
+    """Error de validación en los filtros de una consulta."""
+
+
+class Query:
+    """Consulta normalizada sobre el dataset: filtros de /filter_messages y /load_more más el orden.
+
+    Los filtros se evalúan como predicados vectorizados que se combinan en una única máscara
+    booleana, sin crear copias intermedias del DataFrame.
+    """
+
+    FIELDS = ('date_start', 'date_end', 'channel', 'score_min', 'score_max', 'media_type', 'text', 'sort_by')
+
+    def __init__(self, date_start=None, date_end=None, channel=None, score_min=None,
+                 score_max=None, media_type=None, sort_by='score', text=None):
+        self.date_start = date_start
+        self.date_end = date_end
+        self.channel = channel
+        self.score_min = score_min
+        self.score_max = score_max
+        self.media_type = media_type
+        self.text = text
+        self.sort_by = sort_by
+
+    @classmethod
+    def from_filters(cls, filters):
+        """Construye la consulta a partir de los filtros del cliente (JSON o query string)."""
+        filters = filters or {}
+
+        try:
+            date_start = date_end = None
+            if filters.get('dateStart'):
+                # Inicio del día indicado, en ns desde epoch
+                date_start = pd.to_datetime(filters['dateStart']).normalize().value
+            if filters.get('dateEnd'):
+                # Fin exclusivo: inicio del día siguiente
+                date_end = (pd.to_datetime(filters['dateEnd']).normalize() + pd.Timedelta(days=1)).value
+        except Exception as e:
+            raise QueryError(f"Error en filtro de fechas: {str(e)}")
+
+        score_min = cls._parse_score(filters.get('scoreMin'), 'mínimo')
+        score_max = cls._parse_score(filters.get('scoreMax'), 'máximo')
+        media_type = str(filters['mediaType']).lower() if filters.get('mediaType') else None
+        text = str(filters['q']).strip() if filters.get('q') else None
+        if text and not parse_query(text):
+            # Sin ninguna palabra que buscar (p. ej. "!!!") se ignora, como una `q` vacía
+            text = None
+
+        return cls(
+            date_start=date_start,
+            date_end=date_end,
+            channel=filters.get('channel') or None,
+            score_min=score_min,
+            score_max=score_max,
+            media_type=media_type,
+            text=text or None,
+            sort_by=filters.get('sortBy') or 'score'
+        )
+
+    @staticmethod
+    def _parse_score(value, name):
+        if not value:
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError) as e:
+            raise QueryError(f"Error en filtro de score {name}: {str(e)}")
+
+    def key(self):
+        """Clave hashable de la consulta normalizada."""
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def digest(self):
+        """Huella corta de la consulta normalizada (para cursores y ETags)."""
+        return hashlib.sha1(repr(self.key()).encode('utf-8')).hexdigest()[:12]
+
+    def predicates(self, dataset):
+        """Lista de (nombre, función) de los predicados activos sobre este dataset."""
+        predicates = []
+        if dataset.date_sent is not None:
+            if self.date_start is not None:
+                predicates.append(('dateStart', lambda: dataset.date_sent >= self.date_start))
+            if self.date_end is not None:
+                predicates.append(('dateEnd', lambda: (dataset.date_sent < self.date_end) & (dataset.date_sent != NAT)))
+        if self.channel and dataset.channel is not None:
+            predicates.append(('channel', lambda: Dataset.category_mask(dataset.channel, self.channel)))
+        if self.score_min is not None and dataset.score is not None:
+            predicates.append(('scoreMin', lambda: dataset.score >= np.float32(self.score_min)))
+        if self.score_max is not None and dataset.score is not None:
+            predicates.append(('scoreMax', lambda: dataset.score <= np.float32(self.score_max)))
+        if self.media_type and dataset.media_type is not None:
+            predicates.append(('mediaType', lambda: Dataset.category_mask(dataset.media_type, self.media_type)))
+        if self.text and dataset.has_text:
+            predicates.append(('q', lambda: dataset.text_mask(self.text)))
+        return predicates
+
+    def mask(self, dataset, timings=None, exclude=()):
+        """Máscara booleana de las filas que cumplen todos los filtros (salvo los de `exclude`).
+
+        Si se pasa `timings` (lista), se añade (nombre, ms, filas que cumplen el predicado).
+        """
+        mask = np.ones(len(dataset), dtype=bool)
+        for name, predicate in self.predicates(dataset):
+            if name in exclude:
+                continue
+            start = time.perf_counter()
+            matched = predicate()
+            np.logical_and(mask, matched, out=mask)
+            if timings is not None:
+                timings.append((name, (time.perf_counter() - start) * 1000, int(np.count_nonzero(matched))))
+        return mask
+
+    def result(self, dataset, depth):
+        """Resultado ordenado que cubre al menos las `depth` primeras filas.
+
+        Mientras no exista la permutación completa, las consultas poco profundas guardan
+        sólo las TOP_K_LIMIT primeras posiciones (selección parcial).
+        """
+        mask = self.mask(dataset)
+        total = int(np.count_nonzero(mask))
+        if depth <= TOP_K_LIMIT and not dataset.has_sort_order(self.sort_by):
+            positions = dataset.top_positions(mask, self.sort_by, TOP_K_LIMIT)
+        else:
+            positions = dataset.ordered_positions(mask, self.sort_by)
+        return QueryResult(positions, total)
+
+    def page(self, dataset, mask, start, stop):
+        """Posiciones ordenadas de la página [start, stop) de las filas de `mask`."""
+        return dataset.page_positions(mask, self.sort_by, start, stop)
+
+    def explain(self, dataset, start=0, stop=24):
+        """Desglose de tiempos por predicado, del recuento y de la ordenación de una página."""
+        timings = []
+        started = time.perf_counter()
+        mask = self.mask(dataset, timings)
+
+        count_start = time.perf_counter()
+        total = int(np.count_nonzero(mask))
+        count_ms = (time.perf_counter() - count_start) * 1000
+
+        sort_start = time.perf_counter()
+        self.page(dataset, mask, start, stop)
+        sort_ms = (time.perf_counter() - sort_start) * 1000
+
+        return {
+            'rows': len(dataset),
+            'matched': total,
+            'predicates': [{'name': name, 'ms': round(ms, 3), 'matched': matched} for name, ms, matched in timings],
+            'count_ms': round(count_ms, 3),
+            'sort': {'by': dataset.sort_column(self.sort_by), 'ms': round(sort_ms, 3)},
+            'total_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+
+class QueryResult:
+    """Posiciones ordenadas de las filas de una consulta (todas o un prefijo) y su total."""
+
+    def __init__(self, positions, total):
+        self.positions = positions
+        self.total = total
+
+    @property
+    def complete(self):
+        return len(self.positions) >= self.total
+
+    def covers(self, depth):
+        """Indica si el resultado permite servir las `depth` primeras filas."""
+        return self.complete or depth <= len(self.positions)
+
+    def page(self, start, stop):
+        return self.positions[start:stop]
+
+    def position(self, index):
+        return self.positions[index]
+
+
+class QueryResultCache:
+    """Caché LRU de resultados de consultas, acotada por el tamaño de los arrays de posiciones.
+
+    La clave es (versión del dataset, consulta normalizada): una nueva versión del dataset
+    deja obsoletas todas las entradas anteriores.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, dataset, query, depth):
+        """Devuelve el resultado de `query` que cubre `depth` filas, calculándolo si hace falta."""
+        key = (dataset.version, dataset.generation, query.key())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.covers(depth):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Se calcula fuera del lock; si dos peticiones coinciden, la última sustituye a la primera
+        result = query.result(dataset, depth)
+        self._put(key, dataset.generation, result)
+        return result
+
+    def _put(self, key, generation, result):
+        size = result.positions.nbytes
+        with self._lock:
+            if self._generation is not None and generation < self._generation:
+                # Resultado de una versión ya sustituida: no se guarda
+                return
+            if generation != self._generation:
+                # Nueva versión del dataset: las entradas anteriores ya no sirven
+                self._entries.clear()
+                self._bytes = 0
+                self._generation = generation
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.positions.nbytes
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = result
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.positions.nbytes
+                self.evictions += 1
+
+    def seek(self, dataset, query, token, page_size):
+        """Resultado y posición de inicio para continuar la paginación desde un cursor.
+
+        Si el cursor es de la versión actual del dataset se salta directamente a su índice;
+        si el dataset ha cambiado se localiza la última fila servida por su clave de orden.
+        """
+        cursor = decode_cursor(token)
+        if cursor.get('q') != query.digest():
+            raise QueryError("El cursor no corresponde a estos filtros")
+
+        if cursor.get('v') == dataset.version_tag:
+            result = self.get(dataset, query, cursor['i'] + page_size)
+            return result, min(cursor['i'], result.total)
+
+        result = self.get(dataset, query, len(dataset))
+        return result, _seek_key(dataset, query, result, cursor)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Devuelve los contadores de la caché."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+def encode_cursor(dataset, query, result, index):
+    """Cursor opaco para continuar en la fila `index` del resultado.
+
+    Incluye la versión del dataset, la huella de la consulta, el índice y la clave de la
+    última fila servida (valor de orden, Message ID y Username). Una clave no finita (valores
+    nulos o infinitos) o un Message ID nulo se guardan como None: al reanudar se usa el índice.
+    """
+    last = result.position(index - 1)
+    column = dataset.sort_column(query.sort_by)
+    df = dataset.df
+    key = float(dataset.sort_key(column)[last]) if column else None
+    message_id = df['Message ID'].iat[last] if 'Message ID' in df.columns else None
+    payload = {
+        'v': dataset.version_tag,
+        'q': query.digest(),
+        'i': int(index),
+        'k': key if key is not None and math.isfinite(key) else None,
+        'id': None if message_id is None or pd.isna(message_id) else int(message_id),
+        'u': str(df['Username'].iat[last]) if 'Username' in df.columns else None
+    }
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':'), allow_nan=False).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def encode_position_cursor(dataset, index):
+    """Cursor opaco para recorrer el dataset en su orden natural a partir de la fila `index`."""
+    payload = {'v': dataset.version_tag, 'i': int(index)}
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def _is_number(value, kinds=(int, float)):
+    # bool es subclase de int: true/false no valen como número en un cursor
+    return isinstance(value, kinds) and not isinstance(value, bool)
+
+
+def decode_cursor(token):
+    """Decodifica y valida un cursor generado por `encode_cursor` o `encode_position_cursor`.
+
+    El índice `i` es un entero no negativo y el resto de campos tienen el tipo con el que se
+    generan; si no, se lanza QueryError.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise QueryError("Cursor de paginación no válido")
+    if (not isinstance(cursor, dict)
+            or not _is_number(cursor.get('i'), int) or cursor['i'] < 0
+            or not (cursor.get('k') is None or (_is_number(cursor['k']) and math.isfinite(cursor['k'])))
+            or not (cursor.get('id') is None or _is_number(cursor['id'], int))
+            or not all(cursor.get(field) is None or isinstance(cursor[field], str) for field in ('v', 'q', 'u'))):
+        raise QueryError("Cursor de paginación no válido")
+    return cursor
+
+
+def _seek_key(dataset, query, result, cursor):
+    """Índice de la fila siguiente a la del cursor en un resultado de otra versión del dataset."""
+    column = dataset.sort_column(query.sort_by)
+    if column is None or cursor.get('k') is None:
+        return min(int(cursor['i']), result.total)
+
+    keys = dataset.sort_key(column)
+    positions = result.positions
+    target = cursor['k']
+
+    # Búsqueda binaria de la primera fila con clave >= la del cursor
+    lo, hi = 0, len(positions)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if keys[positions[mid]] < target:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    # Entre los empates se continúa tras la última fila servida; si ya no existe, tras todos
+    df = dataset.df
+    index = lo
+    while index < len(positions) and keys[positions[index]] == target:
+        row = positions[index]
+        message_id = df['Message ID'].iat[row] if 'Message ID' in df.columns else None
+        same_id = message_id is not None and not pd.isna(message_id) and int(message_id) == cursor.get('id')
+        same_user = 'Username' not in df.columns or str(df['Username'].iat[row]) == cursor.get('u')
+        if same_id and same_user:
+            return index + 1
+        index += 1
+    return index
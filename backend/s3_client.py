@@ -2,27 +2,180 @@ import boto3
 import pandas as pd
 import json
 import io
+import re
+import threading
+import time
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError, NoCredentialsError
 import os
 from config import Config
+from snapshot import read_snapshot
+from partitions import MANIFEST_KEY, changed_partitions
+from deltas import DELTA_INDEX_KEY
+from json_stream import read_messages
 import logging
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class S3Client:
+# S3 exige que todas las partes de una subida multiparte salvo la última midan al menos 5 MiB
+MIN_MULTIPART_PART_SIZE = 5 * 1024 * 1024
+
+# Bytes que se leen de cada respuesta de rango antes de copiarlos a su posición del búfer
+READ_CHUNK_SIZE = 1024 * 1024
+CONTENT_RANGE_PATTERN = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class _BufferReader(io.RawIOBase):
+    """Lectura secuencial de un búfer sin copiarlo entero (para pd.read_csv)."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        chunk = self._view[self._position:self._position + len(target)]
+        target[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+
+class S3Metrics:
+    """Idas y vueltas a S3: totales por operación y por petición HTTP del servidor.
+
+    Cada intento HTTP (reintentos incluidos) cuenta como una ida y vuelta. Las de cada
+    petición se acumulan por hilo entre `begin_request()` y `end_request()`.
+    """
+
     def __init__(self):
-        """Inicializa el cliente S3 con las credenciales de AWS."""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.round_trips = Counter()
+        self.calls = 0
+        self.call_ms = 0.0
+        self.errors = 0
+        self.requests = 0
+        self.requests_with_s3 = 0
+        self.request_round_trips = 0
+        self.max_request_round_trips = 0
+
+    def attach(self, client):
+        events = client.meta.events
+        events.register('request-created.s3', self._request_created)
+        events.register('before-call.s3', self._before_call)
+        events.register('after-call.s3', self._after_call)
+        events.register('after-call-error.s3', self._after_call_error)
+
+    def _request_created(self, event_name=None, **kwargs):
+        operation = event_name.rsplit('.', 1)[-1]
+        with self._lock:
+            self.round_trips[operation] += 1
+        self._local.round_trips = getattr(self._local, 'round_trips', 0) + 1
+
+    def _before_call(self, context=None, **kwargs):
+        if context is not None:
+            context['s3_metrics_start'] = time.perf_counter()
+
+    def _after_call(self, context=None, http_response=None, **kwargs):
+        start = (context or {}).get('s3_metrics_start')
+        with self._lock:
+            self.calls += 1
+            if start is not None:
+                self.call_ms += (time.perf_counter() - start) * 1000
+            if http_response is not None and http_response.status_code >= 400:
+                self.errors += 1
+
+    def _after_call_error(self, context=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+
+    def begin_request(self):
+        self._local.round_trips = 0
+
+    def take(self):
+        """Idas y vueltas acumuladas en el hilo actual (y las pone a cero)."""
+        count = getattr(self._local, 'round_trips', 0)
+        self._local.round_trips = 0
+        return count
+
+    def add(self, count):
+        """Suma al hilo actual las idas y vueltas hechas por él en otros hilos (pools de descarga)."""
+        self._local.round_trips = getattr(self._local, 'round_trips', 0) + count
+
+    def end_request(self):
+        """Termina la petición del hilo actual y devuelve sus idas y vueltas a S3."""
+        count = self.take()
+        with self._lock:
+            self.requests += 1
+            if count:
+                self.requests_with_s3 += 1
+                self.request_round_trips += count
+                self.max_request_round_trips = max(self.max_request_round_trips, count)
+        return count
+
+    def stats(self):
+        """Devuelve los contadores de idas y vueltas a S3."""
+        with self._lock:
+            return {
+                'round_trips': dict(self.round_trips),
+                'calls': self.calls,
+                'errors': self.errors,
+                'avg_call_ms': round(self.call_ms / self.calls, 1) if self.calls else 0.0,
+                'requests': self.requests,
+                'requests_with_s3': self.requests_with_s3,
+                'round_trips_per_request': round(self.request_round_trips / self.requests, 3) if self.requests else 0.0,
+                'max_round_trips_per_request': self.max_request_round_trips
+            }
+
+
+s3_metrics = S3Metrics()
+
+
+def create_boto3_client(session=None):
+    """Cliente boto3 de S3 con el pool de conexiones, los timeouts y los reintentos configurados."""
+    session = session or boto3.session.Session()
+    client = session.client(
+        's3',
+        region_name=Config.AWS_REGION,
+        endpoint_url=Config.S3_ENDPOINT_URL or None,
+        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+        config=BotoConfig(
+            max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS,
+            connect_timeout=Config.S3_CONNECT_TIMEOUT,
+            read_timeout=Config.S3_READ_TIMEOUT,
+            retries={'max_attempts': Config.S3_MAX_ATTEMPTS, 'mode': 'standard'},
+            tcp_keepalive=True
+        )
+    )
+    s3_metrics.attach(client)
+    return client
+
+
+class S3Client:
+    def __init__(self, client=None):
+        """Inicializa el cliente S3 con las credenciales de AWS.
+
+        Sin `client` se crea un cliente boto3 propio; `get_s3_client()` devuelve en cambio
+        la instancia compartida por todo el proceso.
+        """
         try:
             # Intentar usar credenciales del archivo de configuración
-            self.s3_client = boto3.client(
-                's3',
-                region_name=Config.AWS_REGION,
-                aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY')
-            )
+            self.s3_client = client or create_boto3_client()
             self.bucket_name = Config.S3_BUCKET
+            # Listados de objetos en caché por prefijo: (instante, claves)
+            self._listings = {}
+            self._listing_lock = threading.Lock()
+            # Último documento JSON leído por clave (manifiesto, índice de deltas): (ETag, documento)
+            self._documents = {}
             logger.info(f"Cliente S3 inicializado para bucket: {self.bucket_name}")
         except NoCredentialsError:
             logger.error("No se encontraron credenciales de AWS")
@@ -31,6 +184,23 @@ class S3Client:
             logger.error(f"Error al inicializar cliente S3: {e}")
             raise
 
+    def list_files_cached(self, prefix=''):
+        """Como `list_files`, pero reutiliza el listado durante S3_LISTING_TTL segundos."""
+        now = time.monotonic()
+        with self._listing_lock:
+            cached = self._listings.get(prefix)
+            if cached is not None and now - cached[0] < Config.S3_LISTING_TTL:
+                return list(cached[1])
+        files = self.list_files(prefix)
+        with self._listing_lock:
+            self._listings[prefix] = (now, files)
+        return list(files)
+
+    def invalidate_listing(self):
+        """Descarta los listados en caché (tras subir objetos nuevos)."""
+        with self._listing_lock:
+            self._listings.clear()
+
     def list_files(self, prefix=''):
         """Lista todos los archivos en el bucket S3 con un prefijo opcional."""
         try:
@@ -65,11 +235,182 @@ class S3Client:
             logger.error(f"Error al descargar archivo {s3_key}: {e}")
             raise
 
+    def download_ranges(self, s3_key, local_path=None, part_size=None, concurrency=None):
+        """Descarga un objeto por rangos de bytes en paralelo.
+
+        El primer rango indica el tamaño total (Content-Range); con él se reserva el destino
+        completo y el resto de rangos se piden en un pool de hilos que escriben cada uno en
+        su posición. Sin `local_path` se devuelve un bytearray con el contenido; con él se
+        escribe en ese archivo y se devuelve la ruta. Todos los rangos se piden con If-Match
+        sobre el ETag del primero, así que no se mezclan versiones si el objeto cambia.
+        """
+        part_size = part_size or Config.S3_DOWNLOAD_PART_SIZE
+        concurrency = concurrency or Config.S3_DOWNLOAD_CONCURRENCY
+        try:
+            try:
+                first = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key, Range=f"bytes=0-{part_size - 1}")
+            except ClientError as e:
+                # Un objeto vacío no admite rangos: se descarga sin rango
+                if e.response.get('Error', {}).get('Code') != 'InvalidRange':
+                    raise
+                first = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            match = CONTENT_RANGE_PATTERN.match(first.get('ContentRange') or '')
+            head = first['Body'].read()
+            size = int(match.group(3)) if match else len(head)
+            etag = first.get('ETag')
+
+            if local_path is not None:
+                fd = os.open(local_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+                os.ftruncate(fd, size)
+
+                def write(offset, data):
+                    os.pwrite(fd, data, offset)
+            else:
+                buffer = bytearray(size)
+                view = memoryview(buffer)
+
+                def write(offset, data):
+                    view[offset:offset + len(data)] = data
+
+            def fetch(start):
+                stop = min(start + part_size, size)
+                extra = {'IfMatch': etag} if etag else {}
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key,
+                                                     Range=f"bytes={start}-{stop - 1}", **extra)
+                offset = start
+                for chunk in response['Body'].iter_chunks(READ_CHUNK_SIZE):
+                    write(offset, chunk)
+                    offset += len(chunk)
+                if offset != stop:
+                    raise IOError(f"Rango incompleto de {s3_key}: {start}-{stop} ({offset - start} bytes)")
+
+            try:
+                write(0, head)
+                del head
+                self.map_concurrently(fetch, range(part_size, size, part_size), concurrency)
+            finally:
+                if local_path is not None:
+                    os.close(fd)
+
+            logger.info(f"Descargado por rangos: {s3_key} ({size} bytes, {max(1, -(-size // part_size))} partes)")
+            return local_path if local_path is not None else buffer
+
+        except ClientError as e:
+            logger.error(f"Error en la descarga por rangos de {s3_key}: {e}")
+            raise
+
+    def download_to(self, s3_key, local_path):
+        """Descarga `s3_key` por rangos a un temporal propio junto a `local_path` y lo mueve a su sitio.
+
+        Cada descarga escribe en su archivo (mkstemp), así que varios procesos pueden descargar
+        la misma clave a la vez sin mezclar sus rangos ni borrarse el archivo a medias.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(local_path) or '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            self.download_ranges(s3_key, tmp_path)
+            os.replace(tmp_path, local_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return local_path
+
+    def map_concurrently(self, fn, items, concurrency=None):
+        """Aplica `fn` a cada elemento en un pool de hilos (propaga la primera excepción)."""
+        items = list(items)
+        if not items:
+            return []
+
+        def run(item):
+            s3_metrics.take()
+            return fn(item), s3_metrics.take()
+
+        with ThreadPoolExecutor(max_workers=min(concurrency or Config.S3_DOWNLOAD_CONCURRENCY, len(items))) as pool:
+            outcomes = list(pool.map(run, items))
+        # Las idas y vueltas de los hilos del pool cuentan para la petición que los lanzó
+        s3_metrics.add(sum(round_trips for _, round_trips in outcomes))
+        return [result for result, _ in outcomes]
+
+    def load_document(self, s3_key):
+        """(documento JSON pequeño, ETag), o (None, None) si la clave no existe.
+
+        La petición es condicional sobre el ETag de la última lectura de esa clave: si no
+        ha cambiado se reutiliza sin volver a descargarlo.
+        """
+        cached = self._documents.get(s3_key)
+        extra = {'IfNoneMatch': cached[0]} if cached else {}
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key, **extra)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if cached and code in ('304', 'NotModified'):
+                return cached[1], cached[0]
+            if code in ('NoSuchKey', '404'):
+                self._documents.pop(s3_key, None)
+                return None, None
+            logger.error(f"Error al cargar {s3_key}: {e}")
+            raise
+        document = json.loads(response['Body'].read())
+        self._documents[s3_key] = (response['ETag'], document)
+        return document, response['ETag']
+
+    def load_manifest(self):
+        """(manifiesto de particiones, ETag), o (None, None) si el bucket no tiene particiones."""
+        manifest, etag = self.load_document(MANIFEST_KEY)
+        if manifest is not None:
+            logger.info(f"Manifiesto de particiones cargado: {len(manifest['partitions'])} particiones")
+        return manifest, etag
+
+    def load_delta_index(self):
+        """(índice de deltas, ETag), o (None, None) si el scraper no publica deltas."""
+        return self.load_document(DELTA_INDEX_KEY)
+
+    def publish_deltas(self, root, index, entries=(), base_files=(), folded=()):
+        """Sube los deltas `entries` (o los archivos del snapshot base compactado) y después el índice.
+
+        El índice se sube al final para que los lectores nunca vean una secuencia cuyos
+        archivos todavía no existen; los deltas `folded`, ya incluidos en el base, se borran
+        después.
+        """
+        def upload(key):
+            self.s3_client.upload_file(os.path.join(root, *key.split('/')), self.bucket_name, key)
+
+        self.map_concurrently(upload, [entry['key'] for entry in entries] + list(base_files))
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=DELTA_INDEX_KEY,
+                                  Body=json.dumps(index, ensure_ascii=False).encode('utf-8'),
+                                  ContentType='application/json')
+        if folded:
+            self.s3_client.delete_objects(Bucket=self.bucket_name,
+                                          Delete={'Objects': [{'Key': entry['key']} for entry in folded]})
+        self.invalidate_listing()
+        logger.info(f"Deltas publicados en S3: secuencia {index['latest_seq']} "
+                    f"({len(entries)} deltas, {len(base_files)} archivos base)")
+
+    def upload_partitions(self, root, manifest, previous=None):
+        """Sube las particiones nuevas o modificadas respecto a `previous` y después el manifiesto.
+
+        El manifiesto se sube al final para que los lectores nunca vean particiones que
+        todavía no existen.
+        """
+        changed = changed_partitions(manifest, previous)
+
+        def upload(entry):
+            path = os.path.join(root, *entry['key'].split('/'))
+            self.s3_client.upload_file(path, self.bucket_name, entry['key'])
+
+        self.map_concurrently(upload, changed)
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=MANIFEST_KEY,
+                                  Body=json.dumps(manifest, ensure_ascii=False).encode('utf-8'),
+                                  ContentType='application/json')
+        self.invalidate_listing()
+        logger.info(f"Particiones subidas a S3: {len(changed)} de {len(manifest['partitions'])}")
+        return len(changed)
+
     def get_file_content(self, s3_key):
         """Obtiene el contenido de un archivo desde S3 como string."""
         try:
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
-            content = response['Body'].read().decode('utf-8')
+            content = self.download_ranges(s3_key).decode('utf-8')
             logger.info(f"Contenido obtenido del archivo: {s3_key}")
             return content
             
@@ -77,11 +418,28 @@ class S3Client:
             logger.error(f"Error al obtener contenido del archivo {s3_key}: {e}")
             raise
 
+    def get_object_version(self, s3_key, if_none_match=None):
+        """Obtiene la versión (ETag o LastModified) de un objeto sin descargarlo.
+
+        Con `if_none_match` la consulta es condicional: si el ETag no ha cambiado S3
+        responde 304 y se devuelve el mismo ETag.
+        """
+        try:
+            extra = {'IfNoneMatch': if_none_match} if if_none_match else {}
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key, **extra)
+            return response.get('ETag') or str(response.get('LastModified'))
+
+        except ClientError as e:
+            if if_none_match and e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+                return if_none_match
+            logger.error(f"Error al consultar la versión del archivo {s3_key}: {e}")
+            raise
+
     def load_csv_from_s3(self, s3_key):
         """Carga un archivo CSV desde S3 como DataFrame de pandas."""
         try:
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
-            df = pd.read_csv(io.BytesIO(response['Body'].read()))
+            buffer = self.download_ranges(s3_key)
+            df = pd.read_csv(io.BufferedReader(_BufferReader(buffer)))
             logger.info(f"CSV cargado desde S3: {s3_key}, filas: {len(df)}")
             return df
             
@@ -92,11 +450,68 @@ class S3Client:
             logger.error(f"Error al procesar CSV {s3_key}: {e}")
             raise
 
+    def load_parquet_from_s3(self, s3_key, columns=None, version=None):
+        """Carga un snapshot Parquet desde S3 mediante una copia local mapeada en memoria.
+
+        La copia local sólo se vuelve a descargar cuando cambia el ETag del objeto
+        (`version`, si ya se ha consultado).
+        """
+        try:
+            os.makedirs(Config.SNAPSHOT_CACHE_DIR, exist_ok=True)
+            local_path = os.path.join(Config.SNAPSHOT_CACHE_DIR, s3_key.replace('/', '_'))
+            version_path = f"{local_path}.etag"
+            version = version or self.get_object_version(s3_key)
+
+            cached_version = None
+            if os.path.exists(local_path) and os.path.exists(version_path):
+                with open(version_path, 'r') as f:
+                    cached_version = f.read()
+
+            if cached_version != version:
+                self.download_to(s3_key, local_path)
+                with open(version_path, 'w') as f:
+                    f.write(version)
+                logger.info(f"Snapshot descargado a la caché local: {s3_key} -> {local_path}")
+
+            df = read_snapshot(local_path, columns=columns)
+            logger.info(f"Parquet cargado desde S3: {s3_key}, filas: {len(df)}")
+            return df
+
+        except ClientError as e:
+            logger.error(f"Error al cargar Parquet {s3_key}: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error al procesar Parquet {s3_key}: {e}")
+            raise
+
+    def load_messages_from_s3(self, s3_key):
+        """DataFrame del array `messages` de un JSON de S3, parseado por lotes (ver `json_stream`).
+
+        El objeto se descarga por rangos a un archivo temporal y se lee desde él, así que ni
+        los bytes ni el texto completos llegan a estar en memoria junto al DataFrame.
+        """
+        os.makedirs(Config.SNAPSHOT_CACHE_DIR, exist_ok=True)
+        # Un temporal por llamada: otros procesos pueden estar cargando la misma clave
+        fd, tmp_path = tempfile.mkstemp(dir=Config.SNAPSHOT_CACHE_DIR, suffix='.json.tmp')
+        os.close(fd)
+        try:
+            self.download_ranges(s3_key, tmp_path)
+            with open(tmp_path, 'rb') as f:
+                df = read_messages(f)
+            logger.info(f"JSON cargado desde S3: {s3_key}, filas: {len(df)}")
+            return df
+        except Exception as e:
+            logger.error(f"Error al cargar JSON {s3_key}: {e}")
+            raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     def load_json_from_s3(self, s3_key):
         """Carga un archivo JSON desde S3."""
         try:
-            content = self.get_file_content(s3_key)
-            data = json.loads(content)
+            # El búfer descargado se libera al decodificarlo, antes de construir los objetos
+            data = json.loads(self.download_ranges(s3_key).decode('utf-8'))
             logger.info(f"JSON cargado desde S3: {s3_key}")
             return data
             
@@ -111,6 +526,7 @@ class S3Client:
         """Sube un archivo local a S3."""
         try:
             self.s3_client.upload_file(local_path, self.bucket_name, s3_key)
+            self.invalidate_listing()
             logger.info(f"Archivo subido a S3: {local_path} -> {s3_key}")
             return True
             
@@ -137,6 +553,7 @@ class S3Client:
                 Body=buffer.getvalue()
             )
             
+            self.invalidate_listing()
             logger.info(f"DataFrame subido a S3: {s3_key} ({format})")
             return True
             
@@ -144,6 +561,57 @@ class S3Client:
             logger.error(f"Error al subir DataFrame a S3: {e}")
             raise
 
+    def upload_stream(self, chunks, s3_key, part_size=None, content_type=None):
+        """Sube a S3 un archivo generado por partes (iterable de bytes) con una subida multiparte.
+
+        Sólo se mantiene en memoria la parte en curso; si todo cabe en una parte se
+        sube con un único put_object. Devuelve el número de bytes subidos.
+        """
+        part_size = max(part_size or Config.S3_MULTIPART_PART_SIZE, MIN_MULTIPART_PART_SIZE)
+        extra = {'ContentType': content_type} if content_type else {}
+        buffer = bytearray()
+        parts = []
+        upload_id = None
+        total = 0
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                total += len(chunk)
+                if len(buffer) < part_size:
+                    continue
+                if upload_id is None:
+                    upload_id = self.s3_client.create_multipart_upload(
+                        Bucket=self.bucket_name, Key=s3_key, **extra)['UploadId']
+                parts.append(self._upload_part(s3_key, upload_id, len(parts) + 1, buffer))
+                buffer = bytearray()
+
+            if upload_id is None:
+                self.s3_client.put_object(Bucket=self.bucket_name, Key=s3_key, Body=bytes(buffer), **extra)
+            else:
+                if buffer:
+                    parts.append(self._upload_part(s3_key, upload_id, len(parts) + 1, buffer))
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id,
+                    MultipartUpload={'Parts': parts})
+            self.invalidate_listing()
+            logger.info(f"Archivo subido a S3 por partes: {s3_key} ({total} bytes, {max(len(parts), 1)} partes)")
+            return total
+
+        except Exception as e:
+            logger.error(f"Error en la subida multiparte de {s3_key}: {e}")
+            if upload_id is not None:
+                # Las partes de una subida sin completar ocupan espacio hasta que se aborta
+                try:
+                    self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id)
+                except Exception as abort_error:
+                    logger.warning(f"No se pudo abortar la subida multiparte de {s3_key}: {abort_error}")
+            raise
+
+    def _upload_part(self, s3_key, upload_id, number, data):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id, PartNumber=number, Body=bytes(data))
+        return {'ETag': response['ETag'], 'PartNumber': number}
+
     def check_connection(self):
         """Verifica la conexión con S3."""
         try:
@@ -157,7 +625,19 @@ class S3Client:
             logger.error(f"Error inesperado al verificar conexión S3: {e}")
             return False
 
+_shared_client = None
+_shared_lock = threading.Lock()
+
 # Función de utilidad para obtener el cliente S3
 def get_s3_client():
-    """Retorna una instancia del cliente S3."""
-    return S3Client()
+    """Retorna la instancia del cliente S3 compartida por todo el proceso.
+
+    Se crea la primera vez que se pide (sesión, credenciales y pool de conexiones) y
+    los clientes de boto3 se pueden usar desde varios hilos a la vez.
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = S3Client()
+    return _shared_client
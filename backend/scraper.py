@@ -28,7 +28,8 @@ def check_and_install_dependencies():
         'telethon',
         'openpyxl',
         'python-dotenv',
-        'asyncio'
+        'asyncio',
+        'pyarrow'
     ]
     
     # Primero actualizar pip
@@ -58,6 +59,10 @@ from telethon.tl.types import Message, Channel, User
 from telethon.tl.custom import Message as CustomMessage
 from telethon.tl.types.messages import Messages
 from telethon.tl.types.messages import ChannelMessages
+from snapshot import write_snapshot, is_available as snapshot_available
+from partitions import write_partitions, read_manifest, MANIFEST_KEY, PARTITION_PREFIX
+from deltas import (read_index, write_delta, compact_index, diff_rows, upsert_rows, should_compact,
+                    DELTA_INDEX_KEY, MAX_DELTAS, MAX_DELTA_RATIO)
 
 # Set the working directory to the script's directory
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
@@ -303,6 +308,16 @@ def extract_media_details(media):
         'Media Caption': getattr(media, 'caption', None)
     }
 
+def score_details(views, average_views):
+    """Media de visualizaciones del día, diferencia con ella y score (proporción respecto a la media)."""
+    if average_views > 0:
+        return {
+            'Average Views': average_views,
+            'Average Difference': (views or 0) - average_views,
+            'Score': (views or 0) / average_views
+        }
+    return {'Average Views': average_views, 'Average Difference': 0, 'Score': 0}
+
 def load_existing_data(filename):
     try:
         return pd.read_csv(filename)
@@ -346,6 +361,8 @@ async def main():
     print("7. Cargando datos existentes...")
     existing_messages = load_existing_data('telegram_messages.csv')
     existing_ids = load_existing_message_ids('telegram_messages.csv')
+    # Copia de lo ya publicado para calcular el delta de esta ejecución
+    previous_messages = existing_messages.copy()
     
     # Crear cliente
     print("8. Creando cliente...")
@@ -368,6 +385,7 @@ async def main():
         print("12. Conexión exitosa!")
         
         all_data = []
+        updated_data = []
         for channel in channels:
             try:
                 print(f"Procesando canal: {channel}")
@@ -419,6 +437,10 @@ async def main():
                     message_key = (data['Username'], message.id)
                     if message_key in existing_ids:
                         mensajes_existentes += 1
+                        # Se actualizan sus visualizaciones y su score
+                        update = {'Username': data['Username'], 'Message ID': message.id, 'Views': message.views or 0}
+                        update.update(score_details(message.views, daily_average_views.get(message.date.strftime('%Y-%m-%d'), 0)))
+                        updated_data.append(update)
                         continue
         
                     # Update the URL and Embed columns using the channel's username
@@ -429,16 +451,7 @@ async def main():
                     data['Embed'] = f'<script async src="https://telegram.org/js/telegram-widget.js?22" data-telegram-post="{channel_username}/{message.id}" data-width="100%"></script>'
                     
                     date_str = message.date.strftime('%Y-%m-%d')
-                    data['Average Views'] = daily_average_views.get(date_str, 0)
-                    
-                    # Calcular la diferencia con el promedio
-                    if data['Average Views'] > 0:
-                        data['Average Difference'] = (message.views or 0) - data['Average Views']
-                        # Calcular el score como la proporción de views respecto a la media
-                        data['Score'] = (message.views or 0) / data['Average Views']
-                    else:
-                        data['Average Difference'] = 0
-                        data['Score'] = 0
+                    data.update(score_details(message.views, daily_average_views.get(date_str, 0)))
 
                     # Añadir información de medios si existe
                     if message.media:
@@ -464,7 +477,11 @@ async def main():
                 print(f"Error al procesar {channel}: {str(e)}")
                 continue
 
-        if all_data:
+        if updated_data and not existing_messages.empty:
+            # Visualizaciones y score de los mensajes ya guardados
+            existing_messages = upsert_rows(existing_messages, pd.DataFrame(updated_data))
+
+        if all_data or updated_data:
             print("13. Guardando datos...")
             # Convert the new data to a DataFrame
             new_data_df = pd.DataFrame(all_data)
@@ -513,7 +530,7 @@ async def main():
                 new_data_df = new_data_df.replace('', pd.NA)
                 
                 # Preservar las etiquetas existentes
-                if 'Label' in existing_messages.columns:
+                if 'Label' in existing_messages.columns and not new_data_df.empty:
                     # Crear un diccionario de etiquetas existentes
                     existing_labels = existing_messages.set_index(['Message ID', 'Username'])['Label'].to_dict()
                     
@@ -556,49 +573,106 @@ async def main():
             df.to_csv('telegram_messages.csv', index=False, encoding='utf-8')
             print("14. Datos guardados en telegram_messages.csv")
 
-            # Guardar también en JSON
-            print("15. Guardando datos en JSON...")
+            # Delta de esta ejecución (mensajes nuevos y actualizados) respecto a lo ya publicado.
+            # JSON, Parquet y Excel completos sólo se reescriben al compactar la secuencia de deltas
+            use_deltas = os.environ.get('DELTA_SNAPSHOTS', 'true').lower() in ('1', 'true', 'yes')
+            delta_index = read_index(os.path.join(*DELTA_INDEX_KEY.split('/')))
+            delta_rows, new_count, updated_count = diff_rows(previous_messages, df)
+            compact = not use_deltas or should_compact(
+                delta_index, len(delta_rows),
+                max_deltas=int(os.environ.get('DELTA_COMPACTION_DELTAS', MAX_DELTAS)),
+                max_ratio=float(os.environ.get('DELTA_COMPACTION_RATIO', MAX_DELTA_RATIO)))
+            delta_entries, folded_deltas, base_files = [], [], []
+            if not compact and delta_rows.empty:
+                print("15. Sin mensajes nuevos ni actualizados: no se publica ningún delta")
+            elif not compact:
+                delta_index, entry = write_delta(delta_rows, '.', delta_index, new_count, updated_count)
+                delta_entries.append(entry)
+                print(f"15. Delta {entry['seq']} guardado en {entry['key']}: {new_count} mensajes nuevos, "
+                      f"{updated_count} actualizados")
+
+            if compact:
+                # Guardar también en JSON
+                print("15. Guardando datos en JSON...")
             
-            # Crear una copia del DataFrame para JSON
-            df_json = df.copy()
+                # Crear una copia del DataFrame para JSON
+                df_json = df.copy()
             
-            # Eliminar columnas que no son serializables
-            columns_to_drop = ['Photo', 'Media', 'Entities']
-            for col in columns_to_drop:
-                if col in df_json.columns:
-                    df_json = df_json.drop(columns=[col])
+                # Eliminar columnas que no son serializables
+                columns_to_drop = ['Photo', 'Media', 'Entities']
+                for col in columns_to_drop:
+                    if col in df_json.columns:
+                        df_json = df_json.drop(columns=[col])
             
-            # Convertir las fechas a string ISO
-            for col in ['Date Sent', 'Creation Date', 'Edit Date']:
-                if col in df_json.columns:
-                    df_json[col] = df_json[col].astype(str)
+                # Convertir las fechas a string ISO
+                for col in ['Date Sent', 'Creation Date', 'Edit Date']:
+                    if col in df_json.columns:
+                        df_json[col] = df_json[col].astype(str)
             
-            # Convertir el DataFrame a un formato JSON amigable
-            json_data = {
-                'messages': df_json.to_dict(orient='records')
-            }
+                # Convertir el DataFrame a un formato JSON amigable
+                json_data = {
+                    'messages': df_json.to_dict(orient='records')
+                }
             
-            # Guardar en JSON con formato legible
-            with open('telegram_messages.json', 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, ensure_ascii=False, indent=4)
-            print("16. Datos guardados en telegram_messages.json")
-
-            # Convertir todas las columnas de fecha a datetime sin zona horaria
-            for col in ['Date Sent', 'Creation Date', 'Edit Date']:
-                if col in df.columns:
+                # Guardar en JSON con formato legible
+                with open('telegram_messages.json', 'w', encoding='utf-8') as f:
+                    json.dump(json_data, f, ensure_ascii=False, indent=4)
+                print("16. Datos guardados en telegram_messages.json")
+                base_files.append('telegram_messages.json')
+
+            if snapshot_available():
+                # Guardar también el snapshot columnar que carga el servidor
+                if compact:
                     try:
-                        # Primero convertir a datetime si no lo es
-                        df[col] = pd.to_datetime(df[col])
-                        # Luego eliminar la zona horaria
-                        df[col] = df[col].dt.tz_localize(None)
-                    except (AttributeError, TypeError):
-                        # Si la columna no tiene zona horaria o ya está en el formato correcto
-                        df[col] = pd.to_datetime(df[col])
+                        write_snapshot(df)
+                        base_files.append('telegram_messages.parquet')
+                        print("16b. Snapshot guardado en telegram_messages.parquet")
+                    except Exception as e:
+                        print(f"Advertencia: no se pudo guardar el snapshot Parquet: {str(e)}")
+
+                # Estructura particionada por canal y día: sólo se reescriben las particiones que cambian
+                try:
+                    previous_manifest = read_manifest(os.path.join(*MANIFEST_KEY.split('/')))
+                    manifest = write_partitions(df, '.', previous_manifest)
+                    print(f"16c. Particiones guardadas en {PARTITION_PREFIX}/ ({len(manifest['partitions'])} particiones)")
+                    if os.environ.get('UPLOAD_PARTITIONS', '').lower() in ('1', 'true', 'yes'):
+                        from s3_client import get_s3_client
+                        s3_client = get_s3_client()
+                        # Se compara con el manifiesto publicado, no con la copia local
+                        remote_manifest, _ = s3_client.load_manifest()
+                        uploaded = s3_client.upload_partitions('.', manifest, remote_manifest)
+                        print(f"16d. Particiones subidas a S3: {uploaded} nuevas o modificadas")
+                except Exception as e:
+                    print(f"Advertencia: no se pudieron guardar las particiones: {str(e)}")
+
+            if use_deltas and compact:
+                delta_index, folded_deltas = compact_index('.', delta_index, len(df))
+                print(f"16e. Secuencia de deltas compactada en el snapshot base ({len(folded_deltas)} deltas plegados)")
+            if use_deltas and (delta_entries or compact) and os.environ.get('UPLOAD_DELTAS', '').lower() in ('1', 'true', 'yes'):
+                try:
+                    from s3_client import get_s3_client
+                    get_s3_client().publish_deltas('.', delta_index, delta_entries, base_files, folded_deltas)
+                    print(f"16f. Secuencia {delta_index['latest_seq']} publicada en S3")
+                except Exception as e:
+                    print(f"Advertencia: no se pudieron publicar los deltas: {str(e)}")
+
+            if compact:
+                # Convertir todas las columnas de fecha a datetime sin zona horaria
+                for col in ['Date Sent', 'Creation Date', 'Edit Date']:
+                    if col in df.columns:
+                        try:
+                            # Primero convertir a datetime si no lo es
+                            df[col] = pd.to_datetime(df[col])
+                            # Luego eliminar la zona horaria
+                            df[col] = df[col].dt.tz_localize(None)
+                        except (AttributeError, TypeError):
+                            # Si la columna no tiene zona horaria o ya está en el formato correcto
+                            df[col] = pd.to_datetime(df[col])
             
-            # Guardar en Excel
-            with pd.ExcelWriter('telegram_data.xlsx', engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Messages', index=False)
-            print("17. Datos guardados en telegram_data.xlsx")
+                # Guardar en Excel
+                with pd.ExcelWriter('telegram_data.xlsx', engine='openpyxl') as writer:
+                    df.to_excel(writer, sheet_name='Messages', index=False)
+                print("17. Datos guardados en telegram_data.xlsx")
         else:
             print("13. No hay datos para guardar")
         print("18. Cerrando conexión...")
@@ -0,0 +1,76 @@
+import json
+import datetime
+import numpy as np
+import pandas as pd
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el módulo json estándar
+    orjson = None
+
+# Columnas de las tarjetas de mensajes (/filter_messages, /load_more)
+CARD_COLUMNS = ['Embed', 'Score', 'Message ID', 'Username', 'URL', 'Label']
+# Columnas de /api/messages
+API_COLUMNS = ['Message ID', 'Message Text', 'Title', 'Views', 'Average Views', 'Label']
+
+# Filas que se serializan por lote en las respuestas en streaming
+STREAM_BATCH_SIZE = 1000
+
+
+def column_values(df, col, positions=None):
+    """Valores de una columna como objetos Python, con los nulos convertidos a None."""
+    if col not in df.columns:
+        return np.full(len(df) if positions is None else len(positions), None, dtype=object)
+    series = df[col] if positions is None else df[col].iloc[positions]
+    values = series.to_numpy(dtype=object)
+    nulls = pd.isna(values)
+    if nulls.any():
+        values[nulls] = None
+    return values
+
+
+def records(df, positions=None, columns=CARD_COLUMNS):
+    """Lista de diccionarios con las columnas pedidas de las filas `positions` (todas si None).
+
+    La proyección y la conversión NaN -> None se hacen por columna, no fila a fila.
+    """
+    values = [column_values(df, col, positions) for col in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Tipo no serializable a JSON: {type(value).__name__}")
+
+
+def dumps(payload):
+    """Serializa `payload` a bytes JSON (con orjson si está instalado)."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Respuesta Flask con el JSON ya codificado en bytes."""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def iter_ndjson(df, positions, columns, batch_size=STREAM_BATCH_SIZE):
+    """Genera NDJSON (un mensaje por línea) serializando las filas por lotes."""
+    for start in range(0, len(positions), batch_size):
+        batch = records(df, positions[start:start + batch_size], columns)
+        yield b''.join(dumps(record) + b'\n' for record in batch)
+
+
+def iter_json_messages(df, positions, columns, next_cursor=None, batch_size=STREAM_BATCH_SIZE):
+    """Genera por lotes el JSON {"success": true, "messages": [...], "next_cursor": ...}."""
+    yield b'{"success":true,"messages":['
+    for start in range(0, len(positions), batch_size):
+        batch = records(df, positions[start:start + batch_size], columns)
+        chunk = b','.join(dumps(record) for record in batch)
+        yield chunk if start == 0 else b',' + chunk
+    yield b'],"next_cursor":' + dumps(next_cursor) + b'}'
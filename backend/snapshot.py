@@ -0,0 +1,79 @@
+import os
+import logging
+import tempfile
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él se sigue usando el JSON
+    pa = None
+    pq = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILENAME = 'telegram_messages.parquet'
+
+# Columnas con objetos de Telethon que no son serializables
+NON_SERIALIZABLE_COLUMNS = ['Photo', 'Media', 'Entities']
+DATE_COLUMNS = ['Date Sent', 'Creation Date', 'Edit Date']
+
+
+def is_available():
+    """Indica si pyarrow está instalado y se puede usar el formato columnar."""
+    return pq is not None
+
+
+def prepare_snapshot_frame(df):
+    """Adapta el DataFrame del scraper a columnas de tipo homogéneo para Parquet."""
+    snapshot_df = df.drop(columns=[col for col in NON_SERIALIZABLE_COLUMNS if col in df.columns])
+
+    for col in DATE_COLUMNS:
+        if col in snapshot_df.columns:
+            snapshot_df[col] = pd.to_datetime(snapshot_df[col], errors='coerce', utc=True)
+
+    # Label mezcla '' con 0/1 en el CSV: se guarda como numérico con nulos
+    if 'Label' in snapshot_df.columns:
+        snapshot_df['Label'] = pd.to_numeric(snapshot_df['Label'], errors='coerce')
+
+    # El resto de columnas de objetos se guardan como texto conservando los nulos
+    for col in snapshot_df.columns:
+        if snapshot_df[col].dtype == object:
+            snapshot_df[col] = snapshot_df[col].where(snapshot_df[col].isna(), snapshot_df[col].astype(str))
+
+    return snapshot_df
+
+
+def write_snapshot(df, path=SNAPSHOT_FILENAME):
+    """Escribe el snapshot columnar de forma atómica (archivo temporal + rename)."""
+    if not is_available():
+        raise RuntimeError("pyarrow no está instalado; no se puede escribir el snapshot Parquet")
+
+    table = pa.Table.from_pandas(prepare_snapshot_frame(df), preserve_index=False)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logger.info(f"Snapshot Parquet escrito en {path}: {table.num_rows} filas")
+    return path
+
+
+def read_snapshot(path, columns=None):
+    """Lee un snapshot Parquet mapeado en memoria, cargando sólo las columnas pedidas."""
+    if not is_available():
+        raise RuntimeError("pyarrow no está instalado; no se puede leer el snapshot Parquet")
+
+    if columns:
+        # Se ignoran las columnas que no existen en este snapshot
+        available = set(pq.read_schema(path, memory_map=True).names)
+        columns = [col for col in columns if col in available]
+
+    table = pq.read_table(path, columns=columns or None, memory_map=True)
+    return table.to_pandas()
@@ -0,0 +1,13 @@
+"""
+Configuración común de las pruebas del backend
+"""
+
+import os
+import sys
+
+# Permitir importar los módulos del backend (estructura plana) desde las pruebas
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Credenciales ficticias: los clientes boto3 se crean siempre dentro de un S3 simulado (moto)
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
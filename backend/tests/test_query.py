@@ -0,0 +1,71 @@
+"""
+Pruebas de los cursores de paginación con claves de orden no finitas y Message ID nulos
+"""
+
+import base64
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset import Dataset
+from query import Query, QueryError, QueryResultCache, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def dataset():
+    df = pd.DataFrame({
+        'Message ID': [1, 2, np.nan, 4, 5],
+        'Username': ['a', 'b', 'c', 'd', 'e'],
+        'Score': [np.inf, 3.0, 2.0, np.nan, -np.inf],
+        'Views': [10, 20, 30, 40, 50]
+    })
+    return Dataset.from_frame(df, version='v1')
+
+
+def page_cursors(dataset, query):
+    """Cursores tras cada fila del resultado completo de `query`."""
+    result = QueryResultCache().get(dataset, query, len(dataset))
+    return result, [encode_cursor(dataset, query, result, index) for index in range(1, result.total + 1)]
+
+
+def raw_payload(token):
+    return base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+
+
+def test_non_finite_sort_keys_are_encoded_as_null(dataset):
+    query = Query(sort_by='score')
+    result, tokens = page_cursors(dataset, query)
+
+    for index, token in enumerate(tokens, start=1):
+        assert 'Infinity' not in raw_payload(token) and 'NaN' not in raw_payload(token)
+        cursor = decode_cursor(token)
+        assert cursor['i'] == index
+        assert cursor['k'] is None or math.isfinite(cursor['k'])
+
+    keys = [decode_cursor(token)['k'] for token in tokens]
+    assert keys.count(None) == 3  # +inf, nulo y -inf
+    assert keys[0] is None  # +inf es la primera fila en orden descendente
+    assert result.total == len(dataset)
+
+
+def test_null_message_id_is_encoded_as_null(dataset):
+    query = Query(sort_by='views')
+    result, tokens = page_cursors(dataset, query)
+
+    ids = [decode_cursor(token)['id'] for token in tokens]
+    assert None in ids
+    assert sorted(i for i in ids if i is not None) == [1, 2, 4, 5]
+
+
+def test_non_finite_key_in_token_is_rejected():
+    for value in ('Infinity', '-Infinity', 'NaN'):
+        payload = '{"i":1,"k":%s}' % value
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+        with pytest.raises(QueryError):
+            decode_cursor(token)
+
+    token = base64.urlsafe_b64encode(json.dumps({'i': 1, 'k': 1.5}).encode('utf-8')).decode('ascii')
+    assert decode_cursor(token)['k'] == 1.5
@@ -0,0 +1,108 @@
+"""
+Pruebas del cliente S3 compartido y del contador de idas y vueltas contra un S3 local (moto)
+"""
+
+import threading
+import boto3
+import pytest
+from moto import mock_aws
+
+import s3_client
+from config import Config
+from s3_client import S3Metrics, get_s3_client, s3_metrics
+
+KEY = 'telegram_messages.json'
+BODY = b'{"messages": [' + b','.join(b'{"Message ID": %d}' % i for i in range(2000)) + b']}'
+
+
+@pytest.fixture
+def bucket(monkeypatch, tmp_path):
+    """Bucket simulado con el JSON de mensajes y un cliente compartido nuevo para cada prueba."""
+    monkeypatch.setattr(Config, 'SNAPSHOT_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'S3_ENDPOINT_URL', None)
+    monkeypatch.setattr(s3_client, '_shared_client', None)
+    with mock_aws():
+        s3 = boto3.client('s3', region_name=Config.AWS_REGION)
+        s3.create_bucket(Bucket=Config.S3_BUCKET,
+                         CreateBucketConfiguration={'LocationConstraint': Config.AWS_REGION})
+        s3.put_object(Bucket=Config.S3_BUCKET, Key=KEY, Body=BODY)
+        yield s3
+
+
+def round_trips(fn):
+    """(resultado, idas y vueltas a S3) de ejecutar `fn` como una petición del servidor."""
+    s3_metrics.begin_request()
+    result = fn()
+    return result, s3_metrics.end_request()
+
+
+def test_shared_client_is_reused(bucket):
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(get_s3_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in clients}) == 1
+    assert get_s3_client() is clients[0]
+    assert get_s3_client().s3_client is clients[0].s3_client
+
+
+def test_round_trips_are_counted_per_request(bucket):
+    client = get_s3_client()
+
+    version, trips = round_trips(lambda: client.get_object_version(KEY))
+    assert version == bucket.head_object(Bucket=Config.S3_BUCKET, Key=KEY)['ETag']
+    assert trips == 1
+
+    # Sin S3 en la petición no se cuenta nada
+    assert round_trips(lambda: None)[1] == 0
+
+
+def test_listing_is_cached(bucket):
+    client = get_s3_client()
+
+    files, trips = round_trips(lambda: client.list_files_cached('telegram_messages'))
+    assert files == [KEY]
+    assert trips == 1
+
+    files, trips = round_trips(lambda: client.list_files_cached('telegram_messages'))
+    assert files == [KEY]
+    assert trips == 0
+
+
+def test_conditional_revalidation_is_one_round_trip(bucket):
+    client = get_s3_client()
+    version = client.get_object_version(KEY)
+
+    current, trips = round_trips(lambda: client.get_object_version(KEY, if_none_match=version))
+    assert current == version
+    assert trips == 1
+
+
+def test_pool_round_trips_count_for_the_calling_request(bucket, monkeypatch):
+    monkeypatch.setattr(Config, 'S3_DOWNLOAD_PART_SIZE', 8 * 1024)
+    client = get_s3_client()
+    parts = -(-len(BODY) // Config.S3_DOWNLOAD_PART_SIZE)
+
+    data, trips = round_trips(lambda: client.download_ranges(KEY))
+    assert bytes(data) == BODY
+    assert trips == parts
+
+
+def test_metrics_totals_by_operation(bucket):
+    metrics = S3Metrics()
+    client = s3_client.create_boto3_client()
+    metrics.attach(client)
+
+    metrics.begin_request()
+    client.head_object(Bucket=Config.S3_BUCKET, Key=KEY)
+    client.get_object(Bucket=Config.S3_BUCKET, Key=KEY)['Body'].read()
+    assert metrics.end_request() == 2
+
+    stats = metrics.stats()
+    assert stats['round_trips'] == {'HeadObject': 1, 'GetObject': 1}
+    assert stats['requests'] == 1
+    assert stats['requests_with_s3'] == 1
+    assert stats['max_round_trips_per_request'] == 2
@@ -0,0 +1,253 @@
+import re
+import logging
+import numpy as np
+import pandas as pd
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEXT_COLUMN = 'Message Text'
+
+# Las claves de las listas de ocurrencias son (fila << POSITION_BITS) | posición del token.
+# Los tokens a partir de MAX_POSITION se guardan con esa posición, que significa "sin posición":
+# siguen contando para términos y prefijos, pero no para frases
+POSITION_BITS = 16
+MAX_POSITION = (1 << POSITION_BITS) - 1
+
+# Mensajes que se tokenizan por bloque al construir el índice (los bloques se unen después)
+BUILD_CHUNK_SIZE = 100_000
+
+# A partir de este número de segmentos (uno por actualización incremental) se unen en uno
+MAX_SEGMENTS = 8
+
+# Términos de la consulta: frases entre comillas o palabras (con * final para prefijo)
+QUERY_PATTERN = re.compile(r'"([^"]*)"?|(\S+)')
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """Minúsculas y sin diacríticos, igual que al indexar."""
+    return normalize_series(pd.Series([text])).iloc[0]
+
+
+def normalize_series(texts):
+    return (texts.fillna('').astype(str)
+            .str.normalize('NFKD')
+            .str.replace(r'[\u0300-\u036f]', '', regex=True)
+            .str.lower())
+
+
+def parse_query(text):
+    """Cláusulas de una búsqueda: ('phrase', [tokens]), ('prefix', token) o ('term', token).
+
+    Todas las cláusulas se combinan con AND. Una frase de un solo token es un término.
+    """
+    clauses = []
+    for phrase, word in QUERY_PATTERN.findall(normalize_text(text or '')):
+        if phrase or not word:
+            tokens = TOKEN_PATTERN.findall(phrase)
+            if len(tokens) > 1:
+                clauses.append(('phrase', tokens))
+            elif tokens:
+                clauses.append(('term', tokens[0]))
+        elif word.endswith('*') and TOKEN_PATTERN.fullmatch(word[:-1]):
+            clauses.append(('prefix', word[:-1]))
+        else:
+            # Palabras con puntuación (p. ej. "covid-19") se buscan como frase
+            tokens = TOKEN_PATTERN.findall(word)
+            if len(tokens) > 1:
+                clauses.append(('phrase', tokens))
+            elif tokens:
+                clauses.append(('term', tokens[0]))
+    return clauses
+
+
+class _Segment:
+    """Índice invertido inmutable de un bloque contiguo de filas.
+
+    `vocabulary` está ordenado (las consultas por prefijo son un rango de búsqueda binaria)
+    y las ocurrencias del token i son `keys[offsets[i]:offsets[i + 1]]`, ordenadas por fila
+    y posición.
+    """
+
+    def __init__(self, vocabulary, offsets, keys, first_row, n_rows, unpositioned=False):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.keys = keys
+        self.first_row = first_row
+        self.n_rows = n_rows
+        # Si algún mensaje del segmento tiene tokens sin posición (más allá de MAX_POSITION)
+        self.unpositioned = unpositioned
+
+    @classmethod
+    def build(cls, texts, first_row):
+        tokens = normalize_series(texts).str.findall(TOKEN_PATTERN.pattern)
+        counts = tokens.str.len().to_numpy()
+        flat = tokens.explode().dropna()
+        if flat.empty:
+            return cls(np.array([], dtype=object), np.zeros(1, dtype=np.int64), np.array([], dtype=np.int64),
+                       first_row, len(texts))
+
+        rows = np.repeat(np.arange(first_row, first_row + len(texts), dtype=np.int64), counts)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.minimum(np.arange(len(rows)) - starts, MAX_POSITION)
+        unpositioned = bool(len(positions)) and bool(positions.max() == MAX_POSITION)
+
+        codes, vocabulary = pd.factorize(flat.to_numpy(), sort=True)
+        order = np.argsort(codes, kind='stable')
+        keys = (rows[order] << POSITION_BITS) | positions[order]
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(vocabulary)), out=offsets[1:])
+        return cls(np.asarray(vocabulary, dtype=object), offsets, keys, first_row, len(texts), unpositioned)
+
+    @classmethod
+    def merge(cls, segments):
+        """Une segmentos de filas contiguas en uno solo, sin volver a tokenizar."""
+        if len(segments) == 1:
+            return segments[0]
+        vocabulary = np.unique(np.concatenate([segment.vocabulary for segment in segments]))
+        codes = np.concatenate([np.repeat(np.searchsorted(vocabulary, segment.vocabulary), np.diff(segment.offsets))
+                                for segment in segments])
+        # Orden estable: dentro de cada token las claves siguen ordenadas por fila
+        order = np.argsort(codes, kind='stable')
+        keys = np.concatenate([segment.keys for segment in segments])[order]
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(vocabulary)), out=offsets[1:])
+        return cls(vocabulary, offsets, keys, segments[0].first_row, sum(segment.n_rows for segment in segments),
+                   any(segment.unpositioned for segment in segments))
+
+    def _token_id(self, token):
+        i = int(np.searchsorted(self.vocabulary, token))
+        if i < len(self.vocabulary) and self.vocabulary[i] == token:
+            return i
+        return None
+
+    def postings(self, token):
+        """Claves (fila, posición) de las ocurrencias de `token`."""
+        i = self._token_id(token)
+        if i is None:
+            return self.keys[:0]
+        return self.keys[self.offsets[i]:self.offsets[i + 1]]
+
+    def term_rows(self, token):
+        return _unique_rows(self.postings(token))
+
+    def prefix_rows(self, prefix):
+        lo = int(np.searchsorted(self.vocabulary, prefix))
+        hi = int(np.searchsorted(self.vocabulary, prefix + '\U0010ffff'))
+        if lo >= hi:
+            return self.keys[:0]
+        # Varios tokens: se marcan las filas en una máscara del segmento en lugar de ordenar
+        rows = np.zeros(self.n_rows, dtype=bool)
+        rows[(self.keys[self.offsets[lo]:self.offsets[hi]] >> POSITION_BITS) - self.first_row] = True
+        return np.flatnonzero(rows) + self.first_row
+
+    def phrase_postings(self, token):
+        """Ocurrencias de `token` con posición exacta (las que pueden formar parte de una frase)."""
+        keys = self.postings(token)
+        if self.unpositioned:
+            keys = keys[(keys & MAX_POSITION) != MAX_POSITION]
+        return keys
+
+    def phrase_rows(self, tokens):
+        # Cada token se desplaza a la posición del primero; se empieza por el menos frecuente
+        shifted = sorted(((self.phrase_postings(token) - offset) for offset, token in enumerate(tokens)), key=len)
+        keys = shifted[0]
+        for other in shifted[1:]:
+            if len(keys) == 0:
+                break
+            keys = _intersect_sorted(keys, other)
+        return _unique_rows(keys)
+
+
+class TextIndex:
+    """Índice invertido de Message Text por versión del dataset, formado por segmentos.
+
+    Si una versión nueva conserva como prefijo las filas de la anterior (mismo canal,
+    Message ID y texto), sólo se indexan las filas añadidas en un segmento nuevo.
+    """
+
+    def __init__(self, segments, row_hashes):
+        self.segments = segments
+        self.row_hashes = row_hashes
+
+    def __len__(self):
+        return len(self.row_hashes)
+
+    @classmethod
+    def build(cls, df, previous=None):
+        """Índice de `df`, reutilizando los segmentos de `previous` si sus filas siguen igual."""
+        if TEXT_COLUMN not in df.columns:
+            return cls([], np.zeros(len(df), dtype=np.uint64))
+
+        row_hashes = _row_hashes(df)
+        segments, start = [], 0
+        if previous is not None:
+            m = len(previous)
+            if 0 < m <= len(df) and np.array_equal(previous.row_hashes, row_hashes[:m]):
+                segments, start = list(previous.segments), m
+
+        texts = df[TEXT_COLUMN]
+        chunks = [_Segment.build(texts.iloc[chunk_start:chunk_start + BUILD_CHUNK_SIZE], chunk_start)
+                  for chunk_start in range(start, len(df), BUILD_CHUNK_SIZE)]
+        if chunks:
+            segments.append(_Segment.merge(chunks))
+        if len(segments) > MAX_SEGMENTS:
+            segments = [_Segment.merge(segments)]
+
+        if start:
+            logger.info(f"Índice de texto actualizado: {len(df) - start} filas nuevas sobre {start}")
+        return cls(segments, row_hashes)
+
+    def search(self, clauses):
+        """Filas (ordenadas) que cumplen todas las cláusulas de `parse_query`."""
+        result = None
+        for kind, value in clauses:
+            parts = []
+            for segment in self.segments:
+                if kind == 'phrase':
+                    parts.append(segment.phrase_rows(value))
+                elif kind == 'prefix':
+                    parts.append(segment.prefix_rows(value))
+                else:
+                    parts.append(segment.term_rows(value))
+            rows = np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+            result = rows if result is None else _intersect_sorted(result, rows)
+            if len(result) == 0:
+                break
+        return result if result is not None else np.array([], dtype=np.int64)
+
+    def mask(self, text, n):
+        """Máscara booleana de las `n` filas que cumplen la búsqueda `text`."""
+        mask = np.zeros(n, dtype=bool)
+        clauses = parse_query(text)
+        if clauses:
+            mask[self.search(clauses)] = True
+        return mask
+
+
+def _intersect_sorted(a, b):
+    """Intersección de dos arrays ordenados sin repetidos (búsqueda binaria del menor en el mayor)."""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return a
+    found = np.searchsorted(b, a)
+    found[found == len(b)] = 0
+    return a[b[found] == a]
+
+
+def _unique_rows(keys):
+    rows = keys >> POSITION_BITS
+    if len(rows) == 0:
+        return rows
+    first = np.empty(len(rows), dtype=bool)
+    first[0] = True
+    np.not_equal(rows[1:], rows[:-1], out=first[1:])
+    return rows[first]
+
+
+def _row_hashes(df):
+    columns = [col for col in ('Username', 'Message ID', TEXT_COLUMN) if col in df.columns]
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
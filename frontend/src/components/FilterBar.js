@@ -31,16 +31,14 @@ function FilterBar({ onFilterChange, onChannelsLoad }) {
   const fetchChannels = async () => {
     try {
       setLoading(true);
-      // Usar una petición más pequeña para obtener canales
-      const response = await messagesAPI.getMessages({ page: 1, per_page: 50 });
+      // Los canales salen de las facetas del dataset completo
+      const response = await messagesAPI.getFacets();
       
-      if (response.success && response.messages) {
-        // Extraer canales únicos de los mensajes
-        const uniqueChannels = [...new Set(
-          response.messages
-            .map(msg => msg.Title)
-            .filter(title => title && title !== 'Desconocido')
-        )].sort();
+      if (response.success && response.facets) {
+        const uniqueChannels = (response.facets.channels || [])
+          .map(channel => channel.value)
+          .filter(title => title && title !== 'Desconocido')
+          .sort();
         
         setChannels(uniqueChannels);
         
@@ -76,6 +76,17 @@ export const messagesAPI = {
     }
   },
 
+  // Recuentos por canal, tipo de medio y día para los filtros actuales
+  getFacets: async (filters = {}) => {
+    try {
+      const response = await api.post('/facets', filters);
+      return response.data;
+    } catch (error) {
+      console.error('Error al obtener facetas:', error);
+      throw error;
+    }
+  },
+
   // Exportar mensajes relevantes
   exportRelevants: async () => {
     try {
@@ -93,12 +104,10 @@ export const channelsAPI = {
   // Obtener lista de canales
   getChannels: async () => {
     try {
-      // Como no hay endpoint específico para canales, usamos el endpoint de filtros
-      // para obtener los canales disponibles
-      const response = await api.post('/filter_messages', { page: 1, per_page: 1 });
+      // Los canales salen de las facetas, con su número de mensajes
+      const response = await api.get('/facets');
       if (response.data.success) {
-        // Extraer canales del primer mensaje o usar datos de sesión
-        return [];
+        return (response.data.facets.channels || []).map(channel => channel.value);
       }
       return [];
     } catch (error) {